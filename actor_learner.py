@@ -0,0 +1,384 @@
+"""
+Asynchronous actor/learner training for off-policy Stable-Baselines3 models (DDPG, TD3, SAC) on EnergyPlus.
+
+With `model.learn` the simulation and the gradient updates take turns on the same process.  ActorLearner splits them:
+
+- Each actor process owns one environment (and so one EnergyPlus state and workspace) and a CPU copy of the policy.
+  It steps continuously with exploration noise (uniform random actions until the first update is published) and
+  sends its transitions in chunks through a queue.
+- The learner (the calling process) moves the chunks into the model's replay buffer and calls `model.train` in a
+  loop.  Every `publish_interval` updates it writes the actor weights to a shared memory vector, and the actors load
+  them every `sync_interval` steps when the version has changed.
+
+With `norm_obs`, observations are normalized once, in the learner, the way VecNormalize does it: the learner keeps
+the running mean and variance of the observations it ingests, the replay buffer stores raw observations and normalizes
+them with the current statistics when sampling, and the statistics are published with the weights so that every actor
+feeds its policy the same normalized observations.  The actors' environments must then not normalize observations
+themselves.
+
+Each transition carries the version (learner update count) of the weights that chose its action, so the policy lag
+at the time the learner receives it is known exactly.  `stats()` reports actor throughput, learner updates per second
+and the policy lag.
+"""
+import copy
+import multiprocessing as mp
+import queue
+import traceback
+from multiprocessing import shared_memory
+from time import perf_counter
+
+import cloudpickle
+import gymnasium as gym
+import numpy as np
+import torch as th
+from stable_baselines3.common.logger import Logger
+from stable_baselines3.common.vec_env import DummyVecEnv, VecNormalize
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper
+
+from transport import attach_shared_memory
+
+
+class SpacesEnv(gym.Env):
+    """
+    Environment that only carries the spaces, used to construct the learner's model when the real environments live
+    in the actor processes.
+    """
+
+    def __init__(self, observation_space: gym.Space, action_space: gym.Space):
+        self.observation_space = observation_space
+        self.action_space = action_space
+
+    def reset(self, *, seed: int = None, options: dict = None):
+        raise NotImplementedError('SpacesEnv cannot be stepped, the environments run in the actor processes')
+
+    def step(self, action):
+        raise NotImplementedError('SpacesEnv cannot be stepped, the environments run in the actor processes')
+
+
+def _actor(index: int, env_fn: CloudpickleWrapper, remote, parent_remote, transitions, stop, lock, version,
+           attrs: tuple, chunk_size: int, sync_interval: int, noise_sigma: float, seed: int) -> None:
+    parent_remote.close()
+    th.set_num_threads(1)
+    env = None
+    try:
+        env = env_fn.var()
+        remote.send((True, (env.observation_space, env.action_space, {name: env.get_wrapper_attr(name)
+                                                                       for name in attrs})))
+        policy_bytes, name, size, normalization = remote.recv()
+        policy = cloudpickle.loads(policy_bytes)
+        shm = attach_shared_memory(name)
+        weights = np.ndarray((size,), dtype=np.float32, buffer=shm.buf)
+    except Exception:
+        remote.send((False, traceback.format_exc()))
+        if env is not None:
+            env.close()
+        return
+
+    rng = np.random.default_rng(seed)
+    parameters = list(policy.actor.parameters())
+    n_parameters = int(sum(p.numel() for p in parameters))
+    mean, scale = 0.0, 1.0
+    loaded = -1
+    obs_shape = env.observation_space.shape
+    act_shape = env.action_space.shape
+
+    def new_chunk():
+        return {
+            'observations': np.empty((chunk_size,) + obs_shape, dtype=np.float32),
+            'next_observations': np.empty((chunk_size,) + obs_shape, dtype=np.float32),
+            'actions': np.empty((chunk_size,) + act_shape, dtype=np.float32),
+            'rewards': np.empty(chunk_size, dtype=np.float32),
+            'dones': np.empty(chunk_size, dtype=np.bool_),
+            'timeouts': np.empty(chunk_size, dtype=np.bool_),
+            'versions': np.empty(chunk_size, dtype=np.int64),
+        }
+
+    try:
+        chunk = new_chunk()
+        returns = []
+        episode_return = 0.0
+        observation, _ = env.reset(seed=seed)
+        steps = 0
+        while not stop.is_set():
+            if steps % sync_interval == 0 and version.value != loaded:
+                with lock:
+                    loaded = version.value
+                    vector = weights.copy()
+                th.nn.utils.vector_to_parameters(th.as_tensor(vector[:n_parameters]), parameters)
+                if normalization is not None:
+                    mean, var = (stat.reshape(obs_shape) for stat in np.split(vector[n_parameters:], 2))
+                    scale = np.sqrt(var + normalization[1])
+            if loaded == 0:
+                # No update published yet: explore uniformly, like the warmup of `model.learn`
+                scaled = rng.uniform(-1, 1, act_shape).astype(np.float32)
+            else:
+                policy_observation = observation
+                if normalization is not None:
+                    policy_observation = np.clip((observation - mean) / scale, -normalization[0], normalization[0])
+                action, _ = policy.predict(policy_observation, deterministic=True)
+                scaled = policy.scale_action(action)
+                if noise_sigma:
+                    scaled = np.clip(scaled + rng.normal(0.0, noise_sigma, scaled.shape), -1, 1)
+            next_observation, reward, terminated, truncated, _ = env.step(policy.unscale_action(scaled))
+
+            i = steps % chunk_size
+            chunk['observations'][i] = observation
+            chunk['next_observations'][i] = next_observation
+            chunk['actions'][i] = scaled
+            chunk['rewards'][i] = reward
+            chunk['dones'][i] = terminated or truncated
+            chunk['timeouts'][i] = truncated and not terminated
+            chunk['versions'][i] = loaded
+            episode_return += reward
+            steps += 1
+            observation = next_observation
+            if terminated or truncated:
+                returns.append(episode_return)
+                episode_return = 0.0
+                observation, _ = env.reset()
+            if steps % chunk_size == 0:
+                while not stop.is_set():
+                    try:
+                        transitions.put((index, chunk, returns), timeout=1.0)
+                        break
+                    except queue.Full:
+                        pass
+                chunk = new_chunk()
+                returns = []
+    except KeyboardInterrupt:
+        pass
+    except Exception:
+        transitions.put((index, None, traceback.format_exc()))
+    finally:
+        env.close()
+        del weights
+        shm.close()
+
+
+class ActorLearner:
+    """
+    Trains an off-policy model with several asynchronous actor processes feeding one learner.
+
+    The actors start with forkserver where it is available and spawn otherwise, so the training script has to keep its
+    top level code under `if __name__ == '__main__':`.
+
+    :param model_fn: Callable taking an environment (a SpacesEnv with the actors' spaces) and returning the model.
+    :param env_fns: Picklable zero argument callables, one per actor, each returning a new environment.
+    :param chunk_size: Number of transitions an actor sends at a time.
+    :param sync_interval: Actor steps between checks for new weights.
+    :param publish_interval: Learner updates between weight publications.
+    :param gradient_steps: Gradient steps per `model.train` call.
+    :param learning_starts: Transitions to collect before training starts.
+    :param noise_sigma: Standard deviation of the Gaussian exploration noise, in the scaled [-1, 1] action space.
+    :param max_updates_per_step: If given, the learner waits for more transitions rather than exceed this many
+                                 updates per received transition.
+    :param queue_size: Maximum number of chunks waiting for the learner.
+    :param norm_obs: Normalize the observations in the learner (see above), the statistics are in `normalizer`.
+    :param attrs: Environment attributes collected from each actor at startup, available in `env_attrs`.
+    :param start_method: Multiprocessing start method, forkserver or spawn by default.
+    :param seed: Base seed; actor i uses seed + i.
+    """
+
+    def __init__(self, model_fn, env_fns: list, chunk_size: int = 64, sync_interval: int = 100,
+                 publish_interval: int = 100, gradient_steps: int = 16, learning_starts: int = 1000,
+                 noise_sigma: float = 0.1, max_updates_per_step: float = None, queue_size: int = 256,
+                 norm_obs: bool = False, attrs=(), start_method: str = None, seed: int = 0):
+        if start_method is None:
+            start_method = 'forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn'
+        ctx = mp.get_context(start_method)
+        self.n_actors = len(env_fns)
+        self.gradient_steps = gradient_steps
+        self.learning_starts = learning_starts
+        self.publish_interval = publish_interval
+        self.max_updates_per_step = max_updates_per_step
+        self.transitions = ctx.Queue(queue_size)
+        self.stop = ctx.Event()
+        self.lock = ctx.Lock()
+        self.version = ctx.Value('q', 0, lock=False)
+        self.shm = None
+        self.normalizer = None
+        self.closed = False
+        remotes, work_remotes = zip(*[ctx.Pipe() for _ in range(self.n_actors)])
+        self.processes = []
+        for i, (work_remote, remote, env_fn) in enumerate(zip(work_remotes, remotes, env_fns)):
+            args = (i, CloudpickleWrapper(env_fn), work_remote, remote, self.transitions, self.stop, self.lock,
+                    self.version, tuple(attrs), chunk_size, sync_interval, noise_sigma, seed + i)
+            process = ctx.Process(target=_actor, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+        try:
+            handshakes = [self._receive(remote, i) for i, remote in enumerate(remotes)]
+            observation_space, action_space, _ = handshakes[0]
+            self.env_attrs = [attributes for _, _, attributes in handshakes]
+            spaces = env = SpacesEnv(observation_space, action_space)
+            normalization = None
+            if norm_obs:
+                # The model finds the VecNormalize and normalizes the replay buffer samples with it
+                env = self.normalizer = VecNormalize(DummyVecEnv([lambda: spaces]), norm_reward=False)
+                normalization = (self.normalizer.clip_obs, self.normalizer.epsilon)
+            self.model = model_fn(env)
+            self.model.set_logger(Logger(folder=None, output_formats=[]))
+            self.parameters = list(self.model.actor.parameters())
+            size = int(sum(p.numel() for p in self.parameters))
+            if norm_obs:
+                size += 2 * int(np.prod(observation_space.shape))
+            self.shm = shared_memory.SharedMemory(create=True, size=4 * size)
+            self.weights = np.ndarray((size,), dtype=np.float32, buffer=self.shm.buf)
+            self.publish()
+            policy = cloudpickle.dumps(copy.deepcopy(self.model.policy).to('cpu'))
+            for remote in remotes:
+                remote.send((policy, self.shm.name, size, normalization))
+        except BaseException:
+            self.close()
+            raise
+        finally:
+            for remote in remotes:
+                remote.close()
+
+        self.updates = 0
+        self.received = 0
+        self.actor_steps = np.zeros(self.n_actors, dtype=np.int64)
+        self.lag_total = 0
+        self.lag_max = 0
+        self.episode_returns = []
+        self.started = perf_counter()
+
+    def _receive(self, remote, index: int):
+        while not remote.poll(1.0):
+            if not self.processes[index].is_alive():
+                raise RuntimeError('Actor {} exited with code {}'.format(index, self.processes[index].exitcode))
+        ok, payload = remote.recv()
+        if not ok:
+            raise RuntimeError('Actor {} failed:\n{}'.format(index, payload))
+        return payload
+
+    def publish(self) -> None:
+        """
+        Writes the current actor weights, and the observation statistics with `norm_obs`, to shared memory for the
+        actors to pick up.
+        """
+        vector = th.nn.utils.parameters_to_vector(self.parameters).detach().cpu().numpy()
+        with self.lock:
+            self.weights[:vector.size] = vector
+            if self.normalizer is not None:
+                rms = self.normalizer.obs_rms
+                self.weights[vector.size:] = np.concatenate([rms.mean.ravel(), rms.var.ravel()])
+            self.version.value = self.model._n_updates
+
+    def _ingest(self, block: bool) -> int:
+        """
+        Moves the waiting chunks into the replay buffer.
+
+        :param block: Whether to wait (up to a second) for the first chunk.
+        :return: Number of transitions added.
+        """
+        added = 0
+        buffer = self.model.replay_buffer
+        while True:
+            try:
+                index, chunk, payload = self.transitions.get(block=block and added == 0, timeout=1.0)
+            except queue.Empty:
+                return added
+            if chunk is None:
+                raise RuntimeError('Actor {} failed:\n{}'.format(index, payload))
+            if self.normalizer is not None:
+                self.normalizer.obs_rms.update(chunk['observations'])
+            buffer.extend(chunk['observations'][:, np.newaxis], chunk['next_observations'][:, np.newaxis],
+                          chunk['actions'][:, np.newaxis], chunk['rewards'][:, np.newaxis],
+                          chunk['dones'][:, np.newaxis],
+                          [[{'TimeLimit.truncated': bool(timeout)}] for timeout in chunk['timeouts']])
+            lags = self.model._n_updates - chunk['versions']
+            self.lag_total += int(lags.sum())
+            self.lag_max = max(self.lag_max, int(lags.max()))
+            self.actor_steps[index] += chunk['rewards'].size
+            self.received += chunk['rewards'].size
+            self.episode_returns.extend(payload)
+            added += chunk['rewards'].size
+
+    def learn(self, total_timesteps: int, log_fn=None, log_interval: float = 10.0):
+        """
+        Trains until the actors have produced `total_timesteps` transitions.
+
+        :param total_timesteps: Number of environment steps, summed over all actors.
+        :param log_fn: Optional callable receiving `stats()` every `log_interval` seconds and at the end.
+        :param log_interval: Seconds between `log_fn` calls.
+        :return: The model.
+        """
+        self.model.num_timesteps = self.received
+        last_published = self.model._n_updates
+        last_log = perf_counter()
+        while self.received < total_timesteps:
+            starved = self.received < max(self.learning_starts, self.model.batch_size)
+            if self.max_updates_per_step is not None:
+                starved = starved or self.updates + self.gradient_steps > self.max_updates_per_step * self.received
+            self._ingest(block=starved)
+            for index, process in enumerate(self.processes):
+                if not process.is_alive():
+                    raise RuntimeError('Actor {} exited with code {}'.format(index, process.exitcode))
+            if not starved:
+                self.model.num_timesteps = self.received
+                self.model._current_progress_remaining = 1.0 - self.received / total_timesteps
+                self.model.train(gradient_steps=self.gradient_steps, batch_size=self.model.batch_size)
+                self.updates += self.gradient_steps
+                if self.model._n_updates - last_published >= self.publish_interval:
+                    self.publish()
+                    last_published = self.model._n_updates
+            if log_fn is not None and perf_counter() - last_log >= log_interval:
+                log_fn(self.stats())
+                last_log = perf_counter()
+        self.publish()
+        if log_fn is not None:
+            log_fn(self.stats())
+        return self.model
+
+    def stats(self) -> dict:
+        """
+        Returns the throughput and policy lag since the actors started:
+
+        - actor_steps_per_s: transitions received per second, over all actors
+        - actor_steps_per_s_min / max: the slowest and fastest actor
+        - updates_per_s: learner gradient steps per second
+        - policy_lag_mean / max: learner updates between the weights that chose an action and the learner receiving it
+        - episodes / episode_return_mean: completed episodes and their mean return
+        """
+        elapsed = perf_counter() - self.started
+        stats = {
+            'transitions': int(self.received),
+            'updates': int(self.updates),
+            'actor_steps_per_s': self.received / elapsed,
+            'actor_steps_per_s_min': float(self.actor_steps.min()) / elapsed,
+            'actor_steps_per_s_max': float(self.actor_steps.max()) / elapsed,
+            'updates_per_s': self.updates / elapsed,
+            'policy_lag_mean': self.lag_total / self.received if self.received else 0.0,
+            'policy_lag_max': self.lag_max,
+            'episodes': len(self.episode_returns),
+        }
+        if self.episode_returns:
+            stats['episode_return_mean'] = float(np.mean(self.episode_returns))
+        return stats
+
+    def close(self) -> None:
+        """
+        Stops the actors and releases the shared weights.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.stop.set()
+        deadline = perf_counter() + 60
+        while any(p.is_alive() for p in self.processes) and perf_counter() < deadline:
+            try:
+                self.transitions.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        if self.shm is not None:
+            self.weights = None
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
@@ -0,0 +1,59 @@
+"""
+Measures the time to the first usable EnergyPlusAPI() in a fresh interpreter.
+
+Each repetition runs in a new Python process so that the import and library load are cold (as far as the OS file
+cache allows).  The following are reported, in milliseconds:
+
+- import: `from pyenergyplus.api import EnergyPlusAPI`
+- first_api: the first EnergyPlusAPI(), which loads the shared library
+- second_api: a second EnergyPlusAPI(), which reuses the shared library
+- bind_all: binding every declared prototype, which is the cost the old eager constructor paid up front
+- first_call: the first real call through the API (creating and deleting a state)
+
+Usage: python benchmarks/startup.py [repetitions]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r'''
+import json, time
+t0 = time.perf_counter()
+from pyenergyplus.api import EnergyPlusAPI
+t1 = time.perf_counter()
+api = EnergyPlusAPI()
+t2 = time.perf_counter()
+EnergyPlusAPI()
+t3 = time.perf_counter()
+state = api.state_manager.new_state()
+api.state_manager.delete_state(state)
+t4 = time.perf_counter()
+bound = api.api.bind_all()
+t5 = time.perf_counter()
+print(json.dumps({
+    'import': 1000 * (t1 - t0), 'first_api': 1000 * (t2 - t1), 'second_api': 1000 * (t3 - t2),
+    'first_call': 1000 * (t4 - t3), 'bind_all': 1000 * (t5 - t4), 'prototypes': bound,
+}))
+'''
+
+
+def run(repetitions: int = 10) -> dict:
+    root = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+    samples = []
+    for _ in range(repetitions):
+        output = subprocess.run([sys.executable, '-c', PROBE], env=env, check=True, capture_output=True, text=True)
+        samples.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    return {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+
+
+if __name__ == '__main__':
+    result = run(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
+    prototypes = result.pop('prototypes')
+    for key, value in result.items():
+        print('{:>12s}: {:8.3f} ms'.format(key, value))
+    print('{:>12s}: {:8d}'.format('prototypes', int(prototypes)))
+    print('time to first usable EnergyPlusAPI(): {:.3f} ms (eager binding would add {:.3f} ms)'.format(
+        result['import'] + result['first_api'], result['bind_all']))
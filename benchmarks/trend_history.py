@@ -0,0 +1,75 @@
+"""
+Benchmarks reading full trend windows in plugin mode, comparing the per-index `get_trend_value` loop with
+`get_trend_history` and `get_trend_histories`.
+
+This module is a Python Plugin.  Add the benchmarks directory to the PythonPlugin:SearchPaths, declare one or more
+PythonPlugin:TrendVariable objects, and reference the plugin from the input file:
+
+    PythonPlugin:Instance,
+      Trend Benchmark,           !- Name
+      No,                        !- Run During Warmup Days
+      trend_history,             !- Python Module Name
+      TrendHistoryBenchmark;     !- Plugin Class Name
+
+The trend variable names are taken from the TREND_NAMES environment variable (comma separated), and the window length
+from TREND_COUNT (default 144).  Timings are accumulated every timestep and printed at the end of the run.
+"""
+import os
+from time import perf_counter
+
+import numpy as np
+
+from pyenergyplus.plugin import EnergyPlusPlugin
+
+
+class TrendHistoryBenchmark(EnergyPlusPlugin):
+
+    def __init__(self):
+        super().__init__()
+        self.trend_names = [n for n in os.environ.get('TREND_NAMES', '').split(',') if n]
+        self.count = int(os.environ.get('TREND_COUNT', '144'))
+        self.handles = None
+        self.out = None
+        self.timings = {'per_index_loop': 0.0, 'get_trend_history': 0.0, 'get_trend_histories': 0.0}
+        self.calls = 0
+
+    def on_end_of_zone_timestep_after_zone_reporting(self, state) -> int:
+        exchange = self.api.exchange
+        if self.handles is None:
+            if not exchange.api_data_fully_ready(state):
+                return 0
+            self.handles = np.array([exchange.get_trend_handle(state, n) for n in self.trend_names], dtype=np.intc)
+            self.out = np.empty((self.handles.size, self.count))
+
+        start = perf_counter()
+        loop = [[exchange.get_trend_value(state, h, i) for i in range(1, self.count + 1)]
+                for h in self.handles.tolist()]
+        self.timings['per_index_loop'] += perf_counter() - start
+
+        start = perf_counter()
+        single = [exchange.get_trend_history(state, h, self.count) for h in self.handles.tolist()]
+        self.timings['get_trend_history'] += perf_counter() - start
+
+        start = perf_counter()
+        exchange.get_trend_histories(state, self.handles, self.count, out=self.out)
+        self.timings['get_trend_histories'] += perf_counter() - start
+
+        if self.calls == 0 and self.handles.size:
+            # the three methods must agree before the timings mean anything
+            assert np.array_equal(np.array(loop), self.out) and np.array_equal(np.array(single), self.out)
+        self.calls += 1
+        return 0
+
+    def report(self) -> None:
+        if not self.calls:
+            return
+        values = self.handles.size * self.count
+        print('trend history benchmark: {} trends x {} steps over {} timesteps'.format(
+            self.handles.size, self.count, self.calls))
+        for name, total in self.timings.items():
+            print('  {:>20s}: {:10.3f} us per timestep, {:8.3f} us per value'.format(
+                name, 1e6 * total / self.calls, 1e6 * total / self.calls / max(values, 1)))
+
+    def __del__(self):
+        # there is no end of simulation calling point, so report when EnergyPlus releases the plugin
+        self.report()
@@ -0,0 +1,67 @@
+"""
+Measures environment steps per second of SharedMemoryVecEnv at 1, 4, 16 and 64 workers, next to Stable-Baselines3's
+SubprocVecEnv, which pickles every step through a pipe.  For SharedMemoryVecEnv the median and 99th percentile
+per-step IPC latency of the transport are printed as well.
+
+By default the workers run the EplusEnv configuration from ddpg_base.py (with the same wrappers), so the numbers
+include the simulation itself.  Pass --gym-id (for example Pendulum-v1) to use a cheap Gymnasium environment instead,
+which isolates the inter-process overhead.  Random actions are used, and the first reset is not timed.
+
+Usage: python benchmarks/vec_env_throughput.py [--workers 1,4,16,64] [--steps 2000] [--gym-id ID]
+                                               [--backends shm,subproc]
+"""
+import argparse
+import os
+import sys
+import time
+from functools import partial
+
+import gymnasium as gym
+import numpy as np
+from stable_baselines3.common.vec_env import SubprocVecEnv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from vec_env import SharedMemoryVecEnv, eplus_env_fns  # noqa: E402
+
+
+def env_fns(n_workers: int, gym_id: str = None) -> list:
+    if gym_id is not None:
+        return [partial(gym.make, gym_id) for _ in range(n_workers)]
+    import ddpg_base
+    return eplus_env_fns(n_workers, 'Eplus-env-benchmark', ddpg_base.worker_wrappers, **ddpg_base.env_kwargs)
+
+
+def run(backend: str, n_workers: int, steps: int, gym_id: str = None) -> (float, dict):
+    fns = env_fns(n_workers, gym_id)
+    env = SharedMemoryVecEnv(fns) if backend == 'shm' else SubprocVecEnv(fns, start_method='forkserver')
+    try:
+        env.reset()
+        rng = np.random.default_rng(0)
+        space = env.action_space
+        actions = rng.uniform(space.low, space.high, (steps, n_workers) + space.shape).astype(space.dtype)
+        start = time.perf_counter()
+        for i in range(steps):
+            env.step(actions[i])
+        rate = n_workers * steps / (time.perf_counter() - start)
+        return rate, env.ipc_latency() if backend == 'shm' else None
+    finally:
+        env.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workers', default='1,4,16,64')
+    parser.add_argument('--steps', type=int, default=2000, help='vectorized steps per measurement')
+    parser.add_argument('--gym-id', default=None)
+    parser.add_argument('--backends', default='shm,subproc')
+    args = parser.parse_args()
+
+    backends = args.backends.split(',')
+    print('{:>8s}'.format('workers') + ''.join('{:>16s}'.format(backend + ' steps/s') for backend in backends)
+          + '{:>24s}'.format('shm ipc p50/p99 us'))
+    for n_workers in map(int, args.workers.split(',')):
+        results = [run(backend, n_workers, args.steps, args.gym_id) for backend in backends]
+        latency = next((latency for _, latency in results if latency), None)
+        print('{:>8d}'.format(n_workers) + ''.join('{:>16.1f}'.format(rate) for rate, _ in results)
+              + ('{:>16.1f}/{:.1f}'.format(latency['p50_us'], latency['p99_us']) if latency else ''))
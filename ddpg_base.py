@@ -1,13 +1,16 @@
 import logging
+import os
+import sys
 import gymnasium as gym
 import numpy as np
 import wandb
 from sinergym.envs.eplus_env import EplusEnv
-from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.callbacks import BaseCallback, EvalCallback
 from stable_baselines3 import *
 from stable_baselines3.common.callbacks import CallbackList
 from stable_baselines3.common.logger import HumanOutputFormat
 from stable_baselines3.common.logger import Logger as SB3Logger
+from stable_baselines3.common.vec_env import DummyVecEnv, VecNormalize, sync_envs_normalization
 from sinergym.utils.wrappers import *
 from sinergym.utils.logger import *
 from datetime import datetime
@@ -19,6 +22,16 @@ from sinergym.utils.logger import WandBOutputFormat
 from sinergym.utils.rewards import *
 from sinergym.utils.wrappers import *
 
+from functools import partial
+
+from actor_learner import ActorLearner
+from metrics import MetricsAggregator
+from replay_buffer import MemmapReplayBuffer
+from surrogate import Surrogate, SurrogateEnv
+from trajectory import TrajectoryRecorder
+from transport import SubprocessEnv
+from vec_env import SharedMemoryVecEnv, eplus_env_fns, make_eplus_env
+
 
 # Logger 설정
 terminal_logger = TerminalLogger()
@@ -30,6 +43,27 @@ environment = 'Eplus-5zone-mixed-continuous-stochastic-v1'
 # Training episodes 
 episodes = 30
 
+# 병렬 시뮬레이션 워커 수 (1이면 단일 환경)
+n_workers = int(os.environ.get('N_WORKERS', '1'))
+
+# 1이면 단일 환경의 EnergyPlus를 별도 프로세스에서 실행 (obs/action은 공유 메모리로 전달)
+sim_subprocess = os.environ.get('SIM_SUBPROCESS', '0') == '1'
+
+# 0보다 크면 actor/learner 분리 학습 (actor 프로세스 수)
+n_actors = int(os.environ.get('N_ACTORS', '0'))
+
+# 설정하면 replay buffer를 디스크의 memmap 파일(float32)에 저장
+replay_dir = os.environ.get('REPLAY_DIR')
+replay_size = int(os.environ.get('REPLAY_SIZE', '1000000'))
+
+# 설정하면 학습 환경의 모든 episode를 오프라인 데이터셋으로 저장 (워커별 하위 디렉터리)
+trajectory_dir = os.environ.get('TRAJECTORY_DIR')
+
+# 설정하면 surrogate.py로 학습한 모델(SURROGATE_PATH)과 데이터셋(SURROGATE_DATA, 콤마 구분)으로 먼저 사전학습
+surrogate_path = os.environ.get('SURROGATE_PATH')
+surrogate_data = [path for path in os.environ.get('SURROGATE_DATA', '').split(',') if path]
+surrogate_episodes = int(os.environ.get('SURROGATE_EPISODES', '100'))
+
 # Name of the experiment
 # 환경 설정
 reward_kwargs = {
@@ -44,8 +78,8 @@ weather_file = "KOR_Inchon.471120_IWEC.epw"
 experiment_date = datetime.today().strftime('%Y-%m-%d_%H:%M')
 experiment_name = f'DDPG-LargeOffice-{experiment_date}'
 
-# 학습 환경 생성
-env = EplusEnv(
+# 환경 설정 (학습/평가 공통)
+env_kwargs = dict(
     building_file=building_file,
     weather_files=[weather_file],
     action_space=gym.spaces.Box(
@@ -67,144 +101,266 @@ env = EplusEnv(
     reward_kwargs=reward_kwargs
 )
 
-env = NormalizeObservation(env)
-env = NormalizeAction(env)
-env = LoggerWrapper(env)
-env = CSVLogger(env)
-
-env = WandBLogger(env,
-                 entity='seoah-ewha-womans-university',
-                 project_name='global-frontier',
-                 run_name=experiment_name,
-                 group='Train_example',
-                 tags=['DRL', 'PPO', '5zone', 'continuous', 'stochastic', 'v1'],
-                 save_code = True,
-                 dump_frequency = 1000,
-                 artifact_save = False)
-
-eval_env = EplusEnv(
-    building_file=building_file,
-    weather_files=[weather_file],
-    action_space=gym.spaces.Box(
-        low=np.array([18.0, 22.0]),
-        high=np.array([24.0, 30.0]),
-        dtype=np.float32
-    ),
-    variables={
-        "Outdoor Air Temperature": ("Site Outdoor Air Drybulb Temperature", "ENVIRONMENT"),
-        "Zone Mean Air Temperature": ("Zone Mean Air Temperature", "CORE_BOTTOM"),
-        "Facility Total HVAC Electricity Demand Rate": ("Facility Total HVAC Electricity Demand Rate", "WHOLE BUILDING")
-    },
-    meters={},
-    actuators={
-        "Heating Setpoint": ("Schedule:Compact", "Schedule Value", "HTGSETP_SCH_NO_OPTIMUM"),
-        "Cooling Setpoint": ("Schedule:Compact", "Schedule Value", "CLGSETP_SCH_NO_SETBACK")
-    },
-    reward=LinearReward,
-    reward_kwargs=reward_kwargs
+# 워커마다 적용할 wrapper (WandBLogger는 학습 프로세스에서 한 번만 사용)
+worker_wrappers = [
+    (NormalizeObservation, {}),
+    (NormalizeAction, {}),
+    (LoggerWrapper, {}),
+    (CSVLogger, {}),
+]
+if trajectory_dir:
+    # 정규화 전의 관측값/행동을 기록하도록 EplusEnv 바로 위에 적용
+    worker_wrappers.insert(0, (TrajectoryRecorder, {'root': trajectory_dir, 'metadata': {'agent': 'DDPG'}}))
+
+# 병렬 학습/actor-learner에서는 워커마다 정규화하지 않고 학습 프로세스에서 한 번만 정규화
+vec_worker_wrappers = [(wrapper, kwargs) for wrapper, kwargs in worker_wrappers if wrapper is not NormalizeObservation]
+vec_eval_wrappers = [(NormalizeAction, {}), (LoggerWrapper, {}), (CSVLogger, {})]
+
+wandb_kwargs = dict(
+    entity='seoah-ewha-womans-university',
+    project_name='global-frontier',
+    run_name=experiment_name,
+    group='Train_example',
+    tags=['DRL', 'PPO', '5zone', 'continuous', 'stochastic', 'v1'],
+    save_code=True,
 )
 
-eval_env = NormalizeObservation(eval_env)
-eval_env = NormalizeAction(eval_env)
-eval_env = LoggerWrapper(eval_env)
-eval_env = CSVLogger(eval_env)
-
-# PPO 알고리즘 학습
-model = DDPG(
-    "MlpPolicy",
-    env,
-    verbose=1,
-    batch_size=43,
-    learning_rate=0.003
-)
 
 class WandBLoggingCallback(BaseCallback):
     """
     Custom callback to log both step-wise and episode-wise HVAC power consumption.
     """
 
-    def __init__(self, verbose=0):
+    def __init__(self, verbose=0, info_key=None, downsample=24):
         super(WandBLoggingCallback, self).__init__(verbose)
-        self.episode_hvac_demand = []  # 에피소드별 HVAC 소비량 저장 리스트
+        self.info_key = info_key  # 설정하면 LoggerWrapper 대신 step info에서 값을 읽음 (병렬 학습)
+        # step 시계열은 이 step 수의 평균으로 기록 (wandb 내부 step이 SB3 logger의 step=num_timesteps를 넘지 않도록 1보다 크게)
+        self.downsample = downsample
+        self.log_source = None  # LoggerWrapper의 logger (학습 시작 시 한 번만 가져옴)
+        self.metrics = None  # step 값을 모아 에피소드마다 백그라운드로 기록
         self.episode_count = 0  # 에피소드 카운터
 
-    def _on_step(self) -> bool:
-        """Step 단위로 데이터를 모으지만, 기록은 하지 않음."""
-        logger = self.training_env.get_attr('logger')[0]  # LoggerWrapper 객체 가져오기
+    def _on_training_start(self) -> None:
+        self.metrics = MetricsAggregator(['Facility HVAC Demand'], downsample=self.downsample)
+        if self.info_key is None:
+            self.log_source = self.training_env.get_attr('logger')[0]
 
-        if hasattr(logger, "get_log_data"):
-            log_data = logger.get_log_data()
+    def _on_step(self) -> bool:
+        """Step 단위로 데이터를 배열에 모으기만 하고, 기록은 에피소드가 끝날 때 한 번에 함."""
+        if self.info_key is not None:
+            for info in self.locals['infos']:
+                self.metrics.record(info[self.info_key])
+        elif hasattr(self.log_source, "get_log_data"):
+            log_data = self.log_source.get_log_data()
 
             # HVAC 전력 소비량 저장 (step 단위 & 에피소드 단위)
             if "Facility Total HVAC Electricity Demand Rate" in log_data:
-                hvac_value = log_data["Facility Total HVAC Electricity Demand Rate"]
-                self.episode_hvac_demand.append(hvac_value)  # 에피소드별 리스트에 저장
+                self.metrics.record(log_data["Facility Total HVAC Electricity Demand Rate"])
 
-        return True  # 학습 계속 진행
+        if np.any(self.locals['dones']):
+            self._on_episode_end()
 
-    def _on_rollout_end(self) -> None:
-        if len(self.episode_hvac_demand) > 0:
-            avg_hvac_demand = np.mean(self.episode_hvac_demand)  # 에피소드별 평균 계산
+        return True  # 학습 계속 진행
 
-            print(f"[Episode {self.episode_count}] Avg HVAC Demand: {avg_hvac_demand}")
+    def _on_episode_end(self) -> None:
+        if self.metrics.n > 0:
+            aggregates = self.metrics.end_episode(Episode=self.episode_count)
 
-            wandb.log({
-                "Episode": self.episode_count,  # 명확하게 Episode 값을 WandB에 로깅
-                "Avg Facility HVAC Demand": avg_hvac_demand
-            }, step=self.episode_count)  # Step을 에피소드 번호로 설정
+            print(f"[Episode {self.episode_count}] Avg HVAC Demand: {aggregates['Avg Facility HVAC Demand']}")
 
-            # 데이터 초기화 (다음 에피소드 데이터 저장)
-            self.episode_hvac_demand = []
             self.episode_count += 1  # 에피소드 증가
 
+    def _on_training_end(self) -> None:
+        self.metrics.close()
 
 
 
-# wandb 커스텀 콜백
-if is_wrapped(env, WandBLogger):
-    experiment_params = {
-        'sinergym-version': sinergym.__version__,
-        'python-version': sys.version
-    }
-    # experiment_params.update(conf)
-    env.get_wrapper_attr('wandb_run').config.update(experiment_params)
-
-    callbacks = []
-
-# Set up Evaluation logging and saving best model
-eval_callback = LoggerEvalCallback(
-    eval_env=eval_env,
-    train_env=env,
-    n_eval_episodes=1,
-    eval_freq_episodes=2,
-    deterministic=True)
-
-callbacks.append(eval_callback)
 
-hvac_logging_callback = WandBLoggingCallback()
-callbacks.append(hvac_logging_callback)
 
-callback = CallbackList(callbacks)
-
-# wandb logger and setting in SB3
-if is_wrapped(env, WandBLogger):
-    logger = SB3Logger(
-        folder=None,
-        output_formats=[
-            HumanOutputFormat(
-                sys.stdout,
-                max_length=120),
-            WandBOutputFormat()])
-    model.set_logger(logger)
-
-# 학습
-timesteps = episodes * (env.get_wrapper_attr('timestep_per_episode') - 1)   
-
-model.learn(
-    total_timesteps=timesteps,
-    callback=callback,
-    log_interval=100)   
+def init_wandb_run(**config):
+    # 여러 프로세스로 학습할 때는 WandBLogger 대신 학습 프로세스에서 run을 직접 생성
+    wandb.init(entity=wandb_kwargs['entity'], project=wandb_kwargs['project_name'], name=wandb_kwargs['run_name'],
+               group=wandb_kwargs['group'], tags=wandb_kwargs['tags'], save_code=wandb_kwargs['save_code'])
+    wandb.config.update({
+        'sinergym-version': sinergym.__version__,
+        'python-version': sys.version,
+        **config
+    })
+
+
+def make_train_env():
+    if n_workers == 1:
+        env = SubprocessEnv(partial(EplusEnv, **env_kwargs)) if sim_subprocess else EplusEnv(**env_kwargs)
+        for wrapper, kwargs in worker_wrappers:
+            env = wrapper(env, **kwargs)
+        return WandBLogger(env, dump_frequency=1000, artifact_save=False, **wandb_kwargs)
+
+    # 워커마다 별도의 EnergyPlus 상태와 workspace를 사용하고, obs/action은 공유 메모리로 주고받음
+    init_wandb_run(n_workers=n_workers)
+    env = SharedMemoryVecEnv(
+        eplus_env_fns(n_workers, 'Eplus-env-train', vec_worker_wrappers, **env_kwargs),
+        info_keys=('total_power_demand',))
+    return VecNormalize(env, norm_obs=True, norm_reward=False)
+
+
+def make_eval_env():
+    if n_workers == 1:
+        eval_env = EplusEnv(**env_kwargs)
+        eval_env = NormalizeObservation(eval_env)
+        eval_env = NormalizeAction(eval_env)
+        eval_env = LoggerWrapper(eval_env)
+        return CSVLogger(eval_env)
+
+    # 평가 중에는 통계를 갱신하지 않음 (EvalCallback이 학습 환경의 통계를 복사)
+    eval_env = DummyVecEnv([partial(make_eplus_env, 'Eplus-env-eval', vec_eval_wrappers, **env_kwargs)])
+    return VecNormalize(eval_env, training=False, norm_obs=True, norm_reward=False)
+
+
+def make_surrogate_env(normalize_obs=True):
+    env = SurrogateEnv(Surrogate.load(surrogate_path), surrogate_data, action_space=env_kwargs['action_space'])
+    if normalize_obs:
+        env = NormalizeObservation(env)
+    return NormalizeAction(env)
+
+
+def make_model(env, **kwargs):
+    if replay_dir is not None:
+        kwargs.update(buffer_size=replay_size, replay_buffer_class=MemmapReplayBuffer,
+                      replay_buffer_kwargs=dict(path=replay_dir, prefetch=4))
+    return DDPG(
+        "MlpPolicy",
+        env,
+        verbose=1,
+        batch_size=43,
+        learning_rate=0.003,
+        **kwargs
+    )
+
+
+def main_actor_learner():
+    # actor 프로세스들이 EnergyPlus를 실행하고, 학습 프로세스는 replay buffer에서 계속 학습
+    # 관측 정규화는 learner가 한 번만 하고 통계는 가중치와 함께 actor에 전달
+    init_wandb_run(n_actors=n_actors)
+    trainer = ActorLearner(
+        make_model,
+        eplus_env_fns(n_actors, 'Eplus-env-actor', vec_worker_wrappers, **env_kwargs),
+        norm_obs=True,
+        attrs=('timestep_per_episode', 'workspace_path'))
+    try:
+        timesteps = episodes * (trainer.env_attrs[0]['timestep_per_episode'] - 1)
+        model = trainer.learn(timesteps, log_fn=wandb.log)
+        model.save(trainer.env_attrs[0]['workspace_path'] + '/model')
+        trainer.normalizer.save(trainer.env_attrs[0]['workspace_path'] + '/vec_normalize.pkl')
+        if replay_dir is not None:
+            model.replay_buffer.close()
+        print(f'Actor/learner: {trainer.stats()}')
+    finally:
+        trainer.close()
+
+
+def main():
+    if n_actors > 0:
+        return main_actor_learner()
+
+    # 학습 환경 생성
+    env = make_train_env()
+    eval_env = make_eval_env()
+    timestep_per_episode = env.get_wrapper_attr('timestep_per_episode')
+    workspace_path = env.get_wrapper_attr('workspace_path')
+
+    # PPO 알고리즘 학습
+    # 병렬 학습에서는 수집한 transition 수만큼 gradient step 수행
+    model = make_model(env, gradient_steps=1 if n_workers == 1 else -1)
+
+    # surrogate 환경에서 사전학습한 뒤 실제 EnergyPlus 환경에서 이어서 학습
+    # 관측 정규화도 학습 환경과 같은 방식으로 하고, 실제 환경은 surrogate에서 보정한 통계로 시작
+    if surrogate_path is not None:
+        if n_workers == 1:
+            surrogate_env = DummyVecEnv([make_surrogate_env])
+        else:
+            surrogate_env = VecNormalize(
+                DummyVecEnv([partial(make_surrogate_env, normalize_obs=False)] * n_workers),
+                norm_obs=True, norm_reward=False)
+        model.set_env(surrogate_env)
+        model.learn(total_timesteps=surrogate_episodes * (surrogate_env.get_attr('timestep_per_episode')[0] - 1),
+                    log_interval=100)
+        if n_workers == 1:
+            env.get_wrapper_attr('set_mean')(surrogate_env.get_attr('mean')[0])
+            env.get_wrapper_attr('set_var')(surrogate_env.get_attr('var')[0])
+        else:
+            sync_envs_normalization(surrogate_env, env)
+        model.set_env(env)
+        print(f'Surrogate pretraining: {model.num_timesteps} steps')
 
-model.save(env.get_wrapper_attr('workspace_path') + '/model')  
+    callbacks = []
 
-env.close()
+    # wandb 커스텀 콜백
+    if n_workers == 1 and is_wrapped(env, WandBLogger):
+        experiment_params = {
+            'sinergym-version': sinergym.__version__,
+            'python-version': sys.version
+        }
+        # experiment_params.update(conf)
+        env.get_wrapper_attr('wandb_run').config.update(experiment_params)
+
+    # Set up Evaluation logging and saving best model
+    if n_workers == 1:
+        eval_callback = LoggerEvalCallback(
+            eval_env=eval_env,
+            train_env=env,
+            n_eval_episodes=1,
+            eval_freq_episodes=2,
+            deterministic=True)
+    else:
+        # LoggerEvalCallback은 NormalizeObservation wrapper를 전제로 하므로 VecNormalize를 동기화하는 EvalCallback 사용
+        eval_callback = EvalCallback(
+            eval_env,
+            n_eval_episodes=1,
+            eval_freq=2 * (timestep_per_episode - 1),
+            best_model_save_path=workspace_path + '/evaluation',
+            log_path=workspace_path + '/evaluation',
+            deterministic=True)
+
+    callbacks.append(eval_callback)
+
+    hvac_logging_callback = WandBLoggingCallback(info_key=None if n_workers == 1 else 'total_power_demand')
+    callbacks.append(hvac_logging_callback)
+
+    callback = CallbackList(callbacks)
+
+    # wandb logger and setting in SB3
+    if n_workers > 1 or is_wrapped(env, WandBLogger):
+        logger = SB3Logger(
+            folder=None,
+            output_formats=[
+                HumanOutputFormat(
+                    sys.stdout,
+                    max_length=120),
+                WandBOutputFormat()])
+        model.set_logger(logger)
+
+    # 학습 (total_timesteps는 모든 워커의 step 합계)
+    timesteps = episodes * (timestep_per_episode - 1)
+
+    model.learn(
+        total_timesteps=timesteps,
+        callback=callback,
+        log_interval=100)
+
+    model.save(workspace_path + '/model')
+    if n_workers > 1:
+        # 모델과 함께 관측 정규화 통계도 저장
+        env.save(workspace_path + '/vec_normalize.pkl')
+    if replay_dir is not None:
+        model.replay_buffer.close()
+
+    # 시뮬레이션 프로세스와의 step당 IPC 지연 (us)
+    ipc_env = env if n_workers > 1 else env.unwrapped
+    if hasattr(ipc_env, 'ipc_latency'):
+        print(f'IPC latency: {ipc_env.ipc_latency()}')
+
+    env.close()
+
+
+if __name__ == '__main__':
+    main()
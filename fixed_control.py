@@ -1,4 +1,5 @@
 import logging
+import os
 import numpy as np
 from datetime import datetime
 import gymnasium as gym
@@ -11,6 +12,9 @@ from sinergym.utils.rewards import LinearReward
 
 import wandb
 
+from metrics import MetricsAggregator
+from trajectory import TrajectoryWriter
+
 
 wandb.init(
     project="global-frontier",
@@ -127,8 +131,6 @@ class MyRuleBasedController(CustomZone):
         
         act_dict = dict(zip(self.env.get_wrapper_attr(
             'actuators'), observation))
-        
-        print(obs_dict)
 
         out_temp = obs_dict['Outdoor Air Temperature']
         year = 2024  # 연도를 고정하거나 필요시 obs_dict에서 동적으로 가져오도록 수정
@@ -192,42 +194,49 @@ agent = MyRuleBasedController()
 # 에피소드 반복 설정
 num_episodes = 15  # 에피소드 횟수 설정
 
+# TRAJECTORY_DIR을 설정하면 모든 step을 오프라인 학습용 데이터셋으로 저장
+trajectory_dir = os.environ.get('TRAJECTORY_DIR')
+writer = None
+if trajectory_dir:
+    writer = TrajectoryWriter(os.path.join(trajectory_dir, 'fixed-control'),
+                              observation_names=env.get_wrapper_attr('observation_variables'),
+                              action_names=env.get_wrapper_attr('action_variables'))
+
+# step별 값은 메모리에 모아두고, 에피소드가 끝나면 통계와 다운샘플한 시계열을 백그라운드에서 한 번에 기록
+# (wandb 연결이 없으면 METRICS_DIR 또는 ./metrics에 저장)
+hvac_index = list(env.get_wrapper_attr('variables')).index('Facility Total HVAC Electricity Demand Rate')
+metrics = MetricsAggregator(['Facility HVAC Demand'], downsample=int(os.environ.get('METRICS_DOWNSAMPLE', '4')),
+                            local_dir=os.environ.get('METRICS_DIR'))
+
 for episode in range(1, num_episodes + 1):
     obs, info = env.reset()
     rewards = []
     truncated = terminated = False
-    step_count = 0
-    cum_hvac = 0  # 누적 HVAC 소비량 저장 리스트
 
     print(f"🚀 Starting Episode {episode}...")
 
     while not (terminated or truncated):
         action = agent.act(obs)
+        prev_obs = obs
         obs, reward, terminated, truncated, info = env.step(action)
         rewards.append(reward)
+        if writer is not None:
+            writer.add(prev_obs, action, reward, obs, terminated, truncated, info)
 
-        # HVAC 소비량 추출 및 누적 계산
-        obs_dict = dict(zip(env.get_wrapper_attr('variables'), obs))
-        hvac_demand = obs_dict['Facility Total HVAC Electricity Demand Rate']
-        cum_hvac += hvac_demand
-        step_count += 1
+        # HVAC 소비량 기록 (step마다 배열에 한 줄 쓰기만 함)
+        metrics.record(obs[hvac_index])
 
-        # ✅ Step별 WandB 로깅
-        wandb.log({
-            "Step": step_count,
-            "HVAC Demand": hvac_demand
-        }, step=step_count)
-
-        print(f"🔍 Step {step_count}: HVAC Demand = {hvac_demand}")
-
-    # ✅ 에피소드 평균 계산 및 WandB 로깅
-    mean_hvac_demand = cum_hvac / step_count if step_count > 0 else 0
-    wandb.log({
-        "Episode": episode,
-        "Avg Facility HVAC Demand": mean_hvac_demand
-    }, step=episode)
+    # ✅ 에피소드 통계 계산 및 WandB 로깅 (백그라운드)
+    aggregates = metrics.end_episode(Episode=episode)
+    mean_hvac_demand = aggregates.get('Avg Facility HVAC Demand', 0)
 
     print(f"✅ Episode {episode} Completed: Avg HVAC Demand = {mean_hvac_demand:.2f}")
 
+    if writer is not None:
+        writer.end_episode({'controller': type(agent).__name__, 'episode': episode})
+
+if writer is not None:
+    writer.close()
+metrics.close()
 env.close()
 wandb.finish()
\ No newline at end of file
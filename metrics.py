@@ -0,0 +1,164 @@
+"""
+Batched metric logging for simulation loops.
+
+Calling wandb.log (or print) on every simulation step costs a synchronous call per step, tens of thousands per
+simulated year.  MetricsAggregator instead writes each step's values into a preallocated array, which costs one row
+assignment.  At the end of an episode it computes the episode aggregates (mean, sum, min, max, std of every metric) in
+one vectorized pass, downsamples the step series to bucket means, and hands both to a background thread that logs them
+in one batch.
+
+Step series are logged against a "Step" axis (counted over all episodes) and episode aggregates against an "Episode"
+axis, so the two never compete for wandb's own step counter.  Every logged point still advances that counter by one,
+which matters when something else logs with an explicit `step=` (Stable-Baselines3's logger uses the timestep count):
+the downsampling has to keep the points per episode below the steps per episode.
+
+Without an active wandb run (no network, WANDB_MODE=disabled), or once logging to it fails, the batches are written to
+a local directory instead: `episodes.jsonl` with one line of aggregates per episode and `episode-<n>.npz` with the
+downsampled series.
+
+    metrics = MetricsAggregator(['Facility HVAC Demand'], downsample=24)
+    for step in ...:
+        metrics.record(hvac_demand)
+    aggregates = metrics.end_episode(Episode=episode)
+    ...
+    metrics.close()
+"""
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+
+try:
+    import wandb
+except ImportError:
+    wandb = None
+
+#: Episode aggregates, as {statistic: name prefix}; an aggregate is named '<prefix> <metric>'
+AGGREGATES = {'mean': 'Avg', 'sum': 'Total', 'min': 'Min', 'max': 'Max', 'std': 'Std'}
+
+
+class MetricsAggregator:
+    """
+    Accumulates per-step metrics and logs them per episode from a background thread.
+
+    :param keys: Metric names, in the order `record` takes the values.
+    :param capacity: Steps preallocated per episode; the array doubles when an episode is longer.
+    :param downsample: Steps averaged into one point of the logged step series, 0 to log no step series.
+    :param local_dir: Directory for the local files.  They are always written when it is given; otherwise they are
+                      only written to 'metrics' when no wandb run is usable.
+    :param run: wandb run to log to, by default the active one.
+    """
+
+    def __init__(self, keys, capacity: int = 35040, downsample: int = 24, local_dir: str = None, run=None):
+        self.keys = list(keys)
+        self.buffer = np.empty((capacity, len(self.keys)), dtype=np.float64)
+        self.n = 0
+        self.downsample = downsample
+        self.local_dir = local_dir
+        self.run = run if run is not None else (wandb.run if wandb is not None else None)
+        self.fallback_dir = None if self.run is not None or local_dir is not None else 'metrics'
+        self.episode = 0
+        self.total_steps = 0
+        self.batches = queue.Queue()
+        self.thread = threading.Thread(target=self._flush_loop, daemon=True, name='metrics-flush')
+        self.thread.start()
+
+    def record(self, *values) -> None:
+        """
+        Appends one step, with one value per key in order.
+        """
+        if self.n == len(self.buffer):
+            self.buffer = np.concatenate([self.buffer, np.empty_like(self.buffer)])
+        self.buffer[self.n] = values
+        self.n += 1
+
+    def aggregates(self) -> dict:
+        """
+        Returns the aggregates of the current episode so far, named as logged ('Avg <key>', ...).
+        """
+        if not self.n:
+            return {}
+        data = self.buffer[:self.n]
+        stats = {'mean': data.mean(axis=0), 'sum': data.sum(axis=0), 'min': data.min(axis=0),
+                 'max': data.max(axis=0), 'std': data.std(axis=0)}
+        return {'{} {}'.format(prefix, key): float(value)
+                for stat, prefix in AGGREGATES.items() for key, value in zip(self.keys, stats[stat])}
+
+    def series(self) -> (np.ndarray, np.ndarray):
+        """
+        Returns the downsampled step series of the current episode: the global step at the end of every bucket, and
+        the (buckets, keys) bucket means (the last bucket may be shorter).
+        """
+        if not self.n or not self.downsample:
+            return np.empty(0, dtype=np.int64), np.empty((0, len(self.keys)))
+        size = self.downsample
+        full = self.n // size * size
+        means = self.buffer[:full].reshape(-1, size, len(self.keys)).mean(axis=1)
+        if full < self.n:
+            means = np.concatenate([means, self.buffer[full:self.n].mean(axis=0, keepdims=True)])
+        steps = self.total_steps + np.minimum(np.arange(1, len(means) + 1) * size, self.n)
+        return steps, means
+
+    def end_episode(self, **extra) -> dict:
+        """
+        Closes the current episode and queues its aggregates and step series for logging.
+
+        :param extra: Additional scalars logged with the aggregates; 'Episode' defaults to the episode count.
+        :return: The aggregates (with `extra`).
+        """
+        self.episode += 1
+        aggregates = dict(self.aggregates(), **extra)
+        aggregates.setdefault('Episode', self.episode)
+        steps, means = self.series()
+        self.batches.put((self.episode, aggregates, steps, means))
+        self.total_steps += self.n
+        self.n = 0
+        return aggregates
+
+    def _flush_loop(self) -> None:
+        defined = False
+        while True:
+            batch = self.batches.get()
+            if batch is None:
+                return
+            episode, aggregates, steps, means = batch
+            if self.run is not None:
+                try:
+                    if not defined:
+                        self.run.define_metric('Step')
+                        self.run.define_metric('Episode')
+                        for key in self.keys:
+                            self.run.define_metric(key, step_metric='Step')
+                        for name in aggregates:
+                            if name != 'Episode':
+                                self.run.define_metric(name, step_metric='Episode')
+                        defined = True
+                    for step, row in zip(steps.tolist(), means.tolist()):
+                        self.run.log(dict(zip(self.keys, row), Step=step))
+                    self.run.log(aggregates)
+                except Exception as e:
+                    print('Metrics: logging to wandb failed ({}), writing to {} instead'.format(
+                        e, self.local_dir or 'metrics'))
+                    self.run = None
+                    self.fallback_dir = None if self.local_dir is not None else 'metrics'
+            for path in {self.local_dir, self.fallback_dir} - {None}:
+                self._write_local(path, episode, aggregates, steps, means)
+
+    def _write_local(self, path: str, episode: int, aggregates: dict, steps: np.ndarray, means: np.ndarray) -> None:
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, 'episodes.jsonl'), 'a') as f:
+            f.write(json.dumps(aggregates) + '\n')
+        if len(steps):
+            np.savez(os.path.join(path, 'episode-{:04d}.npz'.format(episode)), step=steps,
+                     **{key: means[:, i] for i, key in enumerate(self.keys)})
+
+    def close(self) -> None:
+        """
+        Logs everything queued so far and stops the background thread; an open episode is not logged.
+        """
+        if self.thread is not None:
+            self.batches.put(None)
+            self.thread.join()
+            self.thread = None
@@ -56,11 +56,14 @@
 from ctypes import cdll, c_char_p, c_void_p
 import os
 import sys
+import threading
+from typing import Optional
 
-from pyenergyplus.func import Functional
-from pyenergyplus.datatransfer import DataExchange
-from pyenergyplus.runtime import Runtime
-from pyenergyplus.state import StateManager
+from pyenergyplus.common import Prototype
+from pyenergyplus.func import Functional, FunctionalPrototypes
+from pyenergyplus.datatransfer import DataExchange, DataExchangePrototypes, SensorValueCache
+from pyenergyplus.runtime import Runtime, RuntimePrototypes
+from pyenergyplus.state import StateManager, StateManagerPrototypes
 # from pyenergyplus.autosizing import Autosizing
 
 
@@ -82,6 +85,65 @@ def api_path() -> str:
         return os.path.join(api_dll_dir, 'EnergyPlusAPI.dll')
 
 
+class EnergyPlusLibrary(StateManagerPrototypes, FunctionalPrototypes, DataExchangePrototypes, RuntimePrototypes):
+    """
+    This class wraps the loaded EnergyPlus dynamic library.  Every exported function used by the API classes is
+    declared as a Prototype on one of the prototype base classes, and its argtypes and restype are only set the first
+    time it is used.  Functions without a declared prototype are passed through to the underlying CDLL unchanged.
+
+    Loading the library is expensive, so clients should not create instances of this class directly, and should use
+    `shared_library()` which loads it once per process.
+    """
+
+    apiVersionFromEPlus = Prototype([c_void_p], c_char_p)
+
+    def __init__(self, path: str):
+        """
+        Loads the EnergyPlus dynamic library.
+
+        :param path: The absolute path to the EnergyPlus dynamic library
+        """
+        self.cdll = cdll.LoadLibrary(path)
+
+    def __getattr__(self, name: str):
+        if name == 'cdll':
+            raise AttributeError(name)
+        return getattr(self.cdll, name)
+
+    def bind_all(self) -> int:
+        """
+        Binds every declared prototype now, rather than on first use.  This reproduces the previous eager start-up
+        behavior, and can be used to move the binding cost out of a time critical section.
+
+        :return: The number of prototypes bound
+        """
+        names = {
+            name for klass in type(self).__mro__ for name, value in vars(klass).items() if isinstance(value, Prototype)
+        }
+        for name in names:
+            getattr(self, name)
+        return len(names)
+
+
+_shared_library: Optional[EnergyPlusLibrary] = None
+_shared_library_lock = threading.Lock()
+
+
+def shared_library() -> EnergyPlusLibrary:
+    """
+    This function returns the process-wide EnergyPlusLibrary instance, loading the library on the first call.  All
+    EnergyPlusAPI instances in a process share this library, and therefore share the prototypes bound on it.
+
+    :return: The shared EnergyPlusLibrary instance
+    """
+    global _shared_library
+    if _shared_library is None:
+        with _shared_library_lock:
+            if _shared_library is None:
+                _shared_library = EnergyPlusLibrary(api_path())
+    return _shared_library
+
+
 class EnergyPlusAPI:
     """
     This class exposes the EnergyPlus C Library API to Python.  The API is split into three categories, and this class
@@ -123,15 +185,16 @@ class EnergyPlusAPI:
                                          other API calling structures, and 2) Avoid re-instantiating the functional API
                                          as this is already instantiated for Plugin workflows.
         """
-        self.api = cdll.LoadLibrary(api_path())
-        self.api.apiVersionFromEPlus.argtypes = [c_void_p]
-        self.api.apiVersionFromEPlus.restype = c_char_p
+        # the library is loaded once per process, and function prototypes are bound on first use
+        self.api = shared_library()
         # self.state provides access to the main EnergyPlus state management class, instantiated and ready to go
         self.state_manager = StateManager(self.api)
         # self.functional provides access to a functional API class, instantiated and ready to go
         self.functional = Functional(self.api, running_as_python_plugin)
         # self.exchange provides access to a data exchange API class, instantiated and ready to go
         self.exchange = DataExchange(self.api, running_as_python_plugin)
+        self.state_manager.add_reset_listener(self.exchange.internal_variables.clear)
+        self.state_manager.add_reset_listener(self.exchange.actuator_buffer.invalidate)
         # self.runtime provides access to a runtime API class, instantiated and ready to go
         self.runtime = Runtime(self.api)
         # self.autosizing provides access to the autosizing API class, instantiated and ready to go
@@ -148,6 +211,17 @@ class EnergyPlusAPI:
         """
         return "0.2"
 
+    def enable_value_cache(self) -> SensorValueCache:
+        """
+        Enables the read-through sensor value cache of the data exchange API, and attaches it to the runtime API so
+        that callbacks registered from now on drive it.  Enable the cache before registering callbacks.
+
+        :return: The enabled cache, which also holds its hit rate counters
+        """
+        cache = self.exchange.enable_value_cache()
+        self.runtime.value_cache = cache
+        return cache
+
     def verify_api_version_match(self, state: c_void_p) -> None:
         api_version_from_ep = float(self.api.apiVersionFromEPlus(state))
         api_version_defined_here = float(self.api_version())
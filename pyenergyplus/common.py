@@ -66,6 +66,39 @@ class EnergyPlusException(Exception):
     pass
 
 
+class Prototype:
+    """
+    Declares the ctypes prototype of one function exported by the EnergyPlus library.  Prototypes are declared as class
+    attributes on the API prototype classes, which are combined into EnergyPlusLibrary.  The attribute name is the name
+    of the exported function.  The function is looked up in the underlying CDLL and its argtypes and restype are set
+    the first time the attribute is accessed on a library instance.  The bound function is then stored on the instance,
+    so later lookups are plain attribute access and never come back through this descriptor.  Creating API instances
+    therefore does not pay for prototypes that are never called.
+    """
+
+    def __init__(self, argtypes, restype):
+        """
+        :param argtypes: The list of ctypes argument types, or None to leave the argtypes unset
+        :param restype: The ctypes return type
+        """
+        self.argtypes = argtypes
+        self.restype = restype
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, library, owner=None):
+        if library is None:
+            return self
+        function = getattr(library.cdll, self.name)
+        if self.argtypes is not None:
+            function.argtypes = self.argtypes
+        function.restype = self.restype
+        library.__dict__[self.name] = function
+        return function
+
+
 def is_number(obj) -> bool:
     """
     Check if the python object is a number.
@@ -0,0 +1,207 @@
+# EnergyPlus, Copyright (c) 1996-2024, The Board of Trustees of the University
+# of Illinois, The Regents of the University of California, through Lawrence
+# Berkeley National Laboratory (subject to receipt of any required approvals
+# from the U.S. Dept. of Energy), Oak Ridge National Laboratory, managed by UT-
+# Battelle, Alliance for Sustainable Energy, LLC, and other contributors. All
+# rights reserved.
+#
+# NOTICE: This Software was developed under funding from the U.S. Department of
+# Energy and the U.S. Government consequently retains certain rights. As such,
+# the U.S. Government has been granted for itself and others acting on its
+# behalf a paid-up, nonexclusive, irrevocable, worldwide license in the
+# Software to reproduce, distribute copies to the public, prepare derivative
+# works, and perform publicly and display publicly, and to permit others to do
+# so.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+# (3) Neither the name of the University of California, Lawrence Berkeley
+#     National Laboratory, the University of Illinois, U.S. Dept. of Energy nor
+#     the names of its contributors may be used to endorse or promote products
+#     derived from this software without specific prior written permission.
+#
+# (4) Use of EnergyPlus(TM) Name. If Licensee (i) distributes the software in
+#     stand-alone form without changes from the version obtained under this
+#     License, or (ii) Licensee makes a reference solely to the software
+#     portion of its product, Licensee must refer to the software as
+#     "EnergyPlus version X" software, where "X" is the version number Licensee
+#     obtained under this License and may not use a different name for the
+#     software. Except as specifically required in this Section (4), Licensee
+#     shall not use in a company name, a product name, in advertising,
+#     publicity, or other promotional activities any name, trade name,
+#     trademark, logo, or other designation of "EnergyPlus", "E+", "e+" or
+#     confusingly similar designation, without the U.S. Department of Energy's
+#     prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+from ctypes import c_void_p
+import re
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from pyenergyplus.common import EnergyPlusException
+from pyenergyplus.datatransfer import DataExchange
+
+#: The output variable reporting the temperature of one conduction finite difference node, keyed by surface name
+NODE_TEMPERATURE_VARIABLE = 'CondFD Surface Temperature Node {}'
+
+_node_temperature_pattern = re.compile(r'^CondFD Surface Temperature Node (\d+)$', re.IGNORECASE)
+
+
+class CondFDSurfaceTemperatures:
+    """
+    This class reads the conduction finite difference (CondFD) node temperature profile of many surfaces in bulk.
+
+    On `resolve`, which needs the API data to be fully ready, every surface reporting the "CondFD Surface Temperature
+    Node N" output variables is discovered from `get_api_data`, along with its node count, and the handles of every
+    node temperature are looked up once.  Each `read` then fills one preallocated array with the current node
+    temperatures of all surfaces, ordered from node 1 (the outside face) inwards.
+
+    The node temperature variables must be available: in a Python Plugin workflow they are requested with
+    Output:Variable objects in the input file, and in an API workflow by calling `request` before the run.
+
+    The layer structure is not exposed through get_api_data, so the per layer node counts are only available for
+    layers whose material names are known, through `layer_node_counts`, which wraps
+    `get_num_nodes_in_cond_fd_surf_layer`.
+    """
+
+    def __init__(self, exchange: DataExchange, surfaces: Optional[Sequence[str]] = None):
+        """
+        Creates a new reader.
+
+        :param exchange: The DataExchange instance to read through
+        :param surfaces: Surface names to read, in order, defaulting to every surface reporting node temperatures
+        """
+        self.exchange = exchange
+        self.requested_surfaces = list(surfaces) if surfaces is not None else None
+        #: Surface names, in row order, once resolved
+        self.surfaces: List[str] = []
+        #: Number of nodes of each surface, once resolved
+        self.node_counts: np.ndarray = np.zeros(0, dtype=np.intc)
+        self.handles: np.ndarray = np.zeros(0, dtype=np.intc)
+        self.offsets: np.ndarray = np.zeros(1, dtype=np.intp)
+        self._values: Optional[np.ndarray] = None
+        self._padded: Optional[np.ndarray] = None
+        self._padded_index = None
+
+    @staticmethod
+    def request(state: c_void_p, exchange: DataExchange, surfaces: Sequence[str], max_nodes: int) -> None:
+        """
+        Requests the node temperature variables of the given surfaces, for API workflows.  Requests for nodes beyond
+        the node count of a surface are harmless.  This must be called before each run.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param exchange: The DataExchange instance of an API, not Python Plugin, workflow
+        :param surfaces: Surface names to request, or ['*'] for every surface
+        :param max_nodes: The largest number of nodes expected in any surface
+        :return: Nothing
+        """
+        for node in range(1, max_nodes + 1):
+            for surface in surfaces:
+                exchange.request_variable(state, NODE_TEMPERATURE_VARIABLE.format(node), surface)
+
+    @property
+    def resolved(self) -> bool:
+        return self._values is not None
+
+    def resolve(self, state: c_void_p) -> None:
+        """
+        Discovers the CondFD surfaces and their node counts, and looks up every node temperature handle.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :return: Nothing
+        """
+        if not self.exchange.api_data_fully_ready(state):
+            raise EnergyPlusException("CondFD surfaces can only be resolved once the API data is fully ready")
+        nodes: Dict[str, Dict[int, str]] = {}
+        names: Dict[str, str] = {}
+        for point in self.exchange.get_api_data(state):
+            if point.what != 'OutputVariable':
+                continue
+            match = _node_temperature_pattern.match(point.name)
+            if match:
+                nodes.setdefault(point.key.upper(), {})[int(match.group(1))] = point.name
+                names.setdefault(point.key.upper(), point.key)
+        if self.requested_surfaces is None:
+            keys = sorted(nodes)
+        else:
+            keys = [surface.upper() for surface in self.requested_surfaces]
+            missing = [surface for surface, key in zip(self.requested_surfaces, keys) if key not in nodes]
+            if missing:
+                raise EnergyPlusException(
+                    "No CondFD node temperatures are available for surfaces: {}".format(', '.join(missing)))
+        handles = []
+        counts = []
+        for key in keys:
+            numbers = sorted(nodes[key])
+            if numbers != list(range(1, len(numbers) + 1)):
+                raise EnergyPlusException(
+                    "CondFD node temperatures of surface '{}' are not available for every node".format(names[key]))
+            for number in numbers:
+                handle = self.exchange.get_variable_handle(state, nodes[key][number], names[key])
+                if handle == -1:
+                    raise EnergyPlusException(
+                        "Could not get a handle to '{}' for surface '{}'".format(nodes[key][number], names[key]))
+                handles.append(handle)
+            counts.append(len(numbers))
+        self.surfaces = [names[key] for key in keys]
+        self.node_counts = np.array(counts, dtype=np.intc)
+        self.handles = np.array(handles, dtype=np.intc)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.intp)
+        self._values = np.empty(len(handles))
+        max_nodes = int(self.node_counts.max()) if counts else 0
+        self._padded = np.full((len(keys), max_nodes), np.nan)
+        rows = np.repeat(np.arange(len(keys)), counts)
+        columns = np.arange(len(handles)) - np.repeat(self.offsets[:-1], counts)
+        self._padded_index = (rows, columns)
+
+    def layer_node_counts(self, state: c_void_p, surface: str, materials: Sequence[str]) -> List[int]:
+        """
+        Returns the number of nodes in each of the given layers of a surface.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param surface: The surface name
+        :param materials: The material names of the layers of the surface construction
+        :return: The number of nodes in each layer, in the order of `materials`
+        """
+        return [self.exchange.get_num_nodes_in_cond_fd_surf_layer(state, surface, m) for m in materials]
+
+    def read(self, state: c_void_p, padded: bool = True) -> Union[np.ndarray, List[np.ndarray]]:
+        """
+        Reads the current node temperatures of every surface, resolving the surfaces on the first call.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param padded: If True, return a (surfaces, max nodes) array padded with NaN, otherwise a list of per surface
+                       arrays.  Both are views into buffers reused by the next read, so copy them to keep values.
+        :return: The node temperatures, in degrees Celsius
+        """
+        if not self.resolved:
+            self.resolve(state)
+        get_value = self.exchange.get_variable_value
+        values = self._values
+        for i, handle in enumerate(self.handles.tolist()):
+            values[i] = get_value(state, handle)
+        if padded:
+            self._padded[self._padded_index] = values
+            return self._padded
+        return [values[start:stop] for start, stop in zip(self.offsets[:-1].tolist(), self.offsets[1:].tolist())]
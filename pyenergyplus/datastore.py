@@ -0,0 +1,234 @@
+# EnergyPlus, Copyright (c) 1996-2024, The Board of Trustees of the University
+# of Illinois, The Regents of the University of California, through Lawrence
+# Berkeley National Laboratory (subject to receipt of any required approvals
+# from the U.S. Dept. of Energy), Oak Ridge National Laboratory, managed by UT-
+# Battelle, Alliance for Sustainable Energy, LLC, and other contributors. All
+# rights reserved.
+#
+# NOTICE: This Software was developed under funding from the U.S. Department of
+# Energy and the U.S. Government consequently retains certain rights. As such,
+# the U.S. Government has been granted for itself and others acting on its
+# behalf a paid-up, nonexclusive, irrevocable, worldwide license in the
+# Software to reproduce, distribute copies to the public, prepare derivative
+# works, and perform publicly and display publicly, and to permit others to do
+# so.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+# (3) Neither the name of the University of California, Lawrence Berkeley
+#     National Laboratory, the University of Illinois, U.S. Dept. of Energy nor
+#     the names of its contributors may be used to endorse or promote products
+#     derived from this software without specific prior written permission.
+#
+# (4) Use of EnergyPlus(TM) Name. If Licensee (i) distributes the software in
+#     stand-alone form without changes from the version obtained under this
+#     License, or (ii) Licensee makes a reference solely to the software
+#     portion of its product, Licensee must refer to the software as
+#     "EnergyPlus version X" software, where "X" is the version number Licensee
+#     obtained under this License and may not use a different name for the
+#     software. Except as specifically required in this Section (4), Licensee
+#     shall not use in a company name, a product name, in advertising,
+#     publicity, or other promotional activities any name, trade name,
+#     trademark, logo, or other designation of "EnergyPlus", "E+", "e+" or
+#     confusingly similar designation, without the U.S. Department of Energy's
+#     prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+from ctypes import c_void_p
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from pyenergyplus.common import EnergyPlusException
+from pyenergyplus.datatransfer import DataExchange
+
+
+class SharedDataStore:
+    """
+    A typed, array-backed store of named columns, shared by all Python Plugins in a simulation.  Plugins that cooperate,
+    such as a supervisor and several zone controllers, can exchange values through it without going through Python
+    objects or plugin global variables one value at a time.
+
+    Columns are declared with a name, a NumPy dtype, and an optional shape, typically from plugin constructors.  All
+    columns are stored in a single NumPy structured record, which is allocated the first time a column is accessed.
+    After that the layout is frozen and further declarations raise an EnergyPlusException.  Indexing the store by
+    column name returns a NumPy view into the record, so every plugin reads and writes the same memory without copies:
+
+        self.shared.declare('zone_setpoints', 'f8', (5,))
+        ...
+        setpoints = self.shared['zone_setpoints']
+        setpoints[:] = 21.0
+
+    Numeric columns can also be mirrored into plugin global variables, so that EMS programs, output variables and other
+    tools can see them.  A scalar column mirrors into one global variable, and a shaped column into one global variable
+    per element, in C order.  `push` writes every mirrored value to its global variable, and `pull` reads them back,
+    each in a single pass.
+    """
+
+    def __init__(self):
+        self._declared: Dict[str, Tuple[np.dtype, Tuple[int, ...]]] = {}
+        self._mirrors: Dict[str, List[str]] = {}
+        self._record: Optional[np.ndarray] = None
+        self._views: Dict[str, np.ndarray] = {}
+        self._mirror_handles: Optional[np.ndarray] = None
+        self._mirror_buffer: Optional[np.ndarray] = None
+
+    @property
+    def frozen(self) -> bool:
+        """
+        Whether the store layout is frozen, which happens the first time a column is accessed.
+        """
+        return self._record is not None
+
+    def declare(self, name: str, dtype='f8', shape: Union[int, Sequence[int]] = (),
+                mirror: Optional[Union[str, Sequence[str]]] = None) -> None:
+        """
+        Declares a column.  Declaring the same column again with the same dtype and shape is allowed, so that every
+        plugin using a column can declare it; a conflicting declaration raises an EnergyPlusException.
+
+        :param name: Name of the column
+        :param dtype: Anything accepted by numpy.dtype, defaulting to double precision floating point
+        :param shape: Shape of the column, defaulting to a scalar
+        :param mirror: Plugin global variable name(s) to mirror the column into, one name per element
+        :return: Nothing
+        """
+        dtype = np.dtype(dtype)
+        shape = (shape,) if isinstance(shape, int) else tuple(shape)
+        if name in self._declared:
+            if self._declared[name] != (dtype, shape):
+                raise EnergyPlusException(
+                    "Shared data column '{}' is already declared as {} {}, not {} {}".format(
+                        name, self._declared[name][0], self._declared[name][1], dtype, shape))
+        elif self.frozen:
+            raise EnergyPlusException(
+                "Shared data column '{}' cannot be declared after the store has been accessed".format(name))
+        else:
+            self._declared[name] = (dtype, shape)
+        if mirror is not None:
+            self._declare_mirror(name, dtype, shape, [mirror] if isinstance(mirror, str) else list(mirror))
+
+    def _declare_mirror(self, name: str, dtype: np.dtype, shape: Tuple[int, ...], global_names: List[str]) -> None:
+        if self.frozen:
+            raise EnergyPlusException(
+                "Shared data column '{}' cannot be mirrored after the store has been accessed".format(name))
+        if dtype.kind not in 'biuf':
+            raise EnergyPlusException(
+                "Shared data column '{}' has dtype {}, only numeric columns can be mirrored".format(name, dtype))
+        if len(global_names) != int(np.prod(shape)):
+            raise EnergyPlusException(
+                "Shared data column '{}' has {} elements but {} global variable names were given".format(
+                    name, int(np.prod(shape)), len(global_names)))
+        self._mirrors[name] = global_names
+
+    def freeze(self) -> None:
+        """
+        Allocates the record and freezes the layout.  This happens automatically on first access.
+
+        :return: Nothing
+        """
+        if self.frozen:
+            return
+        layout = np.dtype([(name, dtype, shape) for name, (dtype, shape) in self._declared.items()])
+        self._record = np.zeros((), dtype=layout)
+        self._views = {name: self._record[name] for name in self._declared}
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        self.freeze()
+        try:
+            return self._views[name]
+        except KeyError:
+            raise EnergyPlusException("Shared data column '{}' has not been declared".format(name)) from None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._declared
+
+    def columns(self) -> List[str]:
+        """
+        Returns the declared column names, in declaration order.
+
+        :return: A list of column names
+        """
+        return list(self._declared)
+
+    @property
+    def record(self) -> np.ndarray:
+        """
+        The underlying zero dimensional structured array holding every column.
+        """
+        self.freeze()
+        return self._record
+
+    def _resolve_mirrors(self, state: c_void_p, exchange: DataExchange) -> None:
+        handles = []
+        for name, global_names in self._mirrors.items():
+            for global_name in global_names:
+                handle = exchange.get_global_handle(state, global_name)
+                if handle == -1:
+                    raise EnergyPlusException(
+                        "Plugin global variable '{}' mirrored by shared data column '{}' was not found".format(
+                            global_name, name))
+                handles.append(handle)
+        self._mirror_handles = np.array(handles, dtype=np.intc)
+        self._mirror_buffer = np.empty(len(handles), dtype=np.float64)
+
+    def _gather(self) -> np.ndarray:
+        offset = 0
+        for name in self._mirrors:
+            values = self._views[name].reshape(-1)
+            self._mirror_buffer[offset:offset + values.size] = values
+            offset += values.size
+        return self._mirror_buffer
+
+    def _scatter(self) -> None:
+        offset = 0
+        for name in self._mirrors:
+            view = self._views[name]
+            view[...] = self._mirror_buffer[offset:offset + view.size].reshape(view.shape)
+            offset += view.size
+
+    def push(self, state: c_void_p, exchange: DataExchange) -> None:
+        """
+        Writes every mirrored column into its plugin global variables.  Global variable handles are looked up on the
+        first call, which should therefore happen once the API data is fully ready.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param exchange: The plugin DataExchange instance
+        :return: Nothing
+        """
+        self.freeze()
+        if self._mirror_handles is None:
+            self._resolve_mirrors(state, exchange)
+        exchange.set_global_values(state, self._mirror_handles, self._gather())
+
+    def pull(self, state: c_void_p, exchange: DataExchange) -> None:
+        """
+        Reads every mirrored column back from its plugin global variables.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param exchange: The plugin DataExchange instance
+        :return: Nothing
+        """
+        self.freeze()
+        if self._mirror_handles is None:
+            self._resolve_mirrors(state, exchange)
+        exchange.get_global_values(state, self._mirror_handles, out=self._mirror_buffer)
+        self._scatter()
@@ -54,10 +54,13 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 from ctypes import cdll, c_int, c_char_p, c_void_p, POINTER, Structure, byref
-from pyenergyplus.common import RealEP, EnergyPlusException, is_number
-from typing import List, Union
+from fnmatch import fnmatchcase
+from pyenergyplus.common import Prototype, RealEP, EnergyPlusException, is_number
+from typing import Dict, List, Optional, Tuple, Union
 from pathlib import Path
 
+import numpy as np
+
 class DataExchange:
     """
     This API class enables data transfer between EnergyPlus and a client.  Output variables and meters are treated as
@@ -123,180 +126,32 @@ class DataExchange:
         """
         self.api = api
         self.running_as_python_plugin = running_as_python_plugin
-        self.api.getAPIData.argtypes = [c_void_p, POINTER(c_int)]
-        self.api.getAPIData.restype = POINTER(DataExchange._APIDataEntry)
-        self.api.listAllAPIDataCSV.argtypes = [c_void_p]
-        self.api.listAllAPIDataCSV.restype = c_char_p
-        self.api.freeAPIData.argtypes = [POINTER(DataExchange._APIDataEntry), c_int]
-        self.api.freeAPIData.restype = c_void_p
-        self.api.getObjectNames.argtypes = [c_void_p, c_char_p, POINTER(c_int)]
-        self.api.getObjectNames.restype = POINTER(c_char_p)
-        self.api.freeObjectNames.argtypes = [POINTER(c_char_p), c_int]
-        self.api.freeObjectNames.restype = c_void_p
-        self.api.apiDataFullyReady.argtypes = [c_void_p]
-        self.api.apiDataFullyReady.restype = c_int
-        self.api.apiErrorFlag.argtypes = [c_void_p]
-        self.api.apiErrorFlag.restype = c_int
-        self.api.resetErrorFlag.argtypes = [c_void_p]
-        self.api.resetErrorFlag.restype = c_void_p
-        self.api.inputFilePath.argtypes = [c_void_p]
-        self.api.inputFilePath.restype = c_char_p
-        self.api.epwFilePath.argtypes = [c_void_p]
-        self.api.epwFilePath.restype = c_char_p
-        self.api.requestVariable.argtypes = [c_void_p, c_char_p, c_char_p]
-        self.api.getNumNodesInCondFDSurfaceLayer.argtypes = [c_void_p, c_char_p, c_char_p]
-        self.api.requestVariable.restype = c_void_p
-        self.api.getVariableHandle.argtypes = [c_void_p, c_char_p, c_char_p]
-        self.api.getVariableHandle.restype = c_int
-        self.api.getMeterHandle.argtypes = [c_void_p, c_char_p]
-        self.api.getMeterHandle.restype = c_int
-        self.api.getActuatorHandle.argtypes = [c_void_p, c_char_p, c_char_p, c_char_p]
-        self.api.getActuatorHandle.restype = c_int
-        self.api.getVariableValue.argtypes = [c_void_p, c_int]
-        self.api.getVariableValue.restype = RealEP
-        self.api.getMeterValue.argtypes = [c_void_p, c_int]
-        self.api.getMeterValue.restype = RealEP
-        self.api.setActuatorValue.argtypes = [c_void_p, c_int, RealEP]
-        self.api.setActuatorValue.restype = c_void_p
-        self.api.resetActuator.argtypes = [c_void_p, c_int]
-        self.api.resetActuator.restype = c_void_p
-        self.api.getActuatorValue.argtypes = [c_void_p, c_int]
-        self.api.getActuatorValue.restype = RealEP
-        self.api.getInternalVariableHandle.argtypes = [c_void_p, c_char_p, c_char_p]
-        self.api.getInternalVariableHandle.restype = c_int
-        self.api.getInternalVariableValue.argtypes = [c_void_p, c_int]
-        self.api.getInternalVariableValue.restype = RealEP
-        # some simulation data values are available for plugins or regular runtime calls
-        self.api.year.argtypes = [c_void_p]
-        self.api.year.restype = c_int
-        self.api.calendarYear.argtypes = [c_void_p]
-        self.api.calendarYear.restype = c_int
-        self.api.month.argtypes = [c_void_p]
-        self.api.month.restype = c_int
-        self.api.dayOfMonth.argtypes = [c_void_p]
-        self.api.dayOfMonth.restype = c_int
-        self.api.dayOfWeek.argtypes = [c_void_p]
-        self.api.dayOfWeek.restype = c_int
-        self.api.dayOfYear.argtypes = [c_void_p]
-        self.api.dayOfYear.restype = c_int
-        self.api.daylightSavingsTimeIndicator.argtypes = [c_void_p]
-        self.api.daylightSavingsTimeIndicator.restype = c_int
-        self.api.hour.argtypes = [c_void_p]
-        self.api.hour.restype = c_int
-        self.api.numTimeStepsInHour.argtypes = [c_void_p]
-        self.api.numTimeStepsInHour.restype = c_int
-        self.api.zoneTimeStepNum.argtypes = [c_void_p]
-        self.api.zoneTimeStepNum.restype = c_int
-        self.api.currentTime.argtypes = [c_void_p]
-        self.api.currentTime.restype = RealEP
-        self.api.minutes.argtypes = [c_void_p]
-        self.api.minutes.restype = c_int
-        self.api.holidayIndex.argtypes = [c_void_p]
-        self.api.holidayIndex.restype = c_int
-        self.api.sunIsUp.argtypes = [c_void_p]
-        self.api.sunIsUp.restype = c_int
-        self.api.isRaining.argtypes = [c_void_p]
-        self.api.isRaining.restype = c_int
-        self.api.zoneTimeStep.argtypes = [c_void_p]
-        self.api.zoneTimeStep.restype = RealEP
-        self.api.systemTimeStep.argtypes = [c_void_p]
-        self.api.systemTimeStep.restype = RealEP
-        self.api.currentEnvironmentNum.argtypes = [c_void_p]
-        self.api.currentEnvironmentNum.restype = c_int
-        self.api.warmupFlag.argtypes = [c_void_p]
-        self.api.warmupFlag.restype = c_int
-        self.api.getEMSGlobalVariableHandle.argtypes = [c_void_p, c_char_p]
-        self.api.getEMSGlobalVariableHandle.restype = c_int
-        self.api.getEMSGlobalVariableValue.argtypes = [c_void_p, c_int]
-        self.api.getEMSGlobalVariableValue.restype = RealEP
-        self.api.setEMSGlobalVariableValue.argtypes = [c_void_p, c_int, RealEP]
-        self.api.setEMSGlobalVariableValue.restype = c_void_p
-        self.api.getPluginGlobalVariableHandle.argtypes = [c_void_p, c_char_p]
-        self.api.getPluginGlobalVariableHandle.restype = c_int
-        self.api.getPluginGlobalVariableValue.argtypes = [c_void_p, c_int]
-        self.api.getPluginGlobalVariableValue.restype = RealEP
-        self.api.setPluginGlobalVariableValue.argtypes = [c_void_p, c_int, RealEP]
-        self.api.setPluginGlobalVariableValue.restype = c_void_p
-        self.api.getPluginTrendVariableHandle.argtypes = [c_void_p, c_char_p]
-        self.api.getPluginTrendVariableHandle.restype = c_int
-        self.api.getPluginTrendVariableValue.argtypes = [c_void_p, c_int, c_int]
-        self.api.getPluginTrendVariableValue.restype = RealEP
-        self.api.getPluginTrendVariableAverage.argtypes = [c_void_p, c_int, c_int]
-        self.api.getPluginTrendVariableAverage.restype = RealEP
-        self.api.getPluginTrendVariableMin.argtypes = [c_void_p, c_int, c_int]
-        self.api.getPluginTrendVariableMin.restype = RealEP
-        self.api.getPluginTrendVariableMax.argtypes = [c_void_p, c_int, c_int]
-        self.api.getPluginTrendVariableMax.restype = RealEP
-        self.api.getPluginTrendVariableSum.argtypes = [c_void_p, c_int, c_int]
-        self.api.getPluginTrendVariableSum.restype = RealEP
-        self.api.getPluginTrendVariableDirection.argtypes = [c_void_p, c_int, c_int]
-        self.api.getPluginTrendVariableDirection.restype = RealEP
-        self.api.getConstructionHandle.argtypes = [c_void_p, c_char_p]
-        self.api.getConstructionHandle.restype = c_int
-        self.api.actualTime.argtypes = [c_void_p]
-        self.api.actualTime.restype = c_int
-        self.api.actualDateTime.argtypes = [c_void_p]
-        self.api.actualDateTime.restype = c_int
-        self.api.kindOfSim.argtypes = [c_void_p]
-        self.api.kindOfSim.restype = c_int
-        self.api.todayWeatherIsRainAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.todayWeatherIsRainAtTime.restype = c_int
-        self.api.todayWeatherIsSnowAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.todayWeatherIsSnowAtTime.restype = c_int
-        self.api.todayWeatherOutDryBulbAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.todayWeatherOutDryBulbAtTime.restype = RealEP
-        self.api.todayWeatherOutDewPointAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.todayWeatherOutDewPointAtTime.restype = RealEP
-        self.api.todayWeatherOutBarometricPressureAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.todayWeatherOutBarometricPressureAtTime.restype = RealEP
-        self.api.todayWeatherOutRelativeHumidityAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.todayWeatherOutRelativeHumidityAtTime.restype = RealEP
-        self.api.todayWeatherWindSpeedAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.todayWeatherWindSpeedAtTime.restype = RealEP
-        self.api.todayWeatherWindDirectionAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.todayWeatherWindDirectionAtTime.restype = RealEP
-        self.api.todayWeatherSkyTemperatureAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.todayWeatherSkyTemperatureAtTime.restype = RealEP
-        self.api.todayWeatherHorizontalIRSkyAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.todayWeatherHorizontalIRSkyAtTime.restype = RealEP
-        self.api.todayWeatherBeamSolarRadiationAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.todayWeatherBeamSolarRadiationAtTime.restype = RealEP
-        self.api.todayWeatherDiffuseSolarRadiationAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.todayWeatherDiffuseSolarRadiationAtTime.restype = RealEP
-        self.api.todayWeatherAlbedoAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.todayWeatherAlbedoAtTime.restype = RealEP
-        self.api.todayWeatherLiquidPrecipitationAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.todayWeatherLiquidPrecipitationAtTime.restype = RealEP
-        self.api.tomorrowWeatherIsRainAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.tomorrowWeatherIsRainAtTime.restype = c_int
-        self.api.tomorrowWeatherIsSnowAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.tomorrowWeatherIsSnowAtTime.restype = c_int
-        self.api.tomorrowWeatherOutDryBulbAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.tomorrowWeatherOutDryBulbAtTime.restype = RealEP
-        self.api.tomorrowWeatherOutDewPointAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.tomorrowWeatherOutDewPointAtTime.restype = RealEP
-        self.api.tomorrowWeatherOutBarometricPressureAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.tomorrowWeatherOutBarometricPressureAtTime.restype = RealEP
-        self.api.tomorrowWeatherOutRelativeHumidityAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.tomorrowWeatherOutRelativeHumidityAtTime.restype = RealEP
-        self.api.tomorrowWeatherWindSpeedAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.tomorrowWeatherWindSpeedAtTime.restype = RealEP
-        self.api.tomorrowWeatherWindDirectionAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.tomorrowWeatherWindDirectionAtTime.restype = RealEP
-        self.api.tomorrowWeatherSkyTemperatureAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.tomorrowWeatherSkyTemperatureAtTime.restype = RealEP
-        self.api.tomorrowWeatherHorizontalIRSkyAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.tomorrowWeatherHorizontalIRSkyAtTime.restype = RealEP
-        self.api.tomorrowWeatherBeamSolarRadiationAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.tomorrowWeatherBeamSolarRadiationAtTime.restype = RealEP
-        self.api.tomorrowWeatherDiffuseSolarRadiationAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.tomorrowWeatherDiffuseSolarRadiationAtTime.restype = RealEP
-        self.api.tomorrowWeatherAlbedoAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.tomorrowWeatherAlbedoAtTime.restype = RealEP
-        self.api.tomorrowWeatherLiquidPrecipitationAtTime.argtypes = [c_void_p, c_int, c_int]
-        self.api.tomorrowWeatherLiquidPrecipitationAtTime.restype = RealEP
-        self.api.currentSimTime.argtypes = [c_void_p]
-        self.api.currentSimTime.restype = RealEP
+        #: A cache of the static internal variable values, see InternalVariableCache
+        self.internal_variables = InternalVariableCache(self)
+        #: A write-back buffer for actuator values, see ActuatorBuffer
+        self.actuator_buffer = ActuatorBuffer(self)
+        #: The opt-in sensor value cache, None unless enabled with enable_value_cache
+        self.value_cache: Optional[SensorValueCache] = None
+
+    def enable_value_cache(self) -> 'SensorValueCache':
+        """
+        Enables the opt-in read-through cache of variable and meter values, see SensorValueCache.  In API workflows,
+        use `EnergyPlusAPI.enable_value_cache` instead, which also lets the Runtime callbacks drive the cache, and
+        enable it before registering callbacks.
+
+        :return: The enabled cache, which also holds its hit rate counters
+        """
+        if self.value_cache is None:
+            self.value_cache = SensorValueCache(self)
+        return self.value_cache
+
+    def disable_value_cache(self) -> None:
+        """
+        Disables the sensor value cache, so that every read calls into EnergyPlus again.
+
+        :return: Nothing
+        """
+        self.value_cache = None
 
     def get_api_data(self, state: c_void_p) -> List[APIDataExchangePoint]:
         """
@@ -582,6 +437,8 @@ class DataExchange:
             raise EnergyPlusException(
                 "`get_variable_value` expects `variable_handle` as an `int`, not "
                 "'{}'".format(variable_handle))
+        if self.value_cache is not None:
+            return self.value_cache.get(self.api.getVariableValue, state, variable_handle)
         return self.api.getVariableValue(state, variable_handle)
 
     def get_meter_value(self, state: c_void_p, meter_handle: int) -> float:
@@ -602,6 +459,8 @@ class DataExchange:
             raise EnergyPlusException(
                 "`get_meter_value` expects `meter_handle` as an `int`, not "
                 "'{}'".format(meter_handle))
+        if self.value_cache is not None:
+            return self.value_cache.get(self.api.getMeterValue, state, meter_handle)
         return self.api.getMeterValue(state, meter_handle)
 
     def set_actuator_value(self, state: c_void_p, actuator_handle: int, actuator_value: float) -> None:
@@ -811,6 +670,72 @@ class DataExchange:
                 "'{}'".format(value))
         self.api.setEMSGlobalVariableValue(state, handle, value)
 
+    @staticmethod
+    def _handle_array(handles, function_name: str) -> np.ndarray:
+        handles = np.asarray(handles)
+        if handles.size and handles.dtype.kind not in 'iu':
+            raise EnergyPlusException(
+                "`{}` expects `handles` as an array of `int`, not dtype "
+                "'{}'".format(function_name, handles.dtype))
+        return handles.reshape(-1)
+
+    @staticmethod
+    def _value_array(values, size: int, function_name: str) -> np.ndarray:
+        values = np.asarray(values)
+        if values.size and values.dtype.kind not in 'biuf':
+            raise EnergyPlusException(
+                "`{}` expects `values` as an array of `float`, not dtype "
+                "'{}'".format(function_name, values.dtype))
+        if values.size != size:
+            raise EnergyPlusException(
+                "`{}` expects one value per handle, got {} values for {} handles".format(
+                    function_name, values.size, size))
+        return values.reshape(-1)
+
+    @staticmethod
+    def _out_array(out: Optional[np.ndarray], size: int, function_name: str) -> np.ndarray:
+        if out is None:
+            return np.empty(size, dtype=np.float64)
+        if not isinstance(out, np.ndarray) or out.size != size or out.dtype.kind != 'f' or not out.flags.c_contiguous:
+            raise EnergyPlusException(
+                "`{}` expects `out` as a contiguous floating point array with one element per handle".format(
+                    function_name))
+        return out
+
+    def get_ems_global_values(self, state: c_void_p, handles, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Get the current values of many EMS global variables in a running simulation in one call.  This is the batch
+        version of `get_ems_global_value`: the arguments are checked once for the whole array rather than per value.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param handles: An integer array (or sequence) of handles returned from the `get_ems_global_handle` function.
+        :param out: An optional floating point array with one element per handle to fill, avoiding an allocation
+        :return: An array of the EMS global variable values, `out` if it was given
+        """
+        handles = self._handle_array(handles, 'get_ems_global_values')
+        out = self._out_array(out, handles.size, 'get_ems_global_values')
+        get_value = self.api.getEMSGlobalVariableValue
+        flat = out.reshape(-1)
+        for i, handle in enumerate(handles.tolist()):
+            flat[i] = get_value(state, handle)
+        return out
+
+    def set_ems_global_values(self, state: c_void_p, handles, values) -> None:
+        """
+        Set the current values of many EMS global variables in a running simulation in one call.  This is the batch
+        version of `set_ems_global_value`: the arguments are checked once for the whole array rather than per value.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param handles: An integer array (or sequence) of handles returned from the `get_ems_global_handle` function.
+        :param values: A floating point array (or sequence) with one value per handle
+        :return: Nothing
+        """
+        handles = self._handle_array(handles, 'set_ems_global_values')
+        values = self._value_array(values, handles.size, 'set_ems_global_values')
+        set_value = self.api.setEMSGlobalVariableValue
+        for handle, value in zip(handles.tolist(), values.tolist()):
+            set_value(state, handle, value)
+
     def get_global_handle(self, state: c_void_p, var_name: Union[str, bytes]) -> int:
         """
         Get a handle to a global variable in a running simulation.  This is only used for Python Plugin applications!
@@ -892,6 +817,46 @@ class DataExchange:
                 "'{}'".format(value))
         self.api.setPluginGlobalVariableValue(state, handle, value)
 
+    def get_global_values(self, state: c_void_p, handles, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Get the current values of many plugin global variables in a running simulation in one call.  This is only used
+        for Python Plugin applications!  This is the batch version of `get_global_value`: the arguments are checked
+        once for the whole array rather than per value.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param handles: An integer array (or sequence) of handles returned from the `get_global_handle` function.
+        :param out: An optional floating point array with one element per handle to fill, avoiding an allocation
+        :return: An array of the global variable values, `out` if it was given
+        """
+        if not self.running_as_python_plugin:
+            raise EnergyPlusException("get_global_values is only available as part of a Python Plugin workflow")
+        handles = self._handle_array(handles, 'get_global_values')
+        out = self._out_array(out, handles.size, 'get_global_values')
+        get_value = self.api.getPluginGlobalVariableValue
+        flat = out.reshape(-1)
+        for i, handle in enumerate(handles.tolist()):
+            flat[i] = get_value(state, handle)
+        return out
+
+    def set_global_values(self, state: c_void_p, handles, values) -> None:
+        """
+        Set the current values of many plugin global variables in a running simulation in one call.  This is only used
+        for Python Plugin applications!  This is the batch version of `set_global_value`: the arguments are checked
+        once for the whole array rather than per value.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param handles: An integer array (or sequence) of handles returned from the `get_global_handle` function.
+        :param values: A floating point array (or sequence) with one value per handle
+        :return: Nothing
+        """
+        if not self.running_as_python_plugin:
+            raise EnergyPlusException("set_global_values is only available as part of a Python Plugin workflow")
+        handles = self._handle_array(handles, 'set_global_values')
+        values = self._value_array(values, handles.size, 'set_global_values')
+        set_value = self.api.setPluginGlobalVariableValue
+        for handle, value in zip(handles.tolist(), values.tolist()):
+            set_value(state, handle, value)
+
     def get_trend_handle(self, state: c_void_p, trend_var_name: Union[str, bytes]) -> int:
         """
         Get a handle to a trend variable in a running simulation.  This is only used for Python Plugin applications!
@@ -952,6 +917,56 @@ class DataExchange:
                 "'{}'".format(time_index))
         return self.api.getPluginTrendVariableValue(state, trend_handle, time_index)
 
+    def get_trend_history(self, state: c_void_p, trend_handle: int, count: int,
+                          out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Get the most recent history of a plugin trend variable as an array.  Element i holds the value at time index
+        i + 1, so element 0 is the most recent value, matching `get_trend_value`.  The value of count must be less than
+        or equal to the number of history terms specified in the matching PythonPlugin:TrendVariable object declaration
+        in the input file.  This is only used for Python Plugin applications!
+
+        The arguments are checked once for the whole history, and the values are gathered directly into the array, so
+        this is much cheaper than calling `get_trend_value` once per time index.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param trend_handle: An integer returned from the `get_trend_handle` function.
+        :param count: The number of time steps of history to return.
+        :param out: An optional contiguous floating point array of `count` elements to fill, avoiding an allocation
+        :return: An array of shape (count,) holding the trend history, sharing memory with `out` if it was given
+        """
+        return self.get_trend_histories(state, [trend_handle], count, out).reshape(-1)
+
+    def get_trend_histories(self, state: c_void_p, trend_handles, count: int,
+                            out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Get the most recent history of several plugin trend variables as one array, the multi-handle version of
+        `get_trend_history`.  Row j holds the history of the j-th handle, most recent value first.  This is only used
+        for Python Plugin applications!
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param trend_handles: An integer array (or sequence) of handles returned from the `get_trend_handle` function.
+        :param count: The number of time steps of history to return for every trend variable.
+        :param out: An optional contiguous floating point array of shape (handles, count) to fill
+        :return: An array of shape (handles, count) holding the trend histories, `out` if it was given
+        """
+        if not self.running_as_python_plugin:
+            raise EnergyPlusException("get_trend_histories is only available as part of a Python Plugin workflow")
+        if not is_number(count) or count < 0:
+            raise EnergyPlusException(
+                "`get_trend_histories` expects `count` as a non-negative `int`, not "
+                "'{}'".format(count))
+        handles = self._handle_array(trend_handles, 'get_trend_histories')
+        count = int(count)
+        flat = self._out_array(out, handles.size * count, 'get_trend_histories').reshape(-1)
+        get_value = self.api.getPluginTrendVariableValue
+        time_indices = range(1, count + 1)
+        position = 0
+        for handle in handles.tolist():
+            for time_index in time_indices:
+                flat[position] = get_value(state, handle, time_index)
+                position += 1
+        return flat.reshape(handles.size, count) if out is None else out
+
     def get_trend_average(self, state: c_void_p, trend_handle: int, count: int) -> float:
         """
         Get the average of a plugin trend variable over a specific history set.  The count argument specifies how
@@ -1640,3 +1655,456 @@ class DataExchange:
         :return: Value of the simulation time from the start of the environment in fractional hours
         """
         return self.api.currentSimTime(state)
+
+
+class InternalVariableCache:
+    """
+    Internal variables, such as zone floor area and volume, are constant once they are assigned, so this cache reads
+    each requested internal variable once, after the API data is fully ready, and then serves the values from a NumPy
+    array.  Every DataExchange instance owns one, as `exchange.internal_variables`.
+
+    Variables are requested by type and key, either of which may be a case-insensitive shell-style pattern such as
+    "Zone Floor Area" and "*", which is expanded against the internal variables listed by `get_api_data` when the
+    cache is loaded.  The cache loads itself on the first lookup, and is kept separately for each state.  It is
+    cleared for a state when that state is reset or deleted through the StateManager of the same EnergyPlusAPI, as the
+    values can change from one run to the next.
+    """
+
+    def __init__(self, exchange: DataExchange):
+        """
+        Creates a new, empty, internal variable cache.
+
+        :param exchange: The DataExchange instance to read through
+        """
+        self.exchange = exchange
+        self.requests: List[Tuple[str, str]] = []
+        self._loaded: Dict[object, Tuple[List[Tuple[str, str]], Dict[Tuple[str, str], int], np.ndarray]] = {}
+
+    @staticmethod
+    def _matches(name: Tuple[str, str], type_pattern: str, key_pattern: str) -> bool:
+        return fnmatchcase(name[0].upper(), type_pattern.upper()) and fnmatchcase(name[1].upper(), key_pattern.upper())
+
+    @staticmethod
+    def _state_key(state: c_void_p):
+        return state.value if isinstance(state, c_void_p) else state
+
+    def request(self, variable_type: str, variable_key: str = '*') -> None:
+        """
+        Requests internal variables to be cached.  Requests made after the cache of a state is loaded only take effect
+        once that cache is cleared.
+
+        :param variable_type: The internal variable type, e.g. "Zone Floor Area", or a pattern
+        :param variable_key: The instance of the variable, e.g. "Zone 1", or a pattern, defaulting to every instance
+        :return: Nothing
+        """
+        self.requests.append((variable_type, variable_key))
+
+    def load(self, state: c_void_p) -> None:
+        """
+        Reads every requested internal variable of a state into the cache.  This is done automatically on the first
+        lookup.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :return: Nothing
+        """
+        if not self.exchange.api_data_fully_ready(state):
+            raise EnergyPlusException("Internal variables can only be cached once the API data is fully ready")
+        available = [
+            (point.name, point.key) for point in self.exchange.get_api_data(state) if point.what == 'InternalVariable'
+        ]
+        names = []
+        for type_pattern, key_pattern in self.requests:
+            matches = [name for name in available if self._matches(name, type_pattern, key_pattern)]
+            if not matches:
+                raise EnergyPlusException(
+                    "No internal variables match type '{}' and key '{}'".format(type_pattern, key_pattern))
+            names.extend(m for m in matches if m not in names)
+        values = np.empty(len(names))
+        for i, (variable_type, variable_key) in enumerate(names):
+            handle = self.exchange.get_internal_variable_handle(state, variable_type, variable_key)
+            values[i] = self.exchange.get_internal_variable_value(state, handle)
+        index = {(t.upper(), k.upper()): i for i, (t, k) in enumerate(names)}
+        values.setflags(write=False)
+        self._loaded[self._state_key(state)] = (names, index, values)
+
+    def _table(self, state: c_void_p):
+        key = self._state_key(state)
+        if key not in self._loaded:
+            self.load(state)
+        return self._loaded[key]
+
+    def value(self, state: c_void_p, variable_type: str, variable_key: str) -> float:
+        """
+        Returns one cached internal variable value.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param variable_type: The internal variable type, e.g. "Zone Floor Area"
+        :param variable_key: The instance of the variable, e.g. "Zone 1"
+        :return: The internal variable value
+        """
+        _, index, values = self._table(state)
+        try:
+            return float(values[index[(variable_type.upper(), variable_key.upper())]])
+        except KeyError:
+            raise EnergyPlusException(
+                "Internal variable '{}' for '{}' was not requested".format(variable_type, variable_key)) from None
+
+    def lookup(self, state: c_void_p, variable_type: str = '*',
+               variable_key: str = '*') -> Tuple[List[Tuple[str, str]], np.ndarray]:
+        """
+        Returns every cached internal variable matching a type and key pattern.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param variable_type: A case-insensitive pattern for the internal variable type
+        :param variable_key: A case-insensitive pattern for the instance of the variable
+        :return: A list of matching (type, key) names, and an array of their values in the same order
+        """
+        names, _, values = self._table(state)
+        selected = [i for i, name in enumerate(names) if self._matches(name, variable_type, variable_key)]
+        return [names[i] for i in selected], values[selected]
+
+    def clear(self, state: Optional[c_void_p] = None) -> None:
+        """
+        Clears the cache of one state, or of every state.
+
+        :param state: The state to clear, or None to clear all of them
+        :return: Nothing
+        """
+        if state is None:
+            self._loaded.clear()
+        else:
+            self._loaded.pop(self._state_key(state), None)
+
+
+class ActuatorBuffer:
+    """
+    A write-back buffer for actuator values.  Controllers often write the same actuator value every timestep, and each
+    write is a call into EnergyPlus.  Instead, controllers can write to this buffer as often as they like, and the
+    buffer is flushed once per timestep, at a calling point chosen by the client, writing only the actuators whose
+    values changed since they were last flushed.  Every DataExchange instance owns one, as `exchange.actuator_buffer`.
+
+    Actuator values persist inside EnergyPlus once set, which is what makes skipping unchanged values safe.  Anything
+    that releases or overrides actuators behind the back of the buffer, such as calling `reset_actuator` directly, must
+    be followed by `invalidate`, so that the next flush writes every buffered value again.  The buffer is invalidated
+    automatically when a state is reset or deleted through the StateManager of the same EnergyPlusAPI.
+
+    Counters are kept for the number of buffered writes, the number of values actually flushed to EnergyPlus, and the
+    number of writes avoided, either because the value was unchanged or because it was overwritten before a flush.
+    """
+
+    def __init__(self, exchange: DataExchange):
+        """
+        Creates a new, empty, actuator buffer.
+
+        :param exchange: The DataExchange instance to flush through
+        """
+        self.exchange = exchange
+        self.pending: Dict[int, float] = {}
+        self.flushed: Dict[int, float] = {}
+        self.writes = 0
+        self.flushes = 0
+        self.avoided = 0
+
+    def set(self, actuator_handle: int, actuator_value: float) -> None:
+        """
+        Buffers a new actuator value, to be written at the next flush.  A NaN value resets the actuator at the flush,
+        handing control back to EnergyPlus.
+
+        :param actuator_handle: An integer returned from the `get_actuator_handle` function.
+        :param actuator_value: The floating point value to assign to the actuator
+        :return: Nothing
+        """
+        if not is_number(actuator_handle):
+            raise EnergyPlusException(
+                "`ActuatorBuffer.set` expects `actuator_handle` as an `int`, not "
+                "'{}'".format(actuator_handle))
+        if not is_number(actuator_value):
+            raise EnergyPlusException(
+                "`ActuatorBuffer.set` expects `actuator_value` as a `float`, not "
+                "'{}'".format(actuator_value))
+        self.pending[int(actuator_handle)] = float(actuator_value)
+        self.writes += 1
+
+    def set_many(self, actuator_handles, actuator_values) -> None:
+        """
+        Buffers new values for many actuators, the batch version of `set`.
+
+        :param actuator_handles: An integer array (or sequence) of handles returned from `get_actuator_handle`
+        :param actuator_values: A floating point array (or sequence) with one value per handle
+        :return: Nothing
+        """
+        handles = DataExchange._handle_array(actuator_handles, 'ActuatorBuffer.set_many')
+        values = DataExchange._value_array(actuator_values, handles.size, 'ActuatorBuffer.set_many')
+        self.pending.update(zip(handles.tolist(), values.astype(np.float64).tolist()))
+        self.writes += handles.size
+
+    def reset(self, actuator_handle: int) -> None:
+        """
+        Buffers a reset of an actuator, handing control back to EnergyPlus at the next flush.
+
+        :param actuator_handle: An integer returned from the `get_actuator_handle` function.
+        :return: Nothing
+        """
+        self.set(actuator_handle, float('nan'))
+
+    def flush(self, state: c_void_p, force: bool = False) -> int:
+        """
+        Writes every buffered actuator value that differs from the value last flushed for that actuator.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param force: If True, write every buffered value, even if unchanged
+        :return: The number of values written to EnergyPlus
+        """
+        flushed = self.flushed
+        set_actuator_value = self.exchange.api.setActuatorValue
+        written = 0
+        for handle, value in self.pending.items():
+            previous = flushed.get(handle)
+            # NaN marks a reset and compares unequal to itself, so two resets in a row are checked separately
+            if not force and previous is not None and (previous == value or (previous != previous and value != value)):
+                continue
+            if value != value:
+                self.exchange.reset_actuator(state, handle)
+            else:
+                set_actuator_value(state, handle, value)
+            flushed[handle] = value
+            written += 1
+        # every buffered write has now either been flushed or avoided
+        self.flushes += written
+        self.avoided = self.writes - self.flushes
+        self.pending.clear()
+        return written
+
+    def invalidate(self, state: Optional[c_void_p] = None) -> None:
+        """
+        Forgets the values last flushed, so that the next flush writes every buffered value.  Pending values are kept.
+
+        :param state: Accepted so that this can be used as a StateManager reset listener, not used
+        :return: Nothing
+        """
+        self.flushed.clear()
+
+    def register_flush(self, state: c_void_p, runtime, callback_name: str) -> None:
+        """
+        Registers `flush` as a Runtime API callback at a chosen calling point, for API workflows.  Callbacks at the
+        same calling point are called in registration order, so register this after the controller callbacks that
+        write to the buffer.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param runtime: The Runtime instance of the same EnergyPlusAPI
+        :param callback_name: The name of a Runtime callback registration method, such as
+                              'callback_begin_system_timestep_before_predictor'
+        :return: Nothing
+        """
+        register = getattr(runtime, callback_name, None)
+        if not callback_name.startswith('callback_') or register is None:
+            raise EnergyPlusException("Unknown Runtime callback registration method '{}'".format(callback_name))
+
+        def flush(callback_state):
+            self.flush(callback_state)
+        register(state, flush)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the counters of this buffer.
+
+        :return: A dictionary with the buffered writes, the values flushed, the writes avoided, and the avoided rate
+        """
+        return {'writes': self.writes, 'flushes': self.flushes, 'avoided': self.avoided,
+                'avoided_rate': self.avoided / self.writes if self.writes else 0.0}
+
+
+class SensorValueCache:
+    """
+    A read-through cache of variable and meter values, for workflows where several components, such as a controller, a
+    reward calculation, a logger and a recorder, read the same handles during the same timestep.  It is enabled with
+    `DataExchange.enable_value_cache`, after which `get_variable_value` and `get_meter_value` go through it.  It is also
+    the cache behind the SensorCache that Python Plugins share.
+
+    Values are cached by handle for the current round of callbacks.  A round starts when a callback is called at a
+    different calling point than the previous one, or when a callback is called again at the same calling point.  Every
+    advance of the zone timestep or of an HVAC system sub-timestep happens between rounds, so this invalidates at least
+    whenever (current simulation time, system timestep) changes.  It is deliberately stricter than keying on that time
+    stamp, which would serve stale values between calling points within a timestep, on the repeated calls inside the
+    HVAC system iteration loop, and on repeated warmup days.  Detecting rounds also needs no calls into EnergyPlus.
+
+    The start of a round is reported by the Runtime callbacks registered after `EnergyPlusAPI.enable_value_cache`, or by
+    the `on_*` methods of Python Plugins.  Reads made outside of any callback are passed through uncached.
+    """
+
+    def __init__(self, exchange: DataExchange):
+        """
+        Creates a new, empty, sensor value cache.
+
+        :param exchange: The DataExchange instance the cache belongs to
+        """
+        self.exchange = exchange
+        self.values: Dict[Tuple[object, int], float] = {}
+        self.calling_point: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.active = False
+        self._called = set()
+
+    def begin_callback(self, callback: object, calling_point: str) -> None:
+        """
+        Records that a callback is about to run at a calling point, starting a new round if needed.
+
+        :param callback: The callback (or plugin instance) being called, used to detect repeated calls
+        :param calling_point: The name of the calling point
+        :return: Nothing
+        """
+        key = (id(callback), calling_point)
+        if calling_point != self.calling_point or key in self._called:
+            self.calling_point = calling_point
+            self._called.clear()
+            if self.values:
+                self.values.clear()
+                self.invalidations += 1
+        self._called.add(key)
+        self.active = True
+
+    def end_callback(self) -> None:
+        """
+        Records that a callback has returned, so that reads are passed through uncached until the next callback.  The
+        current round is kept, so callbacks that follow at the same calling point still share its values.
+
+        :return: Nothing
+        """
+        self.active = False
+
+    def invalidate(self) -> None:
+        """
+        Empties the cache and starts a new round, so that the next read of every handle calls into EnergyPlus.
+
+        :return: Nothing
+        """
+        self._called.clear()
+        if self.values:
+            self.values.clear()
+            self.invalidations += 1
+
+    def get(self, function, state: c_void_p, handle: int) -> float:
+        """
+        Returns a cached value, calling `function(state, handle)` on a miss.
+
+        :param function: The bound library function reading the value, getVariableValue or getMeterValue
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param handle: The variable or meter handle
+        :return: The current value
+        """
+        if not self.active:
+            return function(state, handle)
+        key = (function, handle)
+        try:
+            value = self.values[key]
+            self.hits += 1
+        except KeyError:
+            value = self.values[key] = function(state, handle)
+            self.misses += 1
+        return value
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the counters of this cache.
+
+        :return: A dictionary with the hits, misses, invalidations, and hit rate of the cache
+        """
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'invalidations': self.invalidations,
+                'hit_rate': self.hits / total if total else 0.0}
+
+
+class DataExchangePrototypes:
+    """
+    Declares the ctypes prototypes of the functions used by DataExchange.
+    """
+
+    getAPIData = Prototype([c_void_p, POINTER(c_int)], POINTER(DataExchange._APIDataEntry))
+    listAllAPIDataCSV = Prototype([c_void_p], c_char_p)
+    freeAPIData = Prototype([POINTER(DataExchange._APIDataEntry), c_int], c_void_p)
+    getObjectNames = Prototype([c_void_p, c_char_p, POINTER(c_int)], POINTER(c_char_p))
+    freeObjectNames = Prototype([POINTER(c_char_p), c_int], c_void_p)
+    apiDataFullyReady = Prototype([c_void_p], c_int)
+    apiErrorFlag = Prototype([c_void_p], c_int)
+    resetErrorFlag = Prototype([c_void_p], c_void_p)
+    inputFilePath = Prototype([c_void_p], c_char_p)
+    epwFilePath = Prototype([c_void_p], c_char_p)
+    requestVariable = Prototype([c_void_p, c_char_p, c_char_p], c_void_p)
+    getNumNodesInCondFDSurfaceLayer = Prototype([c_void_p, c_char_p, c_char_p], c_int)
+    getVariableHandle = Prototype([c_void_p, c_char_p, c_char_p], c_int)
+    getMeterHandle = Prototype([c_void_p, c_char_p], c_int)
+    getActuatorHandle = Prototype([c_void_p, c_char_p, c_char_p, c_char_p], c_int)
+    getVariableValue = Prototype([c_void_p, c_int], RealEP)
+    getMeterValue = Prototype([c_void_p, c_int], RealEP)
+    setActuatorValue = Prototype([c_void_p, c_int, RealEP], c_void_p)
+    resetActuator = Prototype([c_void_p, c_int], c_void_p)
+    getActuatorValue = Prototype([c_void_p, c_int], RealEP)
+    getInternalVariableHandle = Prototype([c_void_p, c_char_p, c_char_p], c_int)
+    getInternalVariableValue = Prototype([c_void_p, c_int], RealEP)
+    year = Prototype([c_void_p], c_int)
+    calendarYear = Prototype([c_void_p], c_int)
+    month = Prototype([c_void_p], c_int)
+    dayOfMonth = Prototype([c_void_p], c_int)
+    dayOfWeek = Prototype([c_void_p], c_int)
+    dayOfYear = Prototype([c_void_p], c_int)
+    daylightSavingsTimeIndicator = Prototype([c_void_p], c_int)
+    hour = Prototype([c_void_p], c_int)
+    numTimeStepsInHour = Prototype([c_void_p], c_int)
+    zoneTimeStepNum = Prototype([c_void_p], c_int)
+    currentTime = Prototype([c_void_p], RealEP)
+    minutes = Prototype([c_void_p], c_int)
+    holidayIndex = Prototype([c_void_p], c_int)
+    sunIsUp = Prototype([c_void_p], c_int)
+    isRaining = Prototype([c_void_p], c_int)
+    zoneTimeStep = Prototype([c_void_p], RealEP)
+    systemTimeStep = Prototype([c_void_p], RealEP)
+    currentEnvironmentNum = Prototype([c_void_p], c_int)
+    warmupFlag = Prototype([c_void_p], c_int)
+    getEMSGlobalVariableHandle = Prototype([c_void_p, c_char_p], c_int)
+    getEMSGlobalVariableValue = Prototype([c_void_p, c_int], RealEP)
+    setEMSGlobalVariableValue = Prototype([c_void_p, c_int, RealEP], c_void_p)
+    getPluginGlobalVariableHandle = Prototype([c_void_p, c_char_p], c_int)
+    getPluginGlobalVariableValue = Prototype([c_void_p, c_int], RealEP)
+    setPluginGlobalVariableValue = Prototype([c_void_p, c_int, RealEP], c_void_p)
+    getPluginTrendVariableHandle = Prototype([c_void_p, c_char_p], c_int)
+    getPluginTrendVariableValue = Prototype([c_void_p, c_int, c_int], RealEP)
+    getPluginTrendVariableAverage = Prototype([c_void_p, c_int, c_int], RealEP)
+    getPluginTrendVariableMin = Prototype([c_void_p, c_int, c_int], RealEP)
+    getPluginTrendVariableMax = Prototype([c_void_p, c_int, c_int], RealEP)
+    getPluginTrendVariableSum = Prototype([c_void_p, c_int, c_int], RealEP)
+    getPluginTrendVariableDirection = Prototype([c_void_p, c_int, c_int], RealEP)
+    getConstructionHandle = Prototype([c_void_p, c_char_p], c_int)
+    actualTime = Prototype([c_void_p], c_int)
+    actualDateTime = Prototype([c_void_p], c_int)
+    kindOfSim = Prototype([c_void_p], c_int)
+    todayWeatherIsRainAtTime = Prototype([c_void_p, c_int, c_int], c_int)
+    todayWeatherIsSnowAtTime = Prototype([c_void_p, c_int, c_int], c_int)
+    todayWeatherOutDryBulbAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    todayWeatherOutDewPointAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    todayWeatherOutBarometricPressureAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    todayWeatherOutRelativeHumidityAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    todayWeatherWindSpeedAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    todayWeatherWindDirectionAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    todayWeatherSkyTemperatureAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    todayWeatherHorizontalIRSkyAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    todayWeatherBeamSolarRadiationAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    todayWeatherDiffuseSolarRadiationAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    todayWeatherAlbedoAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    todayWeatherLiquidPrecipitationAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    tomorrowWeatherIsRainAtTime = Prototype([c_void_p, c_int, c_int], c_int)
+    tomorrowWeatherIsSnowAtTime = Prototype([c_void_p, c_int, c_int], c_int)
+    tomorrowWeatherOutDryBulbAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    tomorrowWeatherOutDewPointAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    tomorrowWeatherOutBarometricPressureAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    tomorrowWeatherOutRelativeHumidityAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    tomorrowWeatherWindSpeedAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    tomorrowWeatherWindDirectionAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    tomorrowWeatherSkyTemperatureAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    tomorrowWeatherHorizontalIRSkyAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    tomorrowWeatherBeamSolarRadiationAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    tomorrowWeatherDiffuseSolarRadiationAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    tomorrowWeatherAlbedoAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    tomorrowWeatherLiquidPrecipitationAtTime = Prototype([c_void_p, c_int, c_int], RealEP)
+    currentSimTime = Prototype([c_void_p], RealEP)
@@ -53,9 +53,19 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 
+import math
+from collections import OrderedDict
 from ctypes import cdll, c_int, c_char_p, c_void_p, CFUNCTYPE
 from types import FunctionType
-from pyenergyplus.common import RealEP
+from typing import Dict, Optional
+
+import numpy as np
+
+from pyenergyplus.common import Prototype, RealEP, EnergyPlusException
+from pyenergyplus.psychrometrics import _as_output
+
+
+py_error_callback_type = CFUNCTYPE(c_void_p, c_int, c_char_p)
 
 # CFUNCTYPE wrapped Python callbacks need to be kept in memory explicitly, otherwise GC takes it
 # This causes undefined behavior but generally segfaults and illegal access violations
@@ -85,18 +95,6 @@ class Glycol:
         :param glycol_name: The name of the glycol to instantiate -- currently only "water" is supported.
         """
         self.api = api
-        self.api.glycolNew.argtypes = [c_void_p, c_char_p]
-        self.api.glycolNew.restype = c_void_p
-        self.api.glycolDelete.argtypes = [c_void_p, c_void_p]
-        self.api.glycolDelete.restype = c_void_p
-        self.api.glycolSpecificHeat.argtypes = [c_void_p, c_void_p, RealEP]
-        self.api.glycolSpecificHeat.restype = RealEP
-        self.api.glycolDensity.argtypes = [c_void_p, c_void_p, RealEP]
-        self.api.glycolDensity.restype = RealEP
-        self.api.glycolConductivity.argtypes = [c_void_p, c_void_p, RealEP]
-        self.api.glycolConductivity.restype = RealEP
-        self.api.glycolViscosity.argtypes = [c_void_p, c_void_p, RealEP]
-        self.api.glycolViscosity.restype = RealEP
         self.instance = self.api.glycolNew(state, glycol_name)
 
     def delete(self, state: c_void_p) -> None:
@@ -171,20 +169,6 @@ class Refrigerant:
         """
         self.refrigerant_name = refrigerant_name
         self.api = api
-        self.api.refrigerantNew.argtypes = [c_void_p, c_char_p]
-        self.api.refrigerantNew.restype = c_void_p
-        self.api.refrigerantDelete.argtypes = [c_void_p, c_void_p]
-        self.api.refrigerantDelete.restype = c_void_p
-        self.api.refrigerantSaturationPressure.argtypes = [c_void_p, c_void_p, RealEP]
-        self.api.refrigerantSaturationPressure.restype = RealEP
-        self.api.refrigerantSaturationTemperature.argtypes = [c_void_p, c_void_p, RealEP]
-        self.api.refrigerantSaturationTemperature.restype = RealEP
-        self.api.refrigerantSaturatedEnthalpy.argtypes = [c_void_p, c_void_p, RealEP, RealEP]
-        self.api.refrigerantSaturatedEnthalpy.restype = RealEP
-        self.api.refrigerantSaturatedDensity.argtypes = [c_void_p, c_void_p, RealEP, RealEP]
-        self.api.refrigerantSaturatedDensity.restype = RealEP
-        self.api.refrigerantSaturatedSpecificHeat.argtypes = [c_void_p, c_void_p, RealEP, RealEP]
-        self.api.refrigerantSaturatedSpecificHeat.restype = RealEP
         self.instance = self.api.refrigerantNew(state, refrigerant_name)
 
     def delete(self, state: c_void_p):
@@ -250,13 +234,423 @@ class Refrigerant:
         return self.api.refrigerantSaturatedSpecificHeat(state, self.instance, temperature, quality)
 
 
+class _UniformGrid:
+    """
+    A uniformly spaced set of sample points used by the property tables, with vectorized lookup of the bracketing
+    interval for any query point.  Query points outside of the grid are clamped to its ends.
+    """
+
+    def __init__(self, start: float, stop: float, resolution: float):
+        if resolution <= 0.0 or stop <= start:
+            raise EnergyPlusException(
+                "Property tables expect a positive resolution and an increasing range, not resolution '{}' over "
+                "'{}' to '{}'".format(resolution, start, stop))
+        self.count = int(np.ceil((stop - start) / resolution)) + 1
+        self.points = np.linspace(start, stop, self.count)
+        self.start = start
+        self.step = (stop - start) / (self.count - 1)
+
+    def midpoints(self) -> np.ndarray:
+        return 0.5 * (self.points[:-1] + self.points[1:])
+
+    def locate(self, values: np.ndarray):
+        position = np.clip((values - self.start) / self.step, 0.0, self.count - 1)
+        index = np.minimum(position.astype(np.intp), self.count - 2)
+        return index, position - index
+
+
+def _interpolate(grid: _UniformGrid, table: np.ndarray, values) -> np.ndarray:
+    index, fraction = grid.locate(np.asarray(values, dtype=np.float64))
+    return table[index] + fraction * (table[index + 1] - table[index])
+
+
+def _interpolate_2d(x_grid: _UniformGrid, y_grid: _UniformGrid, table: np.ndarray, x, y) -> np.ndarray:
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+    ix, fx = x_grid.locate(x)
+    iy, fy = y_grid.locate(y)
+    low = table[ix, iy] + fy * (table[ix, iy + 1] - table[ix, iy])
+    high = table[ix + 1, iy] + fy * (table[ix + 1, iy + 1] - table[ix + 1, iy])
+    return low + fx * (high - low)
+
+
+class GlycolTable:
+    """
+    This class provides a table-backed version of the Glycol property methods.  Each property is sampled once through
+    EnergyPlus at a uniform temperature resolution over the valid range, and every subsequent query is answered by
+    vectorized linear interpolation, without calling into EnergyPlus.  The property methods accept a scalar or a NumPy
+    array of temperatures, and return a float or an array to match.  Temperatures outside of the tabulated range are
+    clamped to the range, as EnergyPlus does for out-of-range glycol temperatures.
+
+    The property data inside EnergyPlus are themselves tabulated and linearly interpolated, so the interpolation error
+    of this table is largest between its sample points.  For data that is linear between its kinks, the error within
+    an interval is at most twice the error at the interval midpoint, so `error_bound` holds twice the largest deviation
+    from EnergyPlus measured at the midpoints of every interval when the table is built.  Finer resolution reduces the
+    bound at the cost of more calls when building.
+
+    To get a GlycolTable instance from client code, call api.functional.glycol_table(state, "name").
+    """
+
+    properties = ('specific_heat', 'density', 'conductivity', 'viscosity')
+
+    def __init__(self, state: c_void_p, glycol: Glycol, resolution: float = 0.1, minimum_temperature: float = 0.0,
+                 maximum_temperature: float = 125.0, measure_error: bool = True):
+        """
+        Creates a new GlycolTable by sampling an existing Glycol instance.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`
+        :param glycol: An instantiated Glycol structure to sample
+        :param resolution: Temperature spacing of the table, in degrees Celsius
+        :param minimum_temperature: Lowest tabulated temperature, in degrees Celsius
+        :param maximum_temperature: Highest tabulated temperature, in degrees Celsius
+        :param measure_error: If True, each property is also evaluated at every interval midpoint to fill
+                              `error_bound`, which doubles the number of calls while building the table
+        """
+        self.temperatures = _UniformGrid(minimum_temperature, maximum_temperature, resolution)
+        self.tables = {}
+        #: Upper estimate of the absolute interpolation error of each property, in the units of that property
+        self.error_bound: Dict[str, float] = {}
+        for name in self.properties:
+            function = getattr(glycol, name)
+            self.tables[name] = np.array([function(state, t) for t in self.temperatures.points])
+            if measure_error:
+                midpoints = self.temperatures.midpoints()
+                exact = np.array([function(state, t) for t in midpoints])
+                deviation = np.abs(_interpolate(self.temperatures, self.tables[name], midpoints) - exact)
+                self.error_bound[name] = 2.0 * float(np.max(deviation))
+
+    def specific_heat(self, state: Optional[c_void_p], temperature):
+        """
+        Returns the specific heat of the fluid at the specified temperature.
+
+        :param state: Unused, accepted so that this table is a drop-in replacement for a Glycol instance
+        :param temperature: Fluid temperature, or array of temperatures, in degrees Celsius
+        :return: The specific heat of the fluid, in J/kg-K
+        """
+        return _as_output(_interpolate(self.temperatures, self.tables['specific_heat'], temperature))
+
+    def density(self, state: Optional[c_void_p], temperature):
+        """
+        Returns the density of the fluid at the specified temperature.
+
+        :param state: Unused, accepted so that this table is a drop-in replacement for a Glycol instance
+        :param temperature: Fluid temperature, or array of temperatures, in degrees Celsius
+        :return: The density of the fluid, in kg/m3
+        """
+        return _as_output(_interpolate(self.temperatures, self.tables['density'], temperature))
+
+    def conductivity(self, state: Optional[c_void_p], temperature):
+        """
+        Returns the conductivity of the fluid at the specified temperature.
+
+        :param state: Unused, accepted so that this table is a drop-in replacement for a Glycol instance
+        :param temperature: Fluid temperature, or array of temperatures, in degrees Celsius
+        :return: The conductivity of the fluid, in W/m-K
+        """
+        return _as_output(_interpolate(self.temperatures, self.tables['conductivity'], temperature))
+
+    def viscosity(self, state: Optional[c_void_p], temperature):
+        """
+        Returns the dynamic viscosity of the fluid at the specified temperature.
+
+        :param state: Unused, accepted so that this table is a drop-in replacement for a Glycol instance
+        :param temperature: Fluid temperature, or array of temperatures, in degrees Celsius
+        :return: The dynamic viscosity of the fluid, in Pa-s (or kg/m-s)
+        """
+        return _as_output(_interpolate(self.temperatures, self.tables['viscosity'], temperature))
+
+
+class RefrigerantTable:
+    """
+    This class provides a table-backed version of the Refrigerant property methods.  Each property is sampled once
+    through EnergyPlus over the valid range, and every subsequent query is answered by vectorized interpolation without
+    calling into EnergyPlus.  The property methods accept scalars or NumPy arrays, which are broadcast against each
+    other, and return a float or an array to match.  Inputs outside of the tabulated range are clamped to the range.
+
+    Saturation pressure is tabulated against temperature.  Saturation temperature is tabulated against the logarithm of
+    pressure, so the relative resolution is the same at low and high pressure.  The saturated properties depend on both
+    temperature and quality, and are tabulated on a two dimensional grid and interpolated bilinearly.
+
+    As with GlycolTable, `error_bound` holds twice the largest deviation from EnergyPlus measured at the midpoints of
+    the table intervals (the cell centers for the two dimensional tables) when the table is built.
+
+    To get a RefrigerantTable instance from client code, call api.functional.refrigerant_table(state, "name").
+    """
+
+    saturated_properties = ('saturated_enthalpy', 'saturated_density', 'saturated_specific_heat')
+
+    def __init__(self, state: c_void_p, refrigerant: Refrigerant, temperature_resolution: float = 0.1,
+                 quality_resolution: float = 0.1, minimum_temperature: float = 0.01,
+                 maximum_temperature: float = 370.0, measure_error: bool = True):
+        """
+        Creates a new RefrigerantTable by sampling an existing Refrigerant instance.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`
+        :param refrigerant: An instantiated Refrigerant structure to sample
+        :param temperature_resolution: Temperature spacing of the tables, in degrees Celsius
+        :param quality_resolution: Quality spacing of the saturated property tables, as a fraction
+        :param minimum_temperature: Lowest tabulated temperature, in degrees Celsius
+        :param maximum_temperature: Highest tabulated temperature, in degrees Celsius
+        :param measure_error: If True, each property is also evaluated at every interval midpoint to fill
+                              `error_bound`, which adds calls while building the table
+        """
+        self.temperatures = _UniformGrid(minimum_temperature, maximum_temperature, temperature_resolution)
+        self.qualities = _UniformGrid(0.0, 1.0, quality_resolution)
+        #: Upper estimate of the absolute interpolation error of each property, in the units of that property
+        self.error_bound: Dict[str, float] = {}
+
+        self.pressure_table = np.array([refrigerant.saturation_pressure(state, t) for t in self.temperatures.points])
+        low_pressure, high_pressure = float(self.pressure_table[0]), float(self.pressure_table[-1])
+        # sample the log of pressure at the same number of points as the temperature table
+        log_step = (np.log(high_pressure) - np.log(low_pressure)) / (self.temperatures.count - 1)
+        self.log_pressures = _UniformGrid(np.log(low_pressure), np.log(high_pressure), log_step)
+        self.temperature_table = np.array(
+            [refrigerant.saturation_temperature(state, p) for p in np.exp(self.log_pressures.points)]
+        )
+
+        self.tables = {}
+        for name in self.saturated_properties:
+            function = getattr(refrigerant, name)
+            self.tables[name] = np.array(
+                [[function(state, t, q) for q in self.qualities.points] for t in self.temperatures.points]
+            )
+
+        if measure_error:
+            midpoints = self.temperatures.midpoints()
+            exact = np.array([refrigerant.saturation_pressure(state, t) for t in midpoints])
+            self.error_bound['saturation_pressure'] = 2.0 * float(
+                np.max(np.abs(_interpolate(self.temperatures, self.pressure_table, midpoints) - exact))
+            )
+            midpoints = self.log_pressures.midpoints()
+            exact = np.array([refrigerant.saturation_temperature(state, p) for p in np.exp(midpoints)])
+            self.error_bound['saturation_temperature'] = 2.0 * float(
+                np.max(np.abs(_interpolate(self.log_pressures, self.temperature_table, midpoints) - exact))
+            )
+            t_mid, q_mid = [g.ravel() for g in np.meshgrid(
+                self.temperatures.midpoints(), self.qualities.midpoints(), indexing='ij'
+            )]
+            for name in self.saturated_properties:
+                function = getattr(refrigerant, name)
+                exact = np.array([function(state, t, q) for t, q in zip(t_mid, q_mid)])
+                interpolated = _interpolate_2d(self.temperatures, self.qualities, self.tables[name], t_mid, q_mid)
+                self.error_bound[name] = 2.0 * float(np.max(np.abs(interpolated - exact)))
+
+    def saturation_pressure(self, state: Optional[c_void_p], temperature):
+        """
+        Returns the saturation pressure of the refrigerant at the specified temperature.
+
+        :param state: Unused, accepted so that this table is a drop-in replacement for a Refrigerant instance
+        :param temperature: Refrigerant temperature, or array of temperatures, in Celsius.
+        :return: Refrigerant saturation pressure, in Pa
+        """
+        return _as_output(_interpolate(self.temperatures, self.pressure_table, temperature))
+
+    def saturation_temperature(self, state: Optional[c_void_p], pressure):
+        """
+        Returns the saturation temperature of the refrigerant at the specified pressure.
+
+        :param state: Unused, accepted so that this table is a drop-in replacement for a Refrigerant instance
+        :param pressure: Refrigerant pressure, or array of pressures, in Pa
+        :return: Refrigerant saturation temperature, in Celsius
+        """
+        log_pressure = np.log(np.maximum(np.asarray(pressure, dtype=np.float64), np.finfo(np.float64).tiny))
+        return _as_output(_interpolate(self.log_pressures, self.temperature_table, log_pressure))
+
+    def saturated_enthalpy(self, state: Optional[c_void_p], temperature, quality):
+        """
+        Returns the refrigerant saturated enthalpy at the specified temperature and quality.
+
+        :param state: Unused, accepted so that this table is a drop-in replacement for a Refrigerant instance
+        :param temperature: Refrigerant temperature, or array of temperatures, in Celsius
+        :param quality: Refrigerant quality, or array of qualities, in fractional form from 0.0 to 1.0
+        :return: Refrigerant saturated enthalpy, in J/kg
+        """
+        table = self.tables['saturated_enthalpy']
+        return _as_output(_interpolate_2d(self.temperatures, self.qualities, table, temperature, quality))
+
+    def saturated_density(self, state: Optional[c_void_p], temperature, quality):
+        """
+        Returns the refrigerant density at the specified temperature and quality.
+
+        :param state: Unused, accepted so that this table is a drop-in replacement for a Refrigerant instance
+        :param temperature: Refrigerant temperature, or array of temperatures, in Celsius
+        :param quality: Refrigerant quality, or array of qualities, in fractional form from 0.0 to 1.0
+        :return: Refrigerant saturated density, in kg/m3
+        """
+        table = self.tables['saturated_density']
+        return _as_output(_interpolate_2d(self.temperatures, self.qualities, table, temperature, quality))
+
+    def saturated_specific_heat(self, state: Optional[c_void_p], temperature, quality):
+        """
+        Returns the refrigerant specific heat at the specified temperature and quality.
+
+        :param state: Unused, accepted so that this table is a drop-in replacement for a Refrigerant instance
+        :param temperature: Refrigerant temperature, or array of temperatures, in Celsius
+        :param quality: Refrigerant quality, or array of qualities, in fractional form from 0.0 to 1.0
+        :return: Refrigerant saturated specific heat, in J/kg-K
+        """
+        table = self.tables['saturated_specific_heat']
+        return _as_output(_interpolate_2d(self.temperatures, self.qualities, table, temperature, quality))
+
+
+class PsychrometricCache:
+    """
+    This class is a bounded, least-recently-used memoization cache for psychrometric calls into EnergyPlus.  It is
+    attached to a Psychrometrics instance through `Psychrometrics.enable_cache`, and is never used unless enabled.
+
+    Inputs are quantized before lookup: each argument is rounded to the nearest multiple of the step size for its
+    physical quantity, and on a cache miss the EnergyPlus function is evaluated at the *rounded* inputs.  Because of
+    this, the value returned for a given input never depends on which inputs happened to be evaluated earlier, and the
+    only difference from an uncached call is the documented input rounding.  A step size of zero disables quantization
+    for that quantity, so only exact repeats of the input are served from the cache; NaN and infinite inputs are never
+    quantized either.
+
+    The hit, miss, and eviction counters are available through `stats`, so hot paths can confirm the cache is earning
+    its keep.
+    """
+
+    #: The default input step size for each physical quantity, chosen to be well below sensor resolution
+    default_quantization: Dict[str, float] = {
+        'temperature': 0.001,  # C
+        'humidity_ratio': 1.0e-7,  # kgWater/kgDryAir
+        'pressure': 0.1,  # Pa
+        'enthalpy': 0.1,  # J/kg
+        'relative_humidity': 1.0e-5,  # fraction
+        'vapor_density': 1.0e-8,  # kg/m3
+    }
+
+    def __init__(self, max_size: int = 4096, quantization: Optional[Dict[str, float]] = None):
+        """
+        Creates a new psychrometric cache.
+
+        :param max_size: The maximum number of entries kept in the cache, once this is reached the least recently used
+                         entry is evicted for each new entry.
+        :param quantization: A dictionary of input step sizes, keyed by physical quantity, which overrides the entries
+                             of `default_quantization`.  Valid keys are 'temperature', 'humidity_ratio', 'pressure',
+                             'enthalpy', 'relative_humidity', and 'vapor_density'.
+        """
+        if max_size < 1:
+            raise EnergyPlusException(
+                "PsychrometricCache expects `max_size` to be at least 1, not '{}'".format(max_size))
+        self.max_size = max_size
+        self.quantization = dict(self.default_quantization)
+        for quantity, step in (quantization or {}).items():
+            if quantity not in self.quantization:
+                raise EnergyPlusException(
+                    "PsychrometricCache does not recognize quantity '{}', expected one of: {}".format(
+                        quantity, ", ".join(self.quantization)))
+            if step < 0.0:
+                raise EnergyPlusException(
+                    "PsychrometricCache expects a non-negative step for '{}', not '{}'".format(quantity, step))
+            self.quantization[quantity] = step
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def evaluate(self, function, function_name: str, state: c_void_p, quantities, arguments) -> float:
+        """
+        Returns the cached value of a psychrometric function, evaluating it through EnergyPlus on a cache miss.
+
+        :param function: The EnergyPlus library function to call on a miss
+        :param function_name: The name of the library function, used as part of the cache key
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param quantities: The physical quantity of each argument, used to look up the quantization step size
+        :param arguments: The floating point arguments to the function
+        :return: The value of the function at the quantized arguments; with a non-finite argument, the uncached value
+        """
+        key = [function_name]
+        rounded = []
+        for quantity, value in zip(quantities, arguments):
+            # RealEP (c_double) arguments are accepted by the uncached calls too, but do not support arithmetic
+            value = float(value.value if isinstance(value, RealEP) else value)
+            if not math.isfinite(value):
+                # NaN never equals itself, so such a key would never hit and would only evict valid entries
+                return function(state, *arguments)
+            step = self.quantization[quantity]
+            if step > 0.0:
+                index = round(value / step)
+                key.append(index)
+                rounded.append(index * step)
+            else:
+                key.append(value)
+                rounded.append(value)
+        key = tuple(key)
+        entries = self.entries
+        if key in entries:
+            self.hits += 1
+            entries.move_to_end(key)
+            return entries[key]
+        self.misses += 1
+        value = function(state, *rounded)
+        entries[key] = value
+        if len(entries) > self.max_size:
+            entries.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def clear(self) -> None:
+        """
+        Removes all entries from the cache and resets the statistics counters.
+
+        :return: Nothing
+        """
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the cache statistics.
+
+        :return: A dictionary with the number of hits, misses, and evictions, the current and maximum number of
+                 entries, and the hit rate as a fraction of all lookups.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self.entries),
+            'max_size': self.max_size,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
 class Psychrometrics:
     """
     This class provides access to the psychrometric functions within EnergyPlus.  Some property calculations are
     available as functions of different independent variable combinations, leading to suffixed function names, such as
     `vapor_density_b` and `relative_humidity_c`.
+
+    Calls can optionally be memoized with a quantized, bounded cache by calling `enable_cache`; see PsychrometricCache.
     """
 
+    # The physical quantity of each argument of each library function, used to quantize cache keys
+    _argument_quantities = {
+        'psyRhoFnPbTdbW': ('pressure', 'temperature', 'humidity_ratio'),
+        'psyHfgAirFnWTdb': ('temperature',),
+        'psyHgAirFnWTdb': ('temperature',),
+        'psyHFnTdbW': ('temperature', 'humidity_ratio'),
+        'psyCpAirFnW': ('humidity_ratio',),
+        'psyTdbFnHW': ('enthalpy', 'humidity_ratio'),
+        'psyRhovFnTdbWPb': ('temperature', 'humidity_ratio', 'pressure'),
+        'psyTwbFnTdbWPb': ('temperature', 'humidity_ratio', 'pressure'),
+        'psyVFnTdbWPb': ('temperature', 'humidity_ratio', 'pressure'),
+        'psyWFnTdbH': ('temperature', 'enthalpy'),
+        'psyPsatFnTemp': ('temperature',),
+        'psyTsatFnHPb': ('enthalpy', 'pressure'),
+        'psyRhovFnTdbRh': ('temperature', 'relative_humidity'),
+        'psyRhFnTdbRhov': ('temperature', 'vapor_density'),
+        'psyRhFnTdbWPb': ('temperature', 'humidity_ratio', 'pressure'),
+        'psyWFnTdpPb': ('temperature', 'pressure'),
+        'psyWFnTdbRhPb': ('temperature', 'relative_humidity', 'pressure'),
+        'psyWFnTdbTwbPb': ('temperature', 'temperature', 'pressure'),
+        'psyHFnTdbRhPb': ('temperature', 'relative_humidity', 'pressure'),
+        'psyTdpFnWPb': ('humidity_ratio', 'pressure'),
+        'psyTdpFnTdbTwbPb': ('temperature', 'temperature', 'pressure'),
+    }
+
     def __init__(self, api: cdll):
         """
         Creates a new Psychrometrics instance, should almost certainly always be called from the API's functional class,
@@ -267,48 +661,36 @@ class Psychrometrics:
         :param api: An active CTYPES CDLL instance
         """
         self.api = api
-        self.api.psyRhoFnPbTdbW.argtypes = [c_void_p, RealEP, RealEP, RealEP]
-        self.api.psyRhoFnPbTdbW.restype = RealEP
-        self.api.psyHfgAirFnWTdb.argtypes = [c_void_p, RealEP]
-        self.api.psyHfgAirFnWTdb.restype = RealEP
-        self.api.psyHgAirFnWTdb.argtypes = [c_void_p, RealEP]
-        self.api.psyHgAirFnWTdb.restype = RealEP
-        self.api.psyHFnTdbW.argtypes = [c_void_p, RealEP, RealEP]
-        self.api.psyHFnTdbW.restype = RealEP
-        self.api.psyCpAirFnW.argtypes = [c_void_p, RealEP]
-        self.api.psyCpAirFnW.restype = RealEP
-        self.api.psyTdbFnHW.argtypes = [c_void_p, RealEP, RealEP]
-        self.api.psyTdbFnHW.restype = RealEP
-        self.api.psyRhovFnTdbWPb.argtypes = [c_void_p, RealEP, RealEP, RealEP]
-        self.api.psyRhovFnTdbWPb.restype = RealEP
-        self.api.psyTwbFnTdbWPb.argtypes = [c_void_p, RealEP, RealEP, RealEP]
-        self.api.psyTwbFnTdbWPb.restype = RealEP
-        self.api.psyVFnTdbWPb.argtypes = [c_void_p, RealEP, RealEP, RealEP]
-        self.api.psyVFnTdbWPb.restype = RealEP
-        self.api.psyWFnTdbH.argtypes = [c_void_p, RealEP, RealEP]
-        self.api.psyWFnTdbH.restype = RealEP
-        self.api.psyPsatFnTemp.argtypes = [c_void_p, RealEP]
-        self.api.psyPsatFnTemp.restype = RealEP
-        self.api.psyTsatFnHPb.argtypes = [c_void_p, RealEP, RealEP]
-        self.api.psyTsatFnHPb.restype = RealEP
-        self.api.psyRhovFnTdbRh.argtypes = [c_void_p, RealEP, RealEP]
-        self.api.psyRhovFnTdbRh.restype = RealEP
-        self.api.psyRhFnTdbRhov.argtypes = [c_void_p, RealEP, RealEP]
-        self.api.psyRhFnTdbRhov.restype = RealEP
-        self.api.psyRhFnTdbWPb.argtypes = [c_void_p, RealEP, RealEP, RealEP]
-        self.api.psyRhFnTdbWPb.restype = RealEP
-        self.api.psyWFnTdpPb.argtypes = [c_void_p, RealEP, RealEP]
-        self.api.psyWFnTdpPb.restype = RealEP
-        self.api.psyWFnTdbRhPb.argtypes = [c_void_p, RealEP, RealEP, RealEP]
-        self.api.psyWFnTdbRhPb.restype = RealEP
-        self.api.psyWFnTdbTwbPb.argtypes = [c_void_p, RealEP, RealEP, RealEP]
-        self.api.psyWFnTdbTwbPb.restype = RealEP
-        self.api.psyHFnTdbRhPb.argtypes = [c_void_p, RealEP, RealEP, RealEP]
-        self.api.psyHFnTdbRhPb.restype = RealEP
-        self.api.psyTdpFnWPb.argtypes = [c_void_p, RealEP, RealEP]
-        self.api.psyTdpFnWPb.restype = RealEP
-        self.api.psyTdpFnTdbTwbPb.argtypes = [c_void_p, RealEP, RealEP, RealEP]
-        self.api.psyTdpFnTdbTwbPb.restype = RealEP
+        self.cache: Optional[PsychrometricCache] = None
+
+    def enable_cache(self, max_size: int = 4096, quantization: Optional[Dict[str, float]] = None) -> PsychrometricCache:
+        """
+        Enables memoization of the psychrometric calls made through this instance.  See PsychrometricCache for details
+        on how inputs are quantized.
+
+        :param max_size: The maximum number of cached results, after which least recently used results are evicted.
+        :param quantization: A dictionary of input step sizes, keyed by physical quantity, overriding the defaults in
+                             `PsychrometricCache.default_quantization`.
+        :return: The newly attached cache, whose `stats` method reports the hit rate
+        """
+        self.cache = PsychrometricCache(max_size, quantization)
+        return self.cache
+
+    def disable_cache(self) -> None:
+        """
+        Detaches the memoization cache, so that every call goes directly into EnergyPlus again.
+
+        :return: Nothing
+        """
+        self.cache = None
+
+    def _evaluate(self, function_name: str, state: c_void_p, *arguments: float) -> float:
+        function = getattr(self.api, function_name)
+        if self.cache is None:
+            return function(state, *arguments)
+        return self.cache.evaluate(
+            function, function_name, state, self._argument_quantities[function_name], arguments
+        )
 
     def density(self, state: c_void_p, barometric_pressure: float, dry_bulb_temp: float, humidity_ratio: float) -> float:
         """
@@ -320,7 +702,7 @@ class Psychrometrics:
         :param humidity_ratio: Humidity ratio, in kgWater/kgDryAir
         :return:
         """
-        return self.api.psyRhoFnPbTdbW(state, barometric_pressure, dry_bulb_temp, humidity_ratio)
+        return self._evaluate('psyRhoFnPbTdbW', state, barometric_pressure, dry_bulb_temp, humidity_ratio)
 
     def latent_energy_of_air(self, state: c_void_p, dry_bulb_temp: float) -> float:
         """
@@ -330,7 +712,7 @@ class Psychrometrics:
         :param dry_bulb_temp: Psychrometric dry bulb temperature, in C
         :return:
         """
-        return self.api.psyHfgAirFnWTdb(state, dry_bulb_temp)
+        return self._evaluate('psyHfgAirFnWTdb', state, dry_bulb_temp)
 
     def latent_energy_of_moisture_in_air(self, state: c_void_p, dry_bulb_temp: float) -> float:
         """
@@ -340,7 +722,7 @@ class Psychrometrics:
         :param dry_bulb_temp: Psychrometric dry bulb temperature, in C
         :return:
         """
-        return self.api.psyHgAirFnWTdb(state, dry_bulb_temp)
+        return self._evaluate('psyHgAirFnWTdb', state, dry_bulb_temp)
 
     def enthalpy(self, state: c_void_p, dry_bulb_temp: float, humidity_ratio: float) -> float:
         """
@@ -351,7 +733,7 @@ class Psychrometrics:
         :param humidity_ratio: Humidity ratio, in kgWater/kgDryAir
         :return:
         """
-        return self.api.psyHFnTdbW(state, dry_bulb_temp, humidity_ratio)
+        return self._evaluate('psyHFnTdbW', state, dry_bulb_temp, humidity_ratio)
 
     def enthalpy_b(self, state: c_void_p, dry_bulb_temp: float, relative_humidity_fraction: float, barometric_pressure: float) -> float:
         """
@@ -363,7 +745,7 @@ class Psychrometrics:
         :param barometric_pressure: Barometric pressure, in Pa
         :return:
         """
-        return self.api.psyHFnTdbRhPb(state, dry_bulb_temp, relative_humidity_fraction, barometric_pressure)
+        return self._evaluate('psyHFnTdbRhPb', state, dry_bulb_temp, relative_humidity_fraction, barometric_pressure)
 
     def specific_heat(self, state: c_void_p, humidity_ratio: float) -> float:
         """
@@ -373,7 +755,7 @@ class Psychrometrics:
         :param humidity_ratio: Humidity ratio, in kgWater/kgDryAir
         :return:
         """
-        return self.api.psyCpAirFnW(state, humidity_ratio)
+        return self._evaluate('psyCpAirFnW', state, humidity_ratio)
 
     def dry_bulb(self, state: c_void_p, enthalpy: float, humidity_ratio: float) -> float:
         """
@@ -384,7 +766,7 @@ class Psychrometrics:
         :param humidity_ratio: Humidity ratio, in kgWater/kgDryAir
         :return:
         """
-        return self.api.psyTdbFnHW(state, enthalpy, humidity_ratio)
+        return self._evaluate('psyTdbFnHW', state, enthalpy, humidity_ratio)
 
     def vapor_density(self, state: c_void_p, dry_bulb_temp: float, humidity_ratio: float, barometric_pressure: float) -> float:
         """
@@ -396,7 +778,7 @@ class Psychrometrics:
         :param barometric_pressure: Barometric pressure, in Pa
         :return:
         """
-        return self.api.psyRhovFnTdbWPb(state, dry_bulb_temp, humidity_ratio, barometric_pressure)
+        return self._evaluate('psyRhovFnTdbWPb', state, dry_bulb_temp, humidity_ratio, barometric_pressure)
 
     def relative_humidity(self, state: c_void_p, dry_bulb_temp: float, vapor_density: float) -> float:
         """
@@ -407,7 +789,7 @@ class Psychrometrics:
         :param vapor_density: Psychrometric vapor density, in kg/m3
         :return:
         """
-        return self.api.psyRhFnTdbRhov(state, dry_bulb_temp, vapor_density)
+        return self._evaluate('psyRhFnTdbRhov', state, dry_bulb_temp, vapor_density)
 
     def relative_humidity_b(self, state: c_void_p, dry_bulb_temp: float, humidity_ratio: float, barometric_pressure: float) -> float:
         """
@@ -419,7 +801,7 @@ class Psychrometrics:
         :param barometric_pressure: Barometric pressure, in Pa
         :return:
         """
-        return self.api.psyRhFnTdbWPb(state, dry_bulb_temp, humidity_ratio, barometric_pressure)
+        return self._evaluate('psyRhFnTdbWPb', state, dry_bulb_temp, humidity_ratio, barometric_pressure)
 
     def wet_bulb(self, state: c_void_p, dry_bulb_temp: float, humidity_ratio: float, barometric_pressure: float) -> float:
         """
@@ -431,7 +813,7 @@ class Psychrometrics:
         :param barometric_pressure: Barometric pressure, in Pa
         :return:
         """
-        return self.api.psyTwbFnTdbWPb(state, dry_bulb_temp, humidity_ratio, barometric_pressure)
+        return self._evaluate('psyTwbFnTdbWPb', state, dry_bulb_temp, humidity_ratio, barometric_pressure)
 
     def specific_volume(self, state: c_void_p, dry_bulb_temp: float, humidity_ratio: float, barometric_pressure: float) -> float:
         """
@@ -443,7 +825,7 @@ class Psychrometrics:
         :param barometric_pressure: Barometric pressure, in Pa
         :return:
         """
-        return self.api.psyVFnTdbWPb(state, dry_bulb_temp, humidity_ratio, barometric_pressure)
+        return self._evaluate('psyVFnTdbWPb', state, dry_bulb_temp, humidity_ratio, barometric_pressure)
 
     def saturation_pressure(self, state: c_void_p, dry_bulb_temp: float) -> float:
         """
@@ -453,7 +835,7 @@ class Psychrometrics:
         :param dry_bulb_temp: Psychrometric dry bulb temperature, in C
         :return:
         """
-        return self.api.psyPsatFnTemp(state, dry_bulb_temp)
+        return self._evaluate('psyPsatFnTemp', state, dry_bulb_temp)
 
     def saturation_temperature(self, state: c_void_p, enthalpy: float, barometric_pressure: float) -> float:
         """
@@ -464,7 +846,7 @@ class Psychrometrics:
         :param barometric_pressure: Barometric pressure, in Pa
         :return:
         """
-        return self.api.psyTsatFnHPb(state, enthalpy, barometric_pressure)
+        return self._evaluate('psyTsatFnHPb', state, enthalpy, barometric_pressure)
 
     def vapor_density_b(self, state: c_void_p, dry_bulb_temp: float, relative_humidity_fraction: float) -> float:
         """
@@ -475,7 +857,7 @@ class Psychrometrics:
         :param relative_humidity_fraction: Psychrometric relative humidity, as a fraction from 0.0 to 1.0.
         :return:
         """
-        return self.api.psyRhovFnTdbRh(state, dry_bulb_temp, relative_humidity_fraction)
+        return self._evaluate('psyRhovFnTdbRh', state, dry_bulb_temp, relative_humidity_fraction)
 
     def humidity_ratio(self, state: c_void_p, dry_bulb_temp: float, enthalpy: float) -> float:
         """
@@ -486,7 +868,7 @@ class Psychrometrics:
         :param enthalpy: Psychrometric enthalpy, in J/kg
         :return:
         """
-        return self.api.psyWFnTdbH(state, dry_bulb_temp, enthalpy)
+        return self._evaluate('psyWFnTdbH', state, dry_bulb_temp, enthalpy)
 
     def humidity_ratio_b(self, state: c_void_p, dew_point_temp: float, barometric_pressure: float) -> float:
         """
@@ -497,7 +879,7 @@ class Psychrometrics:
         :param barometric_pressure: Barometric pressure, in Pa
         :return:
         """
-        return self.api.psyWFnTdpPb(state, dew_point_temp, barometric_pressure)
+        return self._evaluate('psyWFnTdpPb', state, dew_point_temp, barometric_pressure)
 
     def humidity_ratio_c(self, state: c_void_p, dry_bulb_temp: float, relative_humidity_fraction: float,
                          barometric_pressure: float) -> float:
@@ -510,7 +892,7 @@ class Psychrometrics:
         :param barometric_pressure: Barometric pressure, in Pa
         :return:
         """
-        return self.api.psyWFnTdbRhPb(state, dry_bulb_temp, relative_humidity_fraction, barometric_pressure)
+        return self._evaluate('psyWFnTdbRhPb', state, dry_bulb_temp, relative_humidity_fraction, barometric_pressure)
 
     def humidity_ratio_d(self, state: c_void_p, dry_bulb_temp: float, wet_bulb_temp: float, barometric_pressure: float) -> float:
         """
@@ -522,7 +904,7 @@ class Psychrometrics:
         :param barometric_pressure: Barometric pressure, in Pa
         :return:
         """
-        return self.api.psyWFnTdbTwbPb(state, dry_bulb_temp, wet_bulb_temp, barometric_pressure)
+        return self._evaluate('psyWFnTdbTwbPb', state, dry_bulb_temp, wet_bulb_temp, barometric_pressure)
 
     def dew_point(self, state: c_void_p, humidity_ratio: float, barometric_pressure: float) -> float:
         """
@@ -533,7 +915,7 @@ class Psychrometrics:
         :param barometric_pressure: Barometric pressure, in Pa
         :return:
         """
-        return self.api.psyTdpFnWPb(state, humidity_ratio, barometric_pressure)
+        return self._evaluate('psyTdpFnWPb', state, humidity_ratio, barometric_pressure)
 
     def dew_point_b(self, state: c_void_p, dry_bulb_temp: float, wet_bulb_temp: float, barometric_pressure: float) -> float:
         """
@@ -545,7 +927,7 @@ class Psychrometrics:
         :param barometric_pressure: Barometric pressure, in Pa
         :return:
         """
-        return self.api.psyTdpFnTdbTwbPb(state, dry_bulb_temp, wet_bulb_temp, barometric_pressure)
+        return self._evaluate('psyTdpFnTdbTwbPb', state, dry_bulb_temp, wet_bulb_temp, barometric_pressure)
 
 
 class EnergyPlusVersion:
@@ -585,19 +967,17 @@ class Functional:
 
     def __init__(self, api: cdll, running_as_python_plugin: bool = False):
         self.api = api
-        self.api.initializeFunctionalAPI.argtypes = [c_void_p]
-        self.api.initializeFunctionalAPI.restype = c_void_p
         self.initialized = False
+        self.initialized_states = set()
         self.plugin_mode = running_as_python_plugin
-        self.py_error_callback_type = CFUNCTYPE(c_void_p, c_int, c_char_p)
-        self.api.registerErrorCallback.argtypes = [c_void_p, self.py_error_callback_type]
-        self.api.registerErrorCallback.restype = c_void_p
-        self.api.energyPlusVersion.argtypes = []
-        self.api.energyPlusVersion.restype = c_char_p
+        self.py_error_callback_type = py_error_callback_type
 
     def initialize(self, state: c_void_p) -> None:
-        if not self.initialized and not self.plugin_mode:
+        # each state carries its own fluid property data, so initialization is tracked per state
+        key = state.value if isinstance(state, c_void_p) else state
+        if key not in self.initialized_states and not self.plugin_mode:
             self.api.initializeFunctionalAPI(state)
+            self.initialized_states.add(key)
             self.initialized = True
 
     def glycol(self, state: c_void_p, glycol_name: str) -> Glycol:
@@ -626,6 +1006,48 @@ class Functional:
             refrigerant_name = refrigerant_name.encode('utf-8')
         return Refrigerant(state, self.api, refrigerant_name)
 
+    def glycol_table(self, state: c_void_p, glycol_name: str, resolution: float = 0.1,
+                     minimum_temperature: float = 0.0, maximum_temperature: float = 125.0) -> GlycolTable:
+        """
+        Returns a GlycolTable instance, which answers glycol property queries for scalars or arrays by interpolating
+        properties sampled once from EnergyPlus.  See GlycolTable for the error bound of the interpolation.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param glycol_name: Name of the Glycol, for now only water is allowed
+        :param resolution: Temperature spacing of the table, in degrees Celsius
+        :param minimum_temperature: Lowest tabulated temperature, in degrees Celsius
+        :param maximum_temperature: Highest tabulated temperature, in degrees Celsius
+        :return: A GlycolTable sampled from the named glycol
+        """
+        glycol = self.glycol(state, glycol_name)
+        try:
+            return GlycolTable(state, glycol, resolution, minimum_temperature, maximum_temperature)
+        finally:
+            glycol.delete(state)
+
+    def refrigerant_table(self, state: c_void_p, refrigerant_name: str, temperature_resolution: float = 0.1,
+                          quality_resolution: float = 0.1, minimum_temperature: float = 0.01,
+                          maximum_temperature: float = 370.0) -> RefrigerantTable:
+        """
+        Returns a RefrigerantTable instance, which answers refrigerant property queries for scalars or arrays by
+        interpolating properties sampled once from EnergyPlus.  See RefrigerantTable for the error bound of the
+        interpolation.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param refrigerant_name: Name of the Refrigerant, for now only steam is allowed
+        :param temperature_resolution: Temperature spacing of the tables, in degrees Celsius
+        :param quality_resolution: Quality spacing of the saturated property tables, as a fraction
+        :param minimum_temperature: Lowest tabulated temperature, in degrees Celsius
+        :param maximum_temperature: Highest tabulated temperature, in degrees Celsius
+        :return: A RefrigerantTable sampled from the named refrigerant
+        """
+        refrigerant = self.refrigerant(state, refrigerant_name)
+        try:
+            return RefrigerantTable(state, refrigerant, temperature_resolution, quality_resolution,
+                                    minimum_temperature, maximum_temperature)
+        finally:
+            refrigerant.delete(state)
+
     def psychrometrics(self, state: c_void_p) -> Psychrometrics:
         """
         Returns a Psychrometric instance, which allows calculation of psychrometric properties.
@@ -665,3 +1087,47 @@ class Functional:
         :return: Nothing
         """
         error_callbacks.clear()
+
+
+class FunctionalPrototypes:
+    """
+    Declares the ctypes prototypes of the functions used by the Functional API classes.
+    """
+
+    glycolNew = Prototype([c_void_p, c_char_p], c_void_p)
+    glycolDelete = Prototype([c_void_p, c_void_p], c_void_p)
+    glycolSpecificHeat = Prototype([c_void_p, c_void_p, RealEP], RealEP)
+    glycolDensity = Prototype([c_void_p, c_void_p, RealEP], RealEP)
+    glycolConductivity = Prototype([c_void_p, c_void_p, RealEP], RealEP)
+    glycolViscosity = Prototype([c_void_p, c_void_p, RealEP], RealEP)
+    refrigerantNew = Prototype([c_void_p, c_char_p], c_void_p)
+    refrigerantDelete = Prototype([c_void_p, c_void_p], c_void_p)
+    refrigerantSaturationPressure = Prototype([c_void_p, c_void_p, RealEP], RealEP)
+    refrigerantSaturationTemperature = Prototype([c_void_p, c_void_p, RealEP], RealEP)
+    refrigerantSaturatedEnthalpy = Prototype([c_void_p, c_void_p, RealEP, RealEP], RealEP)
+    refrigerantSaturatedDensity = Prototype([c_void_p, c_void_p, RealEP, RealEP], RealEP)
+    refrigerantSaturatedSpecificHeat = Prototype([c_void_p, c_void_p, RealEP, RealEP], RealEP)
+    psyRhoFnPbTdbW = Prototype([c_void_p, RealEP, RealEP, RealEP], RealEP)
+    psyHfgAirFnWTdb = Prototype([c_void_p, RealEP], RealEP)
+    psyHgAirFnWTdb = Prototype([c_void_p, RealEP], RealEP)
+    psyHFnTdbW = Prototype([c_void_p, RealEP, RealEP], RealEP)
+    psyCpAirFnW = Prototype([c_void_p, RealEP], RealEP)
+    psyTdbFnHW = Prototype([c_void_p, RealEP, RealEP], RealEP)
+    psyRhovFnTdbWPb = Prototype([c_void_p, RealEP, RealEP, RealEP], RealEP)
+    psyTwbFnTdbWPb = Prototype([c_void_p, RealEP, RealEP, RealEP], RealEP)
+    psyVFnTdbWPb = Prototype([c_void_p, RealEP, RealEP, RealEP], RealEP)
+    psyWFnTdbH = Prototype([c_void_p, RealEP, RealEP], RealEP)
+    psyPsatFnTemp = Prototype([c_void_p, RealEP], RealEP)
+    psyTsatFnHPb = Prototype([c_void_p, RealEP, RealEP], RealEP)
+    psyRhovFnTdbRh = Prototype([c_void_p, RealEP, RealEP], RealEP)
+    psyRhFnTdbRhov = Prototype([c_void_p, RealEP, RealEP], RealEP)
+    psyRhFnTdbWPb = Prototype([c_void_p, RealEP, RealEP, RealEP], RealEP)
+    psyWFnTdpPb = Prototype([c_void_p, RealEP, RealEP], RealEP)
+    psyWFnTdbRhPb = Prototype([c_void_p, RealEP, RealEP, RealEP], RealEP)
+    psyWFnTdbTwbPb = Prototype([c_void_p, RealEP, RealEP, RealEP], RealEP)
+    psyHFnTdbRhPb = Prototype([c_void_p, RealEP, RealEP, RealEP], RealEP)
+    psyTdpFnWPb = Prototype([c_void_p, RealEP, RealEP], RealEP)
+    psyTdpFnTdbTwbPb = Prototype([c_void_p, RealEP, RealEP, RealEP], RealEP)
+    initializeFunctionalAPI = Prototype([c_void_p], c_void_p)
+    registerErrorCallback = Prototype([c_void_p, py_error_callback_type], c_void_p)
+    energyPlusVersion = Prototype([], c_char_p)
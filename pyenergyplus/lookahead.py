@@ -0,0 +1,291 @@
+# EnergyPlus, Copyright (c) 1996-2024, The Board of Trustees of the University
+# of Illinois, The Regents of the University of California, through Lawrence
+# Berkeley National Laboratory (subject to receipt of any required approvals
+# from the U.S. Dept. of Energy), Oak Ridge National Laboratory, managed by UT-
+# Battelle, Alliance for Sustainable Energy, LLC, and other contributors. All
+# rights reserved.
+#
+# NOTICE: This Software was developed under funding from the U.S. Department of
+# Energy and the U.S. Government consequently retains certain rights. As such,
+# the U.S. Government has been granted for itself and others acting on its
+# behalf a paid-up, nonexclusive, irrevocable, worldwide license in the
+# Software to reproduce, distribute copies to the public, prepare derivative
+# works, and perform publicly and display publicly, and to permit others to do
+# so.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+# (3) Neither the name of the University of California, Lawrence Berkeley
+#     National Laboratory, the University of Illinois, U.S. Dept. of Energy nor
+#     the names of its contributors may be used to endorse or promote products
+#     derived from this software without specific prior written permission.
+#
+# (4) Use of EnergyPlus(TM) Name. If Licensee (i) distributes the software in
+#     stand-alone form without changes from the version obtained under this
+#     License, or (ii) Licensee makes a reference solely to the software
+#     portion of its product, Licensee must refer to the software as
+#     "EnergyPlus version X" software, where "X" is the version number Licensee
+#     obtained under this License and may not use a different name for the
+#     software. Except as specifically required in this Section (4), Licensee
+#     shall not use in a company name, a product name, in advertising,
+#     publicity, or other promotional activities any name, trade name,
+#     trademark, logo, or other designation of "EnergyPlus", "E+", "e+" or
+#     confusingly similar designation, without the U.S. Department of Energy's
+#     prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import fcntl
+import os
+import select
+import stat
+import struct
+import time
+from ctypes import c_void_p
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+from pyenergyplus.common import EnergyPlusException
+
+# a child reports its accumulated cost and the number of steps it completed
+_RESULT = struct.Struct('<dq')
+
+
+def available_cores() -> int:
+    """
+    Returns the number of cores this process may run on, honouring CPU affinity where the platform supports it.
+
+    :return: The number of usable cores, at least 1
+    """
+    try:
+        return len(os.sched_getaffinity(0)) or 1
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _silence_output_files() -> None:
+    # A forked child shares the file descriptions (and offsets) of the parent's open files, so anything it wrote to the
+    # EnergyPlus output files would end up in the parent's results.  Every writable regular file, and the console, is
+    # pointed at /dev/null instead.
+    fd_dir = '/proc/self/fd' if os.path.isdir('/proc/self/fd') else '/dev/fd'
+    null = os.open(os.devnull, os.O_WRONLY)
+    for name in os.listdir(fd_dir):
+        fd = int(name)
+        if fd == null:
+            continue
+        try:
+            regular = stat.S_ISREG(os.fstat(fd).st_mode)
+            writable = (fcntl.fcntl(fd, fcntl.F_GETFL) & os.O_ACCMODE) in (os.O_WRONLY, os.O_RDWR)
+        except OSError:
+            continue
+        if (regular and writable) or fd in (1, 2):
+            os.dup2(null, fd)
+    os.close(null)
+
+
+class ForkLookahead:
+    """
+    This class evaluates candidate action sequences on the running simulation itself, by forking the process from
+    inside a Runtime callback.  Each child process is an exact copy of the simulation at the decision point: it applies
+    one candidate sequence for as many timesteps as the sequence is long, adds up the cost of each step, reports the
+    total to the parent through a pipe and exits.  The parent, which never ran any of the candidates, then applies the
+    first action of the cheapest sequence and carries on.  Model predictive controllers can thus screen candidate
+    setpoint trajectories against the full building model instead of re-running EnergyPlus from the start.
+
+    The instance is registered as the callback, and drives three user functions:
+
+        def propose(state):                 # candidates (K, H, ...) at a decision point, or None to skip it
+        def actuate(state, action):         # applies one action, such as setting actuator values
+        def cost(state):                    # cost of the timestep that just ended, read from the sensors
+
+        lookahead = ForkLookahead(propose, actuate, cost)
+        api.runtime.callback_begin_system_timestep_before_predictor(state, lookahead)
+        lookahead.run_energyplus(api.runtime, state, ['-d', 'out', '-w', weather_file, idf_file])
+
+    At most `processes` children run at once, by default one per available core; further candidates are started as
+    earlier ones finish.  A child whose simulation ends before its horizon reports the cost of the steps it completed,
+    which is why the simulation has to be started through `run_energyplus`; a child that dies without reporting costs
+    infinity.  The console and every writable regular file, notably the EnergyPlus output files, are redirected to
+    /dev/null in the children, so the parent's results only describe the actions the parent applied.
+
+    Forking requires a POSIX platform and is only safe when no other thread is running EnergyPlus in this process.
+    """
+
+    def __init__(self, propose: Callable[[c_void_p], Optional[np.ndarray]], actuate: Callable[[c_void_p, object], None],
+                 cost: Callable[[c_void_p], float], processes: Optional[int] = None, timeout: Optional[float] = None):
+        """
+        Create a new lookahead controller.
+
+        :param propose: Called at every callback of the parent with the state, returns an array of candidate
+                        sequences shaped (candidates, horizon, ...) or None when no decision is needed at this timestep
+        :param actuate: Called with the state and one action (one row of a candidate sequence) to apply it
+        :param cost: Called with the state at each callback after an action was applied, returns the cost of that step
+        :param processes: Maximum number of concurrent children, defaulting to the number of available cores
+        :param timeout: Seconds to wait for the children of one decision, after which the candidates not evaluated yet
+                        cost infinity (running children are killed); None waits indefinitely
+        """
+        if not hasattr(os, 'fork'):
+            raise EnergyPlusException("ForkLookahead requires os.fork, which is not available on this platform")
+        self.propose = propose
+        self.actuate = actuate
+        self.cost = cost
+        self.processes = processes or available_cores()
+        self.timeout = timeout
+        # set in a child: the sequence it rolls out, its progress, and the pipe to report through
+        self._sequence = None
+        self._step = 0
+        self._total = 0.0
+        self._pipe = None
+        #: costs of the candidates at the last decision
+        self.last_costs: Optional[np.ndarray] = None
+        #: number of decisions taken, and the total time spent in them in seconds
+        self.decisions = 0
+        self.decision_time = 0.0
+
+    @property
+    def in_child(self) -> bool:
+        """
+        Whether this process is a lookahead child rolling out a candidate sequence.
+        """
+        return self._sequence is not None
+
+    def __call__(self, state: c_void_p) -> None:
+        if self.in_child:
+            self._rollout_step(state)
+            return
+        candidates = self.propose(state)
+        if candidates is None:
+            return
+        best = self.evaluate(state, candidates)
+        if best is not None:
+            self.actuate(state, np.asarray(candidates)[best][0])
+
+    def _rollout_step(self, state: c_void_p) -> None:
+        try:
+            self._total += float(self.cost(state))
+            self._step += 1
+            if self._step < len(self._sequence):
+                self.actuate(state, self._sequence[self._step])
+                return
+        except BaseException:
+            self._total = np.inf
+        self._report()
+
+    def _report(self) -> None:
+        try:
+            os.write(self._pipe, _RESULT.pack(self._total, self._step))
+        finally:
+            os._exit(0)
+
+    def evaluate(self, state: c_void_p, candidates) -> Optional[int]:
+        """
+        Rolls out every candidate sequence in a forked child and collects the costs in `last_costs`.  In the parent this
+        returns the index of the cheapest candidate; each child returns None from here, having applied the first action
+        of its sequence, and continues the simulation until its horizon.
+
+        :param state: An active EnergyPlus state, inside a runtime callback
+        :param candidates: An array of candidate action sequences, shaped (candidates, horizon, ...)
+        :return: The index of the candidate with the lowest total cost in the parent, None in a child
+        """
+        candidates = np.asarray(candidates)
+        if candidates.ndim < 2 or not candidates.shape[0] or not candidates.shape[1]:
+            raise EnergyPlusException("Lookahead candidates must be shaped (candidates, horizon, ...), not {}".format(
+                candidates.shape))
+        start = time.perf_counter()
+        costs = np.full(len(candidates), np.inf)
+        running = {}  # read end of the pipe -> (pid, candidate index, received bytes)
+        pending = list(range(len(candidates)))
+        deadline = None if self.timeout is None else start + self.timeout
+        try:
+            while pending or running:
+                while pending and len(running) < self.processes:
+                    index = pending.pop(0)
+                    read, write = os.pipe()
+                    pid = os.fork()
+                    if pid == 0:
+                        os.close(read)
+                        for fd in running:
+                            os.close(fd)
+                        running.clear()
+                        self._start_child(state, candidates[index], write)
+                        return None
+                    os.close(write)
+                    running[read] = (pid, index, b'')
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    break
+                ready, _, _ = select.select(list(running), [], [], remaining)
+                for fd in ready:
+                    pid, index, received = running[fd]
+                    data = os.read(fd, _RESULT.size)
+                    if data:
+                        running[fd] = (pid, index, received + data)
+                        continue
+                    if len(received) == _RESULT.size:
+                        costs[index] = _RESULT.unpack(received)[0]
+                    del running[fd]
+                    os.close(fd)
+                    os.waitpid(pid, 0)
+        finally:
+            for fd, (pid, _, _) in running.items():
+                os.close(fd)
+                try:
+                    os.kill(pid, 9)
+                except ProcessLookupError:
+                    pass
+                os.waitpid(pid, 0)
+        self.last_costs = costs
+        self.decisions += 1
+        self.decision_time += time.perf_counter() - start
+        if not np.isfinite(costs).any():
+            raise EnergyPlusException("No lookahead child reported a cost for any of the {} candidates".format(
+                len(candidates)))
+        return int(np.argmin(costs))
+
+    def _start_child(self, state: c_void_p, sequence: Sequence, pipe: int) -> None:
+        _silence_output_files()
+        self._sequence = sequence
+        self._step = 0
+        self._total = 0.0
+        self._pipe = pipe
+        try:
+            self.actuate(state, sequence[0])
+        except BaseException:
+            self._total = np.inf
+            self._report()
+
+    def run_energyplus(self, runtime, state: c_void_p, command_line_args: List[str]) -> int:
+        """
+        Runs the simulation through Runtime.run_energyplus.  A lookahead child that reaches the end of the simulation
+        before its horizon reports the steps it completed and exits here, instead of continuing the caller's script.
+
+        :param runtime: The Runtime API instance
+        :param state: An active EnergyPlus state
+        :param command_line_args: The EnergyPlus command line arguments
+        :return: The EnergyPlus exit code, in the parent
+        """
+        try:
+            exit_code = runtime.run_energyplus(state, command_line_args)
+        finally:
+            if self.in_child:
+                self._report()
+        return exit_code
@@ -0,0 +1,202 @@
+# EnergyPlus, Copyright (c) 1996-2024, The Board of Trustees of the University
+# of Illinois, The Regents of the University of California, through Lawrence
+# Berkeley National Laboratory (subject to receipt of any required approvals
+# from the U.S. Dept. of Energy), Oak Ridge National Laboratory, managed by UT-
+# Battelle, Alliance for Sustainable Energy, LLC, and other contributors. All
+# rights reserved.
+#
+# NOTICE: This Software was developed under funding from the U.S. Department of
+# Energy and the U.S. Government consequently retains certain rights. As such,
+# the U.S. Government has been granted for itself and others acting on its
+# behalf a paid-up, nonexclusive, irrevocable, worldwide license in the
+# Software to reproduce, distribute copies to the public, prepare derivative
+# works, and perform publicly and display publicly, and to permit others to do
+# so.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+# (3) Neither the name of the University of California, Lawrence Berkeley
+#     National Laboratory, the University of Illinois, U.S. Dept. of Energy nor
+#     the names of its contributors may be used to endorse or promote products
+#     derived from this software without specific prior written permission.
+#
+# (4) Use of EnergyPlus(TM) Name. If Licensee (i) distributes the software in
+#     stand-alone form without changes from the version obtained under this
+#     License, or (ii) Licensee makes a reference solely to the software
+#     portion of its product, Licensee must refer to the software as
+#     "EnergyPlus version X" software, where "X" is the version number Licensee
+#     obtained under this License and may not use a different name for the
+#     software. Except as specifically required in this Section (4), Licensee
+#     shall not use in a company name, a product name, in advertising,
+#     publicity, or other promotional activities any name, trade name,
+#     trademark, logo, or other designation of "EnergyPlus", "E+", "e+" or
+#     confusingly similar designation, without the U.S. Department of Energy's
+#     prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+from ctypes import c_void_p
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from pyenergyplus.common import EnergyPlusException
+from pyenergyplus.plugin import EnergyPlusPlugin
+
+
+class MultiZonePlugin(EnergyPlusPlugin):
+    """
+    A plugin base class for control laws that apply to many zones at once.  Rather than writing one plugin per zone, or
+    looping over zones inside a hook, a derived class declares per zone sensor and actuator templates and implements a
+    single `control` method that works on NumPy arrays shaped (zones,).
+
+    Templates are strings in which `{zone}` is replaced by each zone name:
+
+        class Setback(MultiZonePlugin):
+            sensors = {'temperature': ('Zone Mean Air Temperature', '{zone}')}
+            actuators = {'cooling': ('Zone Temperature Control', 'Cooling Setpoint', '{zone}')}
+
+            def control(self, state, sensors):
+                return {'cooling': np.where(sensors['temperature'] > 26.0, 24.0, 26.0)}
+
+    The handles of every sensor and actuator are resolved once, the first time the API data is fully ready, and an
+    EnergyPlusException listing all of the unresolved names is raised if any are missing.  Then, at every
+    `on_begin_timestep_before_predictor` call, all sensors are read into preallocated arrays (through the shared sensor
+    cache), `control` is called once, and all returned actuator values are written back in one batch.  A NaN actuator
+    value resets that actuator, handing control of it back to EnergyPlus.
+    """
+
+    #: Zone names to control, or None for every Zone object in the input file
+    zones: Optional[List[str]] = None
+    #: Maps a sensor name to an (output variable name, key template) pair
+    sensors: Dict[str, Tuple[str, str]] = {}
+    #: Maps an actuator name to a (component type, control type, key template) triple
+    actuators: Dict[str, Tuple[str, str, str]] = {}
+    #: Whether to skip the control law during warmup days
+    skip_warmup: bool = False
+
+    def __init__(self):
+        super().__init__()
+        self.zone_names: Optional[List[str]] = None
+        self.sensor_handles: Dict[str, np.ndarray] = {}
+        self.actuator_handles: Dict[str, np.ndarray] = {}
+        self.sensor_values: Dict[str, np.ndarray] = {}
+
+    def _detect_overridden(self) -> List[str]:
+        overridden = super()._detect_overridden()
+        if 'on_begin_timestep_before_predictor' not in overridden:
+            overridden.append('on_begin_timestep_before_predictor')
+        return overridden
+
+    def control(self, state: c_void_p, sensors: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        The control law, to be implemented by derived classes.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param sensors: Maps each declared sensor name to an array of current values shaped (zones,).  The arrays are
+                        reused between timesteps, so copy them to keep values.
+        :return: Maps actuator names to values, each a scalar or an array shaped (zones,).  Actuators that are left
+                 out are not written this timestep.
+        """
+        raise NotImplementedError("MultiZonePlugin derived classes must implement control")
+
+    def resolve(self, state: c_void_p) -> None:
+        """
+        Resolves the zone names and the sensor and actuator handles.  This is called automatically once the API data
+        is fully ready.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :return: Nothing
+        """
+        exchange = self.api.exchange
+        zone_names = list(self.zones) if self.zones is not None else exchange.get_object_names(state, 'Zone')
+        missing = []
+        sensor_handles = {}
+        for name, (variable_name, key_template) in self.sensors.items():
+            handles = []
+            for zone in zone_names:
+                key = key_template.format(zone=zone)
+                handles.append(exchange.get_variable_handle(state, variable_name, key))
+                if handles[-1] == -1:
+                    missing.append("sensor '{}' ({}, {})".format(name, variable_name, key))
+            sensor_handles[name] = np.array(handles, dtype=np.intc)
+        actuator_handles = {}
+        for name, (component_type, control_type, key_template) in self.actuators.items():
+            handles = []
+            for zone in zone_names:
+                key = key_template.format(zone=zone)
+                handles.append(exchange.get_actuator_handle(state, component_type, control_type, key))
+                if handles[-1] == -1:
+                    missing.append("actuator '{}' ({}, {}, {})".format(name, component_type, control_type, key))
+            actuator_handles[name] = np.array(handles, dtype=np.intc)
+        if missing:
+            raise EnergyPlusException(
+                "{} could not resolve: {}".format(type(self).__name__, '; '.join(missing)))
+        self.zone_names = zone_names
+        self.sensor_handles = sensor_handles
+        self.actuator_handles = actuator_handles
+        self.sensor_values = {name: np.zeros(len(zone_names)) for name in sensor_handles}
+
+    def read_sensors(self, state: c_void_p) -> Dict[str, np.ndarray]:
+        """
+        Reads every declared sensor for every zone into the preallocated sensor arrays.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :return: Maps each sensor name to its array of values shaped (zones,)
+        """
+        get_variable_value = self.sensor_cache.get_variable_value
+        for name, handles in self.sensor_handles.items():
+            values = self.sensor_values[name]
+            for i, handle in enumerate(handles.tolist()):
+                values[i] = get_variable_value(state, handle)
+        return self.sensor_values
+
+    def write_actuators(self, state: c_void_p, values: Dict[str, np.ndarray]) -> None:
+        """
+        Writes actuator values for every zone in one pass.  NaN values reset the actuator instead.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param values: Maps actuator names to a scalar or an array shaped (zones,)
+        :return: Nothing
+        """
+        exchange = self.api.exchange
+        for name, value in values.items():
+            if name not in self.actuator_handles:
+                raise EnergyPlusException("{} returned undeclared actuator '{}'".format(type(self).__name__, name))
+            handles = self.actuator_handles[name]
+            array = np.broadcast_to(np.asarray(value, dtype=np.float64), handles.shape)
+            for handle, actuator_value in zip(handles.tolist(), array.tolist()):
+                if actuator_value != actuator_value:
+                    exchange.reset_actuator(state, handle)
+                else:
+                    exchange.set_actuator_value(state, handle, actuator_value)
+
+    def on_begin_timestep_before_predictor(self, state) -> int:
+        if self.zone_names is None:
+            if not self.api.exchange.api_data_fully_ready(state):
+                return 0
+            self.resolve(state)
+        if self.skip_warmup and self.api.exchange.warmup_flag(state):
+            return 0
+        outputs = self.control(state, self.read_sensors(state))
+        if outputs:
+            self.write_actuators(state, outputs)
+        return 0
@@ -0,0 +1,221 @@
+# EnergyPlus, Copyright (c) 1996-2024, The Board of Trustees of the University
+# of Illinois, The Regents of the University of California, through Lawrence
+# Berkeley National Laboratory (subject to receipt of any required approvals
+# from the U.S. Dept. of Energy), Oak Ridge National Laboratory, managed by UT-
+# Battelle, Alliance for Sustainable Energy, LLC, and other contributors. All
+# rights reserved.
+#
+# NOTICE: This Software was developed under funding from the U.S. Department of
+# Energy and the U.S. Government consequently retains certain rights. As such,
+# the U.S. Government has been granted for itself and others acting on its
+# behalf a paid-up, nonexclusive, irrevocable, worldwide license in the
+# Software to reproduce, distribute copies to the public, prepare derivative
+# works, and perform publicly and display publicly, and to permit others to do
+# so.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+# (3) Neither the name of the University of California, Lawrence Berkeley
+#     National Laboratory, the University of Illinois, U.S. Dept. of Energy nor
+#     the names of its contributors may be used to endorse or promote products
+#     derived from this software without specific prior written permission.
+#
+# (4) Use of EnergyPlus(TM) Name. If Licensee (i) distributes the software in
+#     stand-alone form without changes from the version obtained under this
+#     License, or (ii) Licensee makes a reference solely to the software
+#     portion of its product, Licensee must refer to the software as
+#     "EnergyPlus version X" software, where "X" is the version number Licensee
+#     obtained under this License and may not use a different name for the
+#     software. Except as specifically required in this Section (4), Licensee
+#     shall not use in a company name, a product name, in advertising,
+#     publicity, or other promotional activities any name, trade name,
+#     trademark, logo, or other designation of "EnergyPlus", "E+", "e+" or
+#     confusingly similar designation, without the U.S. Department of Energy's
+#     prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+from concurrent.futures import ThreadPoolExecutor
+from ctypes import c_void_p
+import os
+import threading
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from pyenergyplus.api import EnergyPlusAPI
+from pyenergyplus.common import EnergyPlusException
+from pyenergyplus.func import Glycol, Psychrometrics, Refrigerant
+
+
+class ParallelFunctional:
+    """
+    This class evaluates Functional API properties (Psychrometrics, Glycol and Refrigerant) over large input arrays
+    using a pool of worker threads.  ctypes releases the GIL for the duration of each foreign call, so the property
+    evaluations inside EnergyPlus run concurrently across cores, without the process start-up and data copying
+    overhead of multiprocessing.
+
+    Each worker thread lazily creates its own EnergyPlus state, initializes the functional API on it, and keeps its own
+    Psychrometrics, Glycol and Refrigerant instances, so no EnergyPlus data is shared between threads.  Inputs are
+    broadcast against each other, flattened, split into chunks, and the chunk results are gathered back in order and
+    reshaped to the broadcast shape.
+
+    An instance should be closed when no longer needed, which deletes the worker states, or used as a context manager:
+
+        with ParallelFunctional(api) as parallel:
+            rho = parallel.psychrometrics('density', pressures, temperatures, humidity_ratios)
+    """
+
+    def __init__(self, api: EnergyPlusAPI, workers: Optional[int] = None, chunk_size: int = 16384):
+        """
+        Create a new parallel evaluator.
+
+        :param api: An EnergyPlusAPI instance, not running as a Python Plugin, used to create the worker states
+        :param workers: Number of worker threads, defaulting to the number of CPUs
+        :param chunk_size: Number of elements each worker evaluates per task
+        """
+        if api.functional.plugin_mode:
+            raise EnergyPlusException("ParallelFunctional creates its own states and cannot be used inside a plugin")
+        if chunk_size < 1:
+            raise EnergyPlusException("ParallelFunctional chunk_size must be positive, not '{}'".format(chunk_size))
+        self.api = api
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='pyenergyplus-functional')
+        self._local = threading.local()
+        self._states: List[c_void_p] = []
+        self._instances = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _worker(self):
+        local = self._local
+        if not hasattr(local, 'state'):
+            local.state = self.api.state_manager.new_state()
+            self.api.functional.initialize(local.state)
+            local.psychrometrics = Psychrometrics(self.api.api)
+            local.glycols = {}
+            local.refrigerants = {}
+            with self._lock:
+                self._states.append(local.state)
+        return local
+
+    def _glycol(self, name: str) -> Glycol:
+        local = self._worker()
+        if name not in local.glycols:
+            local.glycols[name] = self.api.functional.glycol(local.state, name)
+            with self._lock:
+                self._instances.append((local.state, local.glycols[name]))
+        return local.glycols[name]
+
+    def _refrigerant(self, name: str) -> Refrigerant:
+        local = self._worker()
+        if name not in local.refrigerants:
+            local.refrigerants[name] = self.api.functional.refrigerant(local.state, name)
+            with self._lock:
+                self._instances.append((local.state, local.refrigerants[name]))
+        return local.refrigerants[name]
+
+    def _map(self, resolve: Callable[[], Callable], arguments) -> np.ndarray:
+        if self.executor is None:
+            raise EnergyPlusException("ParallelFunctional instance has already been closed")
+        arrays = np.broadcast_arrays(*[np.asarray(a, dtype=np.float64) for a in arguments])
+        shape = arrays[0].shape
+        columns = [a.ravel() for a in arrays]
+        size = columns[0].size
+
+        def evaluate(start: int) -> np.ndarray:
+            function = resolve()
+            state = self._local.state
+            stop = min(start + self.chunk_size, size)
+            rows = zip(*[c[start:stop].tolist() for c in columns])
+            return np.fromiter((function(state, *row) for row in rows), dtype=np.float64, count=stop - start)
+
+        chunks = list(self.executor.map(evaluate, range(0, size, self.chunk_size)))
+        if not chunks:
+            return np.empty(shape, dtype=np.float64)
+        return np.concatenate(chunks).reshape(shape)
+
+    def psychrometrics(self, method: str, *arguments) -> np.ndarray:
+        """
+        Evaluates a Psychrometrics method over arrays of inputs.
+
+        :param method: Name of the Psychrometrics method, such as 'density' or 'wet_bulb'
+        :param arguments: The method arguments after the state, in order, as scalars or broadcastable arrays
+        :return: An array of results with the broadcast shape of the arguments
+        """
+        if method not in ('density', 'latent_energy_of_air', 'latent_energy_of_moisture_in_air', 'enthalpy',
+                          'enthalpy_b', 'specific_heat', 'dry_bulb', 'vapor_density', 'relative_humidity',
+                          'relative_humidity_b', 'wet_bulb', 'specific_volume', 'saturation_pressure',
+                          'saturation_temperature', 'vapor_density_b', 'humidity_ratio', 'humidity_ratio_b',
+                          'humidity_ratio_c', 'humidity_ratio_d', 'dew_point', 'dew_point_b'):
+            raise EnergyPlusException("Unknown Psychrometrics method '{}'".format(method))
+        return self._map(lambda: getattr(self._worker().psychrometrics, method), arguments)
+
+    def glycol(self, glycol_name: str, method: str, temperature) -> np.ndarray:
+        """
+        Evaluates a Glycol property over an array of temperatures.
+
+        :param glycol_name: Name of the Glycol, for now only water is allowed
+        :param method: Name of the Glycol method, such as 'specific_heat' or 'density'
+        :param temperature: Fluid temperatures, in degrees Celsius
+        :return: An array of results with the shape of the temperatures
+        """
+        if method not in ('specific_heat', 'density', 'conductivity', 'viscosity'):
+            raise EnergyPlusException("Unknown Glycol method '{}'".format(method))
+        return self._map(lambda: getattr(self._glycol(glycol_name), method), (temperature,))
+
+    def refrigerant(self, refrigerant_name: str, method: str, *arguments) -> np.ndarray:
+        """
+        Evaluates a Refrigerant property over arrays of inputs.
+
+        :param refrigerant_name: Name of the Refrigerant, for now only steam is allowed
+        :param method: Name of the Refrigerant method, such as 'saturation_pressure' or 'saturated_enthalpy'
+        :param arguments: The method arguments after the state, in order, as scalars or broadcastable arrays
+        :return: An array of results with the broadcast shape of the arguments
+        """
+        if method not in ('saturation_pressure', 'saturation_temperature', 'saturated_enthalpy',
+                          'saturated_density', 'saturated_specific_heat'):
+            raise EnergyPlusException("Unknown Refrigerant method '{}'".format(method))
+        return self._map(lambda: getattr(self._refrigerant(refrigerant_name), method), arguments)
+
+    def close(self) -> None:
+        """
+        Shuts down the worker threads and deletes the fluid instances and states they created.
+
+        :return: Nothing
+        """
+        if self.executor is None:
+            return
+        self.executor.shutdown(wait=True)
+        self.executor = None
+        for state, instance in self._instances:
+            instance.delete(state)
+        for state in self._states:
+            self.api.functional.initialized_states.discard(state.value if isinstance(state, c_void_p) else state)
+            self.api.state_manager.delete_state(state)
+        self._instances.clear()
+        self._states.clear()
@@ -57,9 +57,109 @@ import sys
 if not hasattr(sys, 'argv'):
     sys.argv = ['']
 
-from typing import List
+from ctypes import c_void_p
+from functools import wraps
+from time import perf_counter
+from typing import Dict, List, Optional
 
 from pyenergyplus.api import EnergyPlusAPI
+from pyenergyplus.common import EnergyPlusException
+from pyenergyplus.datastore import SharedDataStore
+from pyenergyplus.datatransfer import DataExchange, SensorValueCache
+from pyenergyplus.runtime import Runtime
+
+
+class SensorCache:
+    """
+    The sensor reads shared by all plugins in a simulation, so that several plugins reading the same output variable or
+    meter during the same calling point cost a single call into EnergyPlus.
+
+    This is a view over a SensorValueCache (see pyenergyplus.datatransfer), which holds the values and decides when a
+    new round of plugin calls starts.  When the value cache of the exchange is enabled, the view uses that cache, so
+    reads through `self.sensor_cache` and through `self.api.exchange` share one set of values and counters; otherwise it
+    keeps a private SensorValueCache.  The `on_*` methods of plugin classes are wrapped to report each call to the cache
+    in use, and reads made outside of any hook are passed through uncached.
+    """
+
+    def __init__(self, exchange: DataExchange):
+        """
+        Create a new sensor cache.
+
+        :param exchange: The DataExchange instance used to read values on a cache miss
+        """
+        self.exchange = exchange
+        self._own_cache = SensorValueCache(exchange)
+
+    @property
+    def cache(self) -> SensorValueCache:
+        """
+        The SensorValueCache in use: the exchange's value cache when enabled, otherwise the private one.
+        """
+        return getattr(self.exchange, 'value_cache', None) or self._own_cache
+
+    def invalidate(self) -> None:
+        """
+        Empties the cache, so that the next read of every sensor calls into EnergyPlus.
+
+        :return: Nothing
+        """
+        self.cache.invalidate()
+
+    def get_variable_value(self, state: c_void_p, variable_handle: int) -> float:
+        """
+        Returns the current value of an output variable, reading it from EnergyPlus at most once per round.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param variable_handle: An integer returned from the `get_variable_handle` function.
+        :return: Floating point representation of the current variable value.
+        """
+        if getattr(self.exchange, 'value_cache', None) is not None:
+            # the exchange already reads through its value cache
+            return self.exchange.get_variable_value(state, variable_handle)
+        return self._own_cache.get(self.exchange.get_variable_value, state, variable_handle)
+
+    def get_meter_value(self, state: c_void_p, meter_handle: int) -> float:
+        """
+        Returns the current value of a meter, reading it from EnergyPlus at most once per round.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param meter_handle: An integer returned from the `get_meter_handle` function.
+        :return: Floating point representation of the current meter value.
+        """
+        if getattr(self.exchange, 'value_cache', None) is not None:
+            return self.exchange.get_meter_value(state, meter_handle)
+        return self._own_cache.get(self.exchange.get_meter_value, state, meter_handle)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the counters of the cache in use.
+
+        :return: A dictionary with the hits, misses, invalidations, and hit rate of the cache
+        """
+        return self.cache.stats()
+
+
+def _cached_hook(calling_point: str, function):
+    @wraps(function)
+    def hook(self, state):
+        # a hook calling its parent class implementation is still the same call
+        if getattr(self, '_in_hook', False):
+            return function(self, state)
+        exchange = EnergyPlusPlugin.shared_api().exchange
+        # a recording or replaying exchange (see pyenergyplus.replay) keeps one frame per hook call
+        begin_frame = getattr(exchange, 'begin_frame', None)
+        if begin_frame is not None:
+            begin_frame(type(self).__name__ + '.' + calling_point)
+        cache = EnergyPlusPlugin.shared_sensor_cache().cache
+        cache.begin_callback(self, calling_point)
+        self._in_hook = True
+        try:
+            return function(self, state)
+        finally:
+            self._in_hook = False
+            cache.end_callback()
+    hook._sensor_cache_hook = True
+    return hook
 
 
 class EnergyPlusPlugin(object):
@@ -74,8 +174,58 @@ class EnergyPlusPlugin(object):
     This base class also creates a convenience variable: self.data which is a dictionary.  This is purely a convenience
     to allow derived classes to store data on the class without having to declare a variable in a custom constructor.
     Derived classes can ignore this and store data as they see fit.
+
+    All plugins in a process share one EnergyPlusAPI instance, returned by `EnergyPlusPlugin.shared_api()`, and one
+    SensorCache, available as `self.sensor_cache`.  Plugins that read sensors through `self.sensor_cache` instead of
+    `self.api.exchange` share the values read by other plugins during the same calling point.  They also share one
+    SharedDataStore, available as `self.shared`, for exchanging typed array data between plugins.
     """
 
+    # these are deliberately not annotated, as a class level __annotations__ would be seen by _detect_overridden
+    _shared_api = None
+    _shared_sensor_cache = None
+    _shared_data_store = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name, member in list(cls.__dict__.items()):
+            if name.startswith('on_') and callable(member) and not getattr(member, '_sensor_cache_hook', False):
+                if callable(getattr(EnergyPlusPlugin, name, None)):
+                    setattr(cls, name, _cached_hook(name, member))
+
+    @staticmethod
+    def shared_api() -> EnergyPlusAPI:
+        """
+        Returns the EnergyPlusAPI instance shared by all plugins, creating it on the first call.
+
+        :return: The shared EnergyPlusAPI instance, set up for Python Plugin use
+        """
+        if EnergyPlusPlugin._shared_api is None:
+            EnergyPlusPlugin._shared_api = EnergyPlusAPI(True)
+        return EnergyPlusPlugin._shared_api
+
+    @staticmethod
+    def shared_sensor_cache() -> SensorCache:
+        """
+        Returns the SensorCache shared by all plugins, creating it on the first call.
+
+        :return: The shared SensorCache instance
+        """
+        if EnergyPlusPlugin._shared_sensor_cache is None:
+            EnergyPlusPlugin._shared_sensor_cache = SensorCache(EnergyPlusPlugin.shared_api().exchange)
+        return EnergyPlusPlugin._shared_sensor_cache
+
+    @staticmethod
+    def shared_data_store() -> SharedDataStore:
+        """
+        Returns the SharedDataStore shared by all plugins, creating it on the first call.
+
+        :return: The shared SharedDataStore instance
+        """
+        if EnergyPlusPlugin._shared_data_store is None:
+            EnergyPlusPlugin._shared_data_store = SharedDataStore()
+        return EnergyPlusPlugin._shared_data_store
+
     def __init__(self):
         """
         Constructor for the Plugin interface base class.  Does not take any arguments, initializes member variables.
@@ -83,9 +233,14 @@ class EnergyPlusPlugin(object):
         Note API is available on derived classes through:
         - self.api.functional provides access to a functional API class, instantiated and ready to go
         - self.api.exchange provides access to a data exchange API class, instantiated and ready to go
+        - self.sensor_cache provides cached sensor reads shared between plugins
+        - self.shared provides the typed data store shared between plugins
         """
         super().__init__()
-        self.api = EnergyPlusAPI(True)
+        self.api = self.shared_api()
+        self.sensor_cache = self.shared_sensor_cache()
+        self.shared = self.shared_data_store()
+        self._in_hook = False
         self.data = {}
 
     def _detect_overridden(self) -> List[str]:
@@ -159,3 +314,167 @@ class EnergyPlusPlugin(object):
 
     def on_unitary_system_sizing(self, state) -> int:
         pass
+
+
+#: Maps each plugin calling point to the Runtime method that registers a callback at the same point in API workflows.
+#: The user defined component model calling point needs a program name, so it is only available to Python Plugins.
+RUNTIME_CALLBACKS = {
+    'on_begin_new_environment': 'callback_begin_new_environment',
+    'on_after_new_environment_warmup_is_complete': 'callback_after_new_environment_warmup_complete',
+    'on_begin_zone_timestep_before_init_heat_balance': 'callback_begin_zone_timestep_before_init_heat_balance',
+    'on_begin_zone_timestep_after_init_heat_balance': 'callback_begin_zone_timestep_after_init_heat_balance',
+    'on_begin_timestep_before_predictor': 'callback_begin_system_timestep_before_predictor',
+    'on_begin_zone_timestep_before_set_current_weather': 'callback_begin_zone_timestep_before_set_current_weather',
+    'on_after_predictor_before_hvac_managers': 'callback_after_predictor_before_hvac_managers',
+    'on_after_predictor_after_hvac_managers': 'callback_after_predictor_after_hvac_managers',
+    'on_inside_hvac_system_iteration_loop': 'callback_inside_system_iteration_loop',
+    'on_end_of_zone_timestep_before_zone_reporting': 'callback_end_zone_timestep_before_zone_reporting',
+    'on_end_of_zone_timestep_after_zone_reporting': 'callback_end_zone_timestep_after_zone_reporting',
+    'on_end_of_system_timestep_before_hvac_reporting': 'callback_end_system_timestep_before_hvac_reporting',
+    'on_end_of_system_timestep_after_hvac_reporting': 'callback_end_system_timestep_after_hvac_reporting',
+    'on_end_of_zone_sizing': 'callback_end_zone_sizing',
+    'on_end_of_system_sizing': 'callback_end_system_sizing',
+    'on_end_of_component_input_read_in': 'callback_after_component_get_input',
+    'on_unitary_system_sizing': 'callback_unitary_system_sizing',
+}
+
+CALLING_POINTS = [name for name in EnergyPlusPlugin.__dict__ if name.startswith('on_')]
+
+_overridden_by_class: Dict[type, List[str]] = {}
+
+
+def overridden_hooks(plugin: EnergyPlusPlugin) -> List[str]:
+    """
+    Returns the calling points overridden by a plugin, computing them only once per plugin class.
+
+    :param plugin: A plugin instance
+    :return: A list of the overridden `on_*` method names, in calling point order
+    """
+    klass = type(plugin)
+    if klass in _overridden_by_class:
+        return _overridden_by_class[klass]
+    overridden = set(plugin._detect_overridden())
+    hooks = [name for name in CALLING_POINTS if name in overridden]
+    # only the default detection depends on the class alone, dispatchers report per instance
+    if klass._detect_overridden is EnergyPlusPlugin._detect_overridden:
+        _overridden_by_class[klass] = hooks
+    return hooks
+
+
+def _dispatch_hook(calling_point: str):
+    def hook(self, state) -> int:
+        for function in self.dispatch_table[calling_point]:
+            response = function(state)
+            if response:
+                return response
+        return 0
+    hook.__name__ = calling_point
+    hook._sensor_cache_hook = True
+    return hook
+
+
+class PluginDispatcher(EnergyPlusPlugin):
+    """
+    A plugin which hosts other plugins, so that EnergyPlus only calls into Python at the calling points that at least
+    one hosted plugin actually uses.  When the dispatcher is created, the overridden `on_*` methods of every hosted
+    plugin are compiled into one call list per calling point, and `_detect_overridden` reports only the calling points
+    with a non-empty list.  At each calling point the hosted plugins are called in order, and the first non-zero return
+    value stops the dispatch and is returned to EnergyPlus.
+
+    Hosted plugins are given either through the `plugin_classes` class attribute, which is how a derived class is
+    set up to be referenced from a PythonPlugin:Instance object, or through the constructor.  Per plugin hook latency
+    is measured when `measure_latency` is True, and reported by `latency_report()`.
+
+    The dispatcher can also drive the same plugins from an API workflow, see `register_callbacks`.
+    """
+
+    #: Plugin classes to instantiate and host, when no plugins are passed to the constructor
+    plugin_classes = []
+    #: Whether to time each hosted hook call
+    measure_latency = False
+
+    def __init__(self, plugins: Optional[List[EnergyPlusPlugin]] = None, measure_latency: Optional[bool] = None):
+        """
+        Create a new dispatcher and compile its dispatch table.
+
+        :param plugins: Plugin instances to host, defaulting to one instance of each class in `plugin_classes`
+        :param measure_latency: Overrides the `measure_latency` class attribute if given
+        """
+        super().__init__()
+        if measure_latency is not None:
+            self.measure_latency = measure_latency
+        self.plugins = plugins if plugins is not None else [klass() for klass in self.plugin_classes]
+        #: Total seconds and number of calls, keyed by (plugin label, calling point), labels are 'ClassName[index]'
+        self.latency: Dict[tuple, List[float]] = {}
+        self.dispatch_table: Dict[str, list] = {}
+        self.compile()
+
+    def compile(self) -> None:
+        """
+        Rebuilds the per calling point call lists from the hosted plugins.  This is done by the constructor, and only
+        needs to be called again if `plugins` or `measure_latency` is changed afterwards.
+
+        :return: Nothing
+        """
+        self.dispatch_table = {name: [] for name in CALLING_POINTS}
+        for index, plugin in enumerate(self.plugins):
+            label = '{}[{}]'.format(type(plugin).__name__, index)
+            for calling_point in overridden_hooks(plugin):
+                function = getattr(plugin, calling_point)
+                if self.measure_latency:
+                    function = self._timed(label, calling_point, function)
+                self.dispatch_table[calling_point].append(function)
+
+    def _timed(self, label: str, calling_point: str, function):
+        totals = self.latency.setdefault((label, calling_point), [0.0, 0])
+
+        def timed(state):
+            start = perf_counter()
+            try:
+                return function(state)
+            finally:
+                totals[0] += perf_counter() - start
+                totals[1] += 1
+        return timed
+
+    def _detect_overridden(self) -> List[str]:
+        return [name for name in CALLING_POINTS if self.dispatch_table.get(name)]
+
+    def latency_report(self) -> List[Dict[str, object]]:
+        """
+        Returns the measured hook latency of every hosted plugin, slowest total first.  This is empty unless latency
+        measurement is enabled.
+
+        :return: A list of dictionaries with the plugin, calling point, calls, and total and mean seconds
+        """
+        report = [
+            {'plugin': plugin, 'calling_point': calling_point, 'calls': calls, 'total_seconds': total,
+             'mean_seconds': total / calls if calls else 0.0}
+            for (plugin, calling_point), (total, calls) in self.latency.items()
+        ]
+        return sorted(report, key=lambda entry: entry['total_seconds'], reverse=True)
+
+    def register_callbacks(self, state: c_void_p, runtime: Optional[Runtime] = None) -> List[str]:
+        """
+        Registers the used calling points as Runtime API callbacks, for driving the hosted plugins from an API
+        workflow instead of the Python Plugin system.
+
+        :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.
+        :param runtime: The Runtime instance to register with, which should come from an EnergyPlusAPI instance
+                        that is not running as a Python Plugin
+        :return: The list of registered calling points
+        """
+        if runtime is None:
+            runtime = EnergyPlusAPI().runtime
+        registered = []
+        for calling_point in self._detect_overridden():
+            if calling_point not in RUNTIME_CALLBACKS:
+                raise EnergyPlusException(
+                    "Calling point '{}' cannot be registered through the Runtime API".format(calling_point))
+            getattr(runtime, RUNTIME_CALLBACKS[calling_point])(state, getattr(self, calling_point))
+            registered.append(calling_point)
+        return registered
+
+
+for _calling_point in CALLING_POINTS:
+    setattr(PluginDispatcher, _calling_point, _dispatch_hook(_calling_point))
@@ -0,0 +1,576 @@
+# EnergyPlus, Copyright (c) 1996-2024, The Board of Trustees of the University
+# of Illinois, The Regents of the University of California, through Lawrence
+# Berkeley National Laboratory (subject to receipt of any required approvals
+# from the U.S. Dept. of Energy), Oak Ridge National Laboratory, managed by UT-
+# Battelle, Alliance for Sustainable Energy, LLC, and other contributors. All
+# rights reserved.
+#
+# NOTICE: This Software was developed under funding from the U.S. Department of
+# Energy and the U.S. Government consequently retains certain rights. As such,
+# the U.S. Government has been granted for itself and others acting on its
+# behalf a paid-up, nonexclusive, irrevocable, worldwide license in the
+# Software to reproduce, distribute copies to the public, prepare derivative
+# works, and perform publicly and display publicly, and to permit others to do
+# so.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+# (3) Neither the name of the University of California, Lawrence Berkeley
+#     National Laboratory, the University of Illinois, U.S. Dept. of Energy nor
+#     the names of its contributors may be used to endorse or promote products
+#     derived from this software without specific prior written permission.
+#
+# (4) Use of EnergyPlus(TM) Name. If Licensee (i) distributes the software in
+#     stand-alone form without changes from the version obtained under this
+#     License, or (ii) Licensee makes a reference solely to the software
+#     portion of its product, Licensee must refer to the software as
+#     "EnergyPlus version X" software, where "X" is the version number Licensee
+#     obtained under this License and may not use a different name for the
+#     software. Except as specifically required in this Section (4), Licensee
+#     shall not use in a company name, a product name, in advertising,
+#     publicity, or other promotional activities any name, trade name,
+#     trademark, logo, or other designation of "EnergyPlus", "E+", "e+" or
+#     confusingly similar designation, without the U.S. Department of Energy's
+#     prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+from ctypes import c_void_p
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from pyenergyplus.common import EnergyPlusException
+
+ArrayLike = Union[float, np.ndarray]
+
+# Offset between Celsius and Kelvin, matching Constant::Kelvin inside EnergyPlus
+KELVIN = 273.15
+
+# Maximum absolute difference allowed between this module and the EnergyPlus library for each function when running
+# `validate_against_energyplus`.  Closed form correlations are evaluated with the same coefficients as EnergyPlus and
+# only differ by floating point round-off.  Anything built on the saturation pressure inherits the small quantization
+# of the saturation pressure cache inside EnergyPlus.  The iterative functions are solved here to a tighter tolerance
+# than EnergyPlus uses internally, and EnergyPlus evaluates `saturation_temperature` from a piecewise polynomial fit of
+# the exact curve that is solved here, so those carry the loosest tolerance.
+VALIDATION_TOLERANCES: Dict[str, float] = {
+    'density': 1.0e-6,  # kg/m3
+    'latent_energy_of_air': 1.0e-6,  # J/kg
+    'latent_energy_of_moisture_in_air': 1.0e-6,  # J/kg
+    'enthalpy': 1.0e-6,  # J/kg
+    'enthalpy_b': 5.0,  # J/kg
+    'specific_heat': 1.0e-6,  # J/kg-K
+    'dry_bulb': 1.0e-6,  # C
+    'vapor_density': 1.0e-9,  # kg/m3
+    'relative_humidity': 2.0e-3,  # fraction
+    'relative_humidity_b': 2.0e-3,  # fraction
+    'wet_bulb': 2.0e-2,  # C
+    'specific_volume': 1.0e-6,  # m3/kg
+    'saturation_pressure': 2.0,  # Pa
+    'saturation_temperature': 0.25,  # C
+    'vapor_density_b': 1.0e-5,  # kg/m3
+    'humidity_ratio': 1.0e-9,  # kgWater/kgDryAir
+    'humidity_ratio_b': 2.0e-5,  # kgWater/kgDryAir
+    'humidity_ratio_c': 2.0e-5,  # kgWater/kgDryAir
+    'humidity_ratio_d': 2.0e-5,  # kgWater/kgDryAir
+    'dew_point': 2.0e-2,  # C
+    'dew_point_b': 2.0e-2,  # C
+}
+
+
+def _as_float_arrays(*values: ArrayLike) -> Tuple[np.ndarray, ...]:
+    return tuple(np.broadcast_arrays(*[np.asarray(v, dtype=np.float64) for v in values]))
+
+
+def _as_output(value: np.ndarray) -> ArrayLike:
+    if np.ndim(value) == 0:
+        return float(value)
+    return value
+
+
+def _ln_saturation_pressure(temperature: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Evaluates the natural log of the saturation pressure (Pa) and its derivative with respect to temperature using the
+    Hyland-Wexler correlations from ASHRAE Fundamentals, which is the same set of correlations used inside EnergyPlus.
+    The ice correlation is used below 0 C, the liquid water correlation is used from 0 C to 200 C, and the pressure is
+    held constant outside of the range of -100 C to 200 C.
+
+    :param temperature: Temperature array, in C
+    :return: A tuple of the log of the saturation pressure and its derivative with respect to temperature, in 1/K
+    """
+    t_kel = np.clip(temperature + KELVIN, 173.15, 473.15)
+    # Ice (-100 to 0 C)
+    c1, c2, c3, c4, c5, c6, c7 = (
+        -5674.5359, 6.3925247, -0.9677843e-2, 0.62215701e-6, 0.20747825e-8, -0.9484024e-12, 4.1635019
+    )
+    ln_ice = c1 / t_kel + c2 + t_kel * (c3 + t_kel * (c4 + t_kel * (c5 + c6 * t_kel))) + c7 * np.log(t_kel)
+    d_ice = -c1 / t_kel ** 2 + c3 + t_kel * (2.0 * c4 + t_kel * (3.0 * c5 + 4.0 * c6 * t_kel)) + c7 / t_kel
+    # Water (0 to 200 C)
+    c8, c9, c10, c11, c12, c13 = -5800.2206, 1.3914993, -0.048640239, 0.41764768e-4, -0.14452093e-7, 6.5459673
+    ln_water = c8 / t_kel + c9 + t_kel * (c10 + t_kel * (c11 + t_kel * c12)) + c13 * np.log(t_kel)
+    d_water = -c8 / t_kel ** 2 + c10 + t_kel * (2.0 * c11 + 3.0 * c12 * t_kel) + c13 / t_kel
+    is_ice = t_kel < KELVIN
+    out_of_range = (temperature + KELVIN < 173.15) | (temperature + KELVIN > 473.15)
+    ln_pressure = np.where(is_ice, ln_ice, ln_water)
+    derivative = np.where(out_of_range, 0.0, np.where(is_ice, d_ice, d_water))
+    return ln_pressure, derivative
+
+
+def _saturation_temperature_from_pressure(pressure: np.ndarray, max_iterations: int = 50,
+                                          tolerance: float = 1.0e-9) -> np.ndarray:
+    """
+    Inverts the saturation pressure correlation with a vectorized Newton solve on the log of the pressure.  This is the
+    vectorized counterpart of PsyTsatFnPb inside EnergyPlus, including its limits of -100 C and 200 C.
+
+    :param pressure: Pressure array, in Pa
+    :return: Saturation temperature array, in C
+    """
+    low_limit = pressure <= 0.0017
+    high_limit = pressure > 1555000.0
+    ln_target = np.log(np.clip(pressure, 0.0017, 1555000.0))
+    # the Magnus form of the saturation curve is a good enough starting point for every point on the curve
+    ln_ratio = ln_target - np.log(610.94)
+    temperature = np.clip(243.04 * ln_ratio / (17.625 - ln_ratio), -100.0, 200.0)
+    for _ in range(max_iterations):
+        ln_pressure, derivative = _ln_saturation_pressure(temperature)
+        step = (ln_pressure - ln_target) / derivative
+        temperature = np.clip(temperature - step, -100.0, 200.0)
+        if np.all(np.abs(step) < tolerance):
+            break
+    return np.where(low_limit, -100.0, np.where(high_limit, 200.0, temperature))
+
+
+class NumPyPsychrometrics:
+    """
+    This class provides a pure NumPy implementation of the psychrometric functions that are exposed by the EnergyPlus
+    `Psychrometrics` API class.  The method names and argument order match that class, without the leading `state`
+    argument, so no EnergyPlus library or state is needed to evaluate them.  This allows offline analysis and reward
+    calculations to be done on machines that do not have EnergyPlus installed.
+
+    All methods accept either Python floats or NumPy arrays, which are broadcast against each other.  When all of the
+    arguments are scalars, a Python float is returned, otherwise an array of the broadcast shape is returned.  The
+    functions that are iterative inside EnergyPlus, such as `wet_bulb` and `saturation_temperature`, are evaluated with
+    vectorized Newton solves across the whole array at once.
+
+    The `validate_against_energyplus` function in this module compares every method against the EnergyPlus library,
+    using the tolerances listed in `VALIDATION_TOLERANCES`.
+    """
+
+    def __init__(self, max_iterations: int = 50, tolerance: float = 1.0e-9):
+        """
+        Creates a new NumPyPsychrometrics instance.
+
+        :param max_iterations: Maximum number of Newton iterations used by the iterative property functions
+        :param tolerance: Convergence tolerance on the temperature update of the iterative property functions, in C
+        """
+        self.max_iterations = max_iterations
+        self.tolerance = tolerance
+
+    def density(self, barometric_pressure: ArrayLike, dry_bulb_temp: ArrayLike, humidity_ratio: ArrayLike) -> ArrayLike:
+        """
+        Returns the psychrometric density at the specified conditions.
+
+        :param barometric_pressure: Barometric pressure, in Pa
+        :param dry_bulb_temp: Psychrometric dry bulb temperature, in C
+        :param humidity_ratio: Humidity ratio, in kgWater/kgDryAir
+        :return: Density of moist air, in kg/m3
+        """
+        pb, tdb, w = _as_float_arrays(barometric_pressure, dry_bulb_temp, humidity_ratio)
+        return _as_output(pb / (287.0 * (tdb + KELVIN) * (1.0 + 1.6077687 * np.maximum(w, 1.0e-5))))
+
+    def latent_energy_of_air(self, dry_bulb_temp: ArrayLike) -> ArrayLike:
+        """
+        Returns the psychrometric latent energy of air at the specified conditions.
+
+        :param dry_bulb_temp: Psychrometric dry bulb temperature, in C
+        :return: Latent energy of air, in J/kg
+        """
+        temperature = np.maximum(np.asarray(dry_bulb_temp, dtype=np.float64), 0.0)
+        return _as_output((2500940.0 + 1858.95 * temperature) - (4180.0 * temperature))
+
+    def latent_energy_of_moisture_in_air(self, dry_bulb_temp: ArrayLike) -> ArrayLike:
+        """
+        Returns the psychrometric latent energy of the moisture in air at the specified conditions.
+
+        :param dry_bulb_temp: Psychrometric dry bulb temperature, in C
+        :return: Latent energy of the moisture in air, in J/kg
+        """
+        temperature = np.maximum(np.asarray(dry_bulb_temp, dtype=np.float64), 0.0)
+        return _as_output(2500940.0 + 1858.95 * temperature)
+
+    def enthalpy(self, dry_bulb_temp: ArrayLike, humidity_ratio: ArrayLike) -> ArrayLike:
+        """
+        Returns the psychrometric enthalpy at the specified conditions.
+
+        :param dry_bulb_temp: Psychrometric dry bulb temperature, in C
+        :param humidity_ratio: Humidity ratio, in kgWater/kgDryAir
+        :return: Enthalpy of moist air, in J/kg
+        """
+        tdb, w = _as_float_arrays(dry_bulb_temp, humidity_ratio)
+        return _as_output(self._enthalpy(tdb, w))
+
+    def enthalpy_b(self, dry_bulb_temp: ArrayLike, relative_humidity_fraction: ArrayLike,
+                   barometric_pressure: ArrayLike) -> ArrayLike:
+        """
+        Returns the psychrometric enthalpy at the specified conditions.
+
+        :param dry_bulb_temp: Psychrometric dry bulb temperature, in C
+        :param relative_humidity_fraction: Psychrometric relative humidity, as a fraction from 0.0 to 1.0.
+        :param barometric_pressure: Barometric pressure, in Pa
+        :return: Enthalpy of moist air, in J/kg
+        """
+        tdb, rh, pb = _as_float_arrays(dry_bulb_temp, relative_humidity_fraction, barometric_pressure)
+        w = np.maximum(self._humidity_ratio_from_relative_humidity(tdb, rh, pb), 1.0e-5)
+        return _as_output(self._enthalpy(tdb, w))
+
+    def specific_heat(self, humidity_ratio: ArrayLike) -> ArrayLike:
+        """
+        Returns the psychrometric specific heat at the specified conditions.
+
+        :param humidity_ratio: Humidity ratio, in kgWater/kgDryAir
+        :return: Specific heat of moist air, in J/kg-K
+        """
+        w = np.maximum(np.asarray(humidity_ratio, dtype=np.float64), 1.0e-5)
+        return _as_output(1.00484e3 + w * 1.85895e3)
+
+    def dry_bulb(self, enthalpy: ArrayLike, humidity_ratio: ArrayLike) -> ArrayLike:
+        """
+        Returns the psychrometric dry bulb temperature at the specified conditions.
+
+        :param enthalpy: Psychrometric enthalpy, in J/kg
+        :param humidity_ratio: Humidity ratio, in kgWater/kgDryAir
+        :return: Dry bulb temperature, in C
+        """
+        h, w = _as_float_arrays(enthalpy, humidity_ratio)
+        w = np.maximum(w, 1.0e-5)
+        return _as_output((h - 2.50094e6 * w) / (1.00484e3 + 1.85895e3 * w))
+
+    def vapor_density(self, dry_bulb_temp: ArrayLike, humidity_ratio: ArrayLike,
+                      barometric_pressure: ArrayLike) -> ArrayLike:
+        """
+        Returns the psychrometric vapor density at the specified conditions.
+
+        :param dry_bulb_temp: Psychrometric dry bulb temperature, in C
+        :param humidity_ratio: Humidity ratio, in kgWater/kgDryAir
+        :param barometric_pressure: Barometric pressure, in Pa
+        :return: Vapor density, in kg/m3
+        """
+        tdb, w, pb = _as_float_arrays(dry_bulb_temp, humidity_ratio, barometric_pressure)
+        w = np.maximum(w, 1.0e-5)
+        return _as_output(w * pb / (461.52 * (tdb + KELVIN) * (w + 0.62198)))
+
+    def relative_humidity(self, dry_bulb_temp: ArrayLike, vapor_density: ArrayLike) -> ArrayLike:
+        """
+        Returns the psychrometric relative humidity at the specified conditions.
+
+        :param dry_bulb_temp: Psychrometric dry bulb temperature, in C
+        :param vapor_density: Psychrometric vapor density, in kg/m3
+        :return: Relative humidity, as a fraction from 0.01 to 1.0
+        """
+        tdb, rho_v = _as_float_arrays(dry_bulb_temp, vapor_density)
+        rh = np.where(rho_v > 0.0, rho_v * 461.52 * (tdb + KELVIN) / self._saturation_pressure(tdb), 0.0)
+        return _as_output(np.maximum(np.minimum(rh, 1.0), 0.01))
+
+    def relative_humidity_b(self, dry_bulb_temp: ArrayLike, humidity_ratio: ArrayLike,
+                            barometric_pressure: ArrayLike) -> ArrayLike:
+        """
+        Returns the psychrometric relative humidity at the specified conditions.
+
+        :param dry_bulb_temp: Psychrometric dry bulb temperature, in C
+        :param humidity_ratio: Humidity ratio, in kgWater/kgDryAir
+        :param barometric_pressure: Barometric pressure, in Pa
+        :return: Relative humidity, as a fraction from 0.01 to 1.0
+        """
+        tdb, w, pb = _as_float_arrays(dry_bulb_temp, humidity_ratio, barometric_pressure)
+        p_ws = self._saturation_pressure(tdb)
+        degree_of_saturation = np.maximum(w, 1.0e-5) / (0.62198 * p_ws / (pb - p_ws))
+        rh = degree_of_saturation / (1.0 - (1.0 - degree_of_saturation) * (p_ws / pb))
+        return _as_output(np.maximum(np.minimum(rh, 1.0), 0.01))
+
+    def wet_bulb(self, dry_bulb_temp: ArrayLike, humidity_ratio: ArrayLike,
+                 barometric_pressure: ArrayLike) -> ArrayLike:
+        """
+        Returns the psychrometric wet bulb temperature at the specified conditions.  This is solved with a vectorized
+        Newton iteration on the humidity ratio residual, which is the same equation that EnergyPlus iterates on.
+
+        :param dry_bulb_temp: Psychrometric dry bulb temperature, in C
+        :param humidity_ratio: Humidity ratio, in kgWater/kgDryAir
+        :param barometric_pressure: Barometric pressure, in Pa
+        :return: Wet bulb temperature, in C
+        """
+        tdb, w, pb = _as_float_arrays(dry_bulb_temp, humidity_ratio, barometric_pressure)
+        w = np.maximum(w, 1.0e-5)
+        t_boil = _saturation_temperature_from_pressure(pb)
+        upper = np.minimum(tdb, t_boil - 0.1)
+        twb = upper.copy()
+        delta = 1.0e-4
+        for _ in range(self.max_iterations):
+            residual = self._humidity_ratio_from_wet_bulb(tdb, twb, pb) - w
+            slope = (self._humidity_ratio_from_wet_bulb(tdb, twb + delta, pb) - residual - w) / delta
+            step = residual / np.where(slope > 0.0, slope, 1.0e-6)
+            twb = np.clip(twb - step, -100.0, upper)
+            if np.all(np.abs(step) < self.tolerance):
+                break
+        return _as_output(twb)
+
+    def specific_volume(self, dry_bulb_temp: ArrayLike, humidity_ratio: ArrayLike,
+                        barometric_pressure: ArrayLike) -> ArrayLike:
+        """
+        Returns the psychrometric specific volume at the specified conditions.
+
+        :param dry_bulb_temp: Psychrometric dry bulb temperature, in C
+        :param humidity_ratio: Humidity ratio, in kgWater/kgDryAir
+        :param barometric_pressure: Barometric pressure, in Pa
+        :return: Specific volume, in m3/kg
+        """
+        tdb, w, pb = _as_float_arrays(dry_bulb_temp, humidity_ratio, barometric_pressure)
+        w = np.maximum(w, 1.0e-5)
+        return _as_output(1.59473e2 * (1.0 + 1.6078 * w) * (1.8 * tdb + 492.0) / pb)
+
+    def saturation_pressure(self, dry_bulb_temp: ArrayLike) -> ArrayLike:
+        """
+        Returns the psychrometric saturation pressure at the specified conditions.
+
+        :param dry_bulb_temp: Psychrometric dry bulb temperature, in C
+        :return: Saturation pressure, in Pa
+        """
+        return _as_output(self._saturation_pressure(np.asarray(dry_bulb_temp, dtype=np.float64)))
+
+    def saturation_temperature(self, enthalpy: ArrayLike, barometric_pressure: ArrayLike) -> ArrayLike:
+        """
+        Returns the psychrometric saturation temperature at the specified conditions.  This is the temperature at which
+        saturated air has the given enthalpy, solved with a vectorized Newton iteration.  Starting from the dry air
+        temperature of the given enthalpy approaches the root from above, where the saturated enthalpy curve is convex,
+        so the iteration converges monotonically.
+
+        :param enthalpy: Psychrometric enthalpy, in J/kg
+        :param barometric_pressure: Barometric pressure, in Pa
+        :return: Saturation temperature, in C
+        """
+        h, pb = _as_float_arrays(enthalpy, barometric_pressure)
+        t_boil = _saturation_temperature_from_pressure(pb)
+        upper = t_boil - 0.5
+        temperature = np.clip(h / 1.00484e3, -100.0, upper)
+        for _ in range(self.max_iterations):
+            ln_p_sat, d_ln_p_sat = _ln_saturation_pressure(temperature)
+            p_sat = np.exp(ln_p_sat)
+            w = 0.62198 * p_sat / (pb - p_sat)
+            dw_dt = 0.62198 * pb * p_sat * d_ln_p_sat / (pb - p_sat) ** 2
+            residual = self._enthalpy(temperature, np.maximum(w, 1.0e-5)) - h
+            slope = 1.00484e3 + 1.85895e3 * w + (2.50094e6 + 1.85895e3 * temperature) * dw_dt
+            step = residual / slope
+            temperature = np.clip(temperature - step, -100.0, upper)
+            if np.all(np.abs(step) < self.tolerance):
+                break
+        return _as_output(temperature)
+
+    def vapor_density_b(self, dry_bulb_temp: ArrayLike, relative_humidity_fraction: ArrayLike) -> ArrayLike:
+        """
+        Returns the psychrometric vapor density at the specified conditions.
+
+        :param dry_bulb_temp: Psychrometric dry bulb temperature, in C
+        :param relative_humidity_fraction: Psychrometric relative humidity, as a fraction from 0.0 to 1.0.
+        :return: Vapor density, in kg/m3
+        """
+        tdb, rh = _as_float_arrays(dry_bulb_temp, relative_humidity_fraction)
+        return _as_output(rh * self._saturation_pressure(tdb) / (461.52 * (tdb + KELVIN)))
+
+    def humidity_ratio(self, dry_bulb_temp: ArrayLike, enthalpy: ArrayLike) -> ArrayLike:
+        """
+        Returns the psychrometric humidity ratio at the specified conditions.
+
+        :param dry_bulb_temp: Psychrometric dry bulb temperature, in C
+        :param enthalpy: Psychrometric enthalpy, in J/kg
+        :return: Humidity ratio, in kgWater/kgDryAir
+        """
+        tdb, h = _as_float_arrays(dry_bulb_temp, enthalpy)
+        w = (h - 1.00484e3 * tdb) / (2.50094e6 + 1.85895e3 * tdb)
+        return _as_output(np.maximum(w, 1.0e-5))
+
+    def humidity_ratio_b(self, dew_point_temp: ArrayLike, barometric_pressure: ArrayLike) -> ArrayLike:
+        """
+        Returns the psychrometric humidity ratio at the specified conditions.
+
+        :param dew_point_temp: Psychrometric dew point temperature, in Celsius
+        :param barometric_pressure: Barometric pressure, in Pa
+        :return: Humidity ratio, in kgWater/kgDryAir
+        """
+        tdp, pb = _as_float_arrays(dew_point_temp, barometric_pressure)
+        return _as_output(self._humidity_ratio_from_dew_point(tdp, pb))
+
+    def humidity_ratio_c(self, dry_bulb_temp: ArrayLike, relative_humidity_fraction: ArrayLike,
+                         barometric_pressure: ArrayLike) -> ArrayLike:
+        """
+        Returns the psychrometric humidity ratio at the specified conditions.
+
+        :param dry_bulb_temp: Psychrometric dry bulb temperature, in C
+        :param relative_humidity_fraction: Psychrometric relative humidity, as a fraction from 0.0 to 1.0.
+        :param barometric_pressure: Barometric pressure, in Pa
+        :return: Humidity ratio, in kgWater/kgDryAir
+        """
+        tdb, rh, pb = _as_float_arrays(dry_bulb_temp, relative_humidity_fraction, barometric_pressure)
+        return _as_output(self._humidity_ratio_from_relative_humidity(tdb, rh, pb))
+
+    def humidity_ratio_d(self, dry_bulb_temp: ArrayLike, wet_bulb_temp: ArrayLike,
+                         barometric_pressure: ArrayLike) -> ArrayLike:
+        """
+        Returns the psychrometric humidity ratio at the specified conditions.
+
+        :param dry_bulb_temp: Psychrometric dry bulb temperature, in C
+        :param wet_bulb_temp: Psychrometric wet bulb temperature, in C
+        :param barometric_pressure: Barometric pressure, in Pa
+        :return: Humidity ratio, in kgWater/kgDryAir
+        """
+        tdb, twb, pb = _as_float_arrays(dry_bulb_temp, wet_bulb_temp, barometric_pressure)
+        w = self._humidity_ratio_from_wet_bulb(tdb, np.minimum(twb, tdb), pb)
+        w = np.where(w < 0.0, self._humidity_ratio_from_relative_humidity(tdb, 0.0001, pb), w)
+        return _as_output(w)
+
+    def dew_point(self, humidity_ratio: ArrayLike, barometric_pressure: ArrayLike) -> ArrayLike:
+        """
+        Returns the psychrometric dew point temperature at the specified conditions.
+
+        :param humidity_ratio: Humidity ratio, in kgWater/kgDryAir
+        :param barometric_pressure: Barometric pressure, in Pa
+        :return: Dew point temperature, in C
+        """
+        w, pb = _as_float_arrays(humidity_ratio, barometric_pressure)
+        return _as_output(self._dew_point(w, pb))
+
+    def dew_point_b(self, dry_bulb_temp: ArrayLike, wet_bulb_temp: ArrayLike,
+                    barometric_pressure: ArrayLike) -> ArrayLike:
+        """
+        Returns the psychrometric dew point temperature at the specified conditions.
+
+        :param dry_bulb_temp: Psychrometric dry bulb temperature, in C
+        :param wet_bulb_temp: Psychrometric wet bulb temperature, in C
+        :param barometric_pressure: Barometric pressure, in Pa
+        :return: Dew point temperature, in C
+        """
+        tdb, twb, pb = _as_float_arrays(dry_bulb_temp, wet_bulb_temp, barometric_pressure)
+        w = np.maximum(self._humidity_ratio_from_wet_bulb(tdb, np.minimum(twb, tdb), pb), 1.0e-5)
+        return _as_output(np.minimum(self._dew_point(w, pb), twb))
+
+    @staticmethod
+    def _enthalpy(tdb: np.ndarray, w: np.ndarray) -> np.ndarray:
+        w = np.maximum(w, 1.0e-5)
+        return 1.00484e3 * tdb + w * (2.50094e6 + 1.85895e3 * tdb)
+
+    @staticmethod
+    def _saturation_pressure(temperature: np.ndarray) -> np.ndarray:
+        return np.exp(_ln_saturation_pressure(temperature)[0])
+
+    def _dew_point(self, w: np.ndarray, pb: np.ndarray) -> np.ndarray:
+        w = np.maximum(w, 1.0e-5)
+        return _saturation_temperature_from_pressure(pb * w / (0.62198 + w), self.max_iterations, self.tolerance)
+
+    def _humidity_ratio_from_dew_point(self, tdp: np.ndarray, pb: np.ndarray) -> np.ndarray:
+        p_dew = self._saturation_pressure(tdp)
+        # EnergyPlus steps the dew point down one degree at a time until the vapor pressure drops below the
+        # barometric pressure, so mirror that for the (rare) points that are above the boiling point
+        shift = np.zeros_like(tdp)
+        invalid = p_dew >= pb
+        while np.any(invalid):
+            shift = np.where(invalid, shift + 1.0, shift)
+            p_dew = np.where(invalid, self._saturation_pressure(tdp - shift), p_dew)
+            invalid = p_dew >= pb
+        return p_dew * 0.62198 / (pb - p_dew)
+
+    def _humidity_ratio_from_relative_humidity(self, tdb: np.ndarray, rh: ArrayLike, pb: np.ndarray) -> np.ndarray:
+        p_dew = rh * self._saturation_pressure(tdb)
+        return np.maximum(p_dew * 0.62198 / (pb - p_dew), 1.0e-5)
+
+    def _humidity_ratio_from_wet_bulb(self, tdb: np.ndarray, twb: np.ndarray, pb: np.ndarray) -> np.ndarray:
+        p_wet = self._saturation_pressure(twb)
+        w_wet = 0.62198 * p_wet / (pb - p_wet)
+        above_freezing = ((2501.0 - 2.326 * twb) * w_wet - 1.006 * (tdb - twb)) / (2501.0 + 1.86 * tdb - 4.186 * twb)
+        below_freezing = ((2830.0 - 0.24 * twb) * w_wet - 1.006 * (tdb - twb)) / (2830.0 + 1.86 * tdb - 2.1 * twb)
+        return np.where(twb >= 0.0, above_freezing, below_freezing)
+
+
+def validate_against_energyplus(api, state: Optional[c_void_p] = None, samples: int = 12,
+                                raise_on_failure: bool = True) -> Dict[str, Tuple[float, float]]:
+    """
+    Compares every NumPyPsychrometrics method against the EnergyPlus library over a grid of conditions spanning typical
+    building operation: dry bulb temperatures from -20 C to 50 C, relative humidity from 5% to 100%, and barometric
+    pressures from 80 kPa to 105 kPa.  The maximum absolute difference for each function is compared to the tolerance
+    listed in `VALIDATION_TOLERANCES`.
+
+    :param api: An EnergyPlusAPI instance, which is used to evaluate the reference values through the library
+    :param state: An active EnergyPlus "state" that is returned from a call to `api.state_manager.new_state()`.  If not
+                  provided, a new state is created for the comparison and deleted afterwards.
+    :param samples: Number of samples along each axis of the grid of conditions
+    :param raise_on_failure: If True, an EnergyPlusException is raised listing every function outside of tolerance
+    :return: A dictionary mapping each function name to a tuple of the maximum absolute difference and its tolerance
+    """
+    owns_state = state is None
+    if owns_state:
+        state = api.state_manager.new_state()
+    try:
+        reference = api.functional.psychrometrics(state)
+        engine = NumPyPsychrometrics()
+        tdb, rh, pb = [g.ravel() for g in np.meshgrid(
+            np.linspace(-20.0, 50.0, samples), np.linspace(0.05, 1.0, samples), np.linspace(80000.0, 105000.0, samples)
+        )]
+        w = engine.humidity_ratio_c(tdb, rh, pb)
+        h = engine.enthalpy(tdb, w)
+        twb = engine.wet_bulb(tdb, w, pb)
+        tdp = engine.dew_point(w, pb)
+        rho_v = engine.vapor_density(tdb, w, pb)
+        cases = {
+            'density': (pb, tdb, w),
+            'latent_energy_of_air': (tdb,),
+            'latent_energy_of_moisture_in_air': (tdb,),
+            'enthalpy': (tdb, w),
+            'enthalpy_b': (tdb, rh, pb),
+            'specific_heat': (w,),
+            'dry_bulb': (h, w),
+            'vapor_density': (tdb, w, pb),
+            'relative_humidity': (tdb, rho_v),
+            'relative_humidity_b': (tdb, w, pb),
+            'wet_bulb': (tdb, w, pb),
+            'specific_volume': (tdb, w, pb),
+            'saturation_pressure': (tdb,),
+            'saturation_temperature': (h, pb),
+            'vapor_density_b': (tdb, rh),
+            'humidity_ratio': (tdb, h),
+            'humidity_ratio_b': (tdp, pb),
+            'humidity_ratio_c': (tdb, rh, pb),
+            'humidity_ratio_d': (tdb, twb, pb),
+            'dew_point': (w, pb),
+            'dew_point_b': (tdb, twb, pb),
+        }
+        report = {}
+        for name, arguments in cases.items():
+            reference_function = getattr(reference, name)
+            expected = np.array([reference_function(state, *(float(a[i]) for a in arguments)) for i in range(tdb.size)])
+            actual = np.asarray(getattr(engine, name)(*arguments))
+            report[name] = (float(np.max(np.abs(actual - expected))), VALIDATION_TOLERANCES[name])
+    finally:
+        if owns_state:
+            api.state_manager.delete_state(state)
+    failures = {name: errors for name, errors in report.items() if errors[0] > errors[1]}
+    if raise_on_failure and failures:
+        raise EnergyPlusException(
+            "NumPy psychrometrics differ from EnergyPlus beyond tolerance: {}".format(
+                ", ".join("{} (max error {:.3g}, tolerance {:.3g})".format(n, e[0], e[1]) for n, e in failures.items())
+            ))
+    return report
@@ -0,0 +1,430 @@
+# EnergyPlus, Copyright (c) 1996-2024, The Board of Trustees of the University
+# of Illinois, The Regents of the University of California, through Lawrence
+# Berkeley National Laboratory (subject to receipt of any required approvals
+# from the U.S. Dept. of Energy), Oak Ridge National Laboratory, managed by UT-
+# Battelle, Alliance for Sustainable Energy, LLC, and other contributors. All
+# rights reserved.
+#
+# NOTICE: This Software was developed under funding from the U.S. Department of
+# Energy and the U.S. Government consequently retains certain rights. As such,
+# the U.S. Government has been granted for itself and others acting on its
+# behalf a paid-up, nonexclusive, irrevocable, worldwide license in the
+# Software to reproduce, distribute copies to the public, prepare derivative
+# works, and perform publicly and display publicly, and to permit others to do
+# so.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+#
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+# (3) Neither the name of the University of California, Lawrence Berkeley
+#     National Laboratory, the University of Illinois, U.S. Dept. of Energy nor
+#     the names of its contributors may be used to endorse or promote products
+#     derived from this software without specific prior written permission.
+#
+# (4) Use of EnergyPlus(TM) Name. If Licensee (i) distributes the software in
+#     stand-alone form without changes from the version obtained under this
+#     License, or (ii) Licensee makes a reference solely to the software
+#     portion of its product, Licensee must refer to the software as
+#     "EnergyPlus version X" software, where "X" is the version number Licensee
+#     obtained under this License and may not use a different name for the
+#     software. Except as specifically required in this Section (4), Licensee
+#     shall not use in a company name, a product name, in advertising,
+#     publicity, or other promotional activities any name, trade name,
+#     trademark, logo, or other designation of "EnergyPlus", "E+", "e+" or
+#     confusingly similar designation, without the U.S. Department of Energy's
+#     prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import atexit
+import pickle
+from ctypes import c_void_p
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from pyenergyplus.common import EnergyPlusException
+from pyenergyplus.datatransfer import ActuatorBuffer, DataExchange, InternalVariableCache
+
+#: DataExchange methods that write to EnergyPlus, with the number of trailing arguments that are the written value
+WRITE_METHODS = {
+    'set_actuator_value': 1,
+    'reset_actuator': 0,
+    'set_ems_global_value': 1,
+    'set_ems_global_values': 1,
+    'set_global_value': 1,
+    'set_global_values': 1,
+}
+
+#: DataExchange methods that set up a run or only affect this Python process, passed through when recording and
+#: ignored when replaying
+PASSTHROUGH_METHODS = {'request_variable', 'reset_api_error_flag', 'enable_value_cache', 'disable_value_cache'}
+
+
+def _freeze(value):
+    if isinstance(value, np.ndarray):
+        return tuple(value.ravel().tolist())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _call_key(name: str, args: tuple, kwargs: dict) -> tuple:
+    # the state (first argument) differs between runs, and `out` only says where to put the result
+    return (name,) + _freeze(args[1:]) + tuple((k, _freeze(v)) for k, v in sorted(kwargs.items())
+                                               if k not in ('state', 'out'))
+
+
+def _write_target(name: str, args: tuple) -> Tuple[tuple, object]:
+    values = WRITE_METHODS[name]
+    target = args[1:len(args) - values] if values else args[1:]
+    return (name,) + _freeze(target), _freeze(args[-1]) if values else None
+
+
+def _new_frame(label: Optional[str]) -> dict:
+    return {'label': label, 'reads': {}, 'writes': {}}
+
+
+class Recording:
+    """
+    The sensor stream a controller saw through a DataExchange, and the actuator values it wrote, split into frames.
+
+    A frame is one callback or plugin hook call, labelled by the caller (plugin hooks are labelled
+    'ClassName.on_calling_point').  Frame 0 holds whatever was read before the first callback.  For each frame the
+    recording keeps the results of every read, keyed by method name and arguments (without the state), in call order,
+    and the last value written to every write target, such as ('set_actuator_value', handle).
+    """
+
+    def __init__(self):
+        """
+        Creates an empty recording.
+        """
+        self.frames: List[dict] = [_new_frame(None)]
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    @property
+    def labels(self) -> List[Optional[str]]:
+        """
+        The label of every frame, in order.
+        """
+        return [frame['label'] for frame in self.frames]
+
+    def save(self, path: str) -> None:
+        """
+        Writes the recording to a file.
+
+        :param path: The file to write
+        :return: Nothing
+        """
+        with open(path, 'wb') as f:
+            pickle.dump({'version': 1, 'frames': self.frames}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path: str) -> 'Recording':
+        """
+        Reads a recording written by `save`.
+
+        :param path: The file to read
+        :return: The recording
+        """
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        recording = Recording()
+        recording.frames = data['frames']
+        return recording
+
+
+class _ActuatorWrites:
+    """
+    Stands in for the library as `exchange.api` of a recording or replay exchange, so that actuator writes flushed by
+    an ActuatorBuffer go through the exchange and are seen.
+    """
+
+    def __init__(self, exchange):
+        self.exchange = exchange
+
+    def setActuatorValue(self, state: c_void_p, actuator_handle: int, value: float) -> None:
+        self.exchange.set_actuator_value(state, actuator_handle, value)
+
+
+class RecordingDataExchange:
+    """
+    Wraps a DataExchange, recording every read and write made through it into a Recording.
+
+    It is used in place of the DataExchange: `api.exchange = RecordingDataExchange(api.exchange)` for an API workflow
+    (with each callback wrapped by `wrap`), or `record_plugins` in a Python Plugin workflow.  Every DataExchange method
+    is available and calls through to the wrapped instance.  The `internal_variables` and `actuator_buffer` helpers
+    are rebuilt on top of the recorder, so that what they read and write is recorded too.
+    """
+
+    def __init__(self, exchange: DataExchange, recording: Optional[Recording] = None):
+        """
+        Creates a recorder.
+
+        :param exchange: The DataExchange instance to call through to
+        :param recording: The recording to append to, by default a new one
+        """
+        self.exchange = exchange
+        self.recording = recording if recording is not None else Recording()
+        self.frame = self.recording.frames[-1]
+        self.api = _ActuatorWrites(self)
+        self.internal_variables = InternalVariableCache(self)
+        self.actuator_buffer = ActuatorBuffer(self)
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        member = getattr(self.exchange, name)
+        if not callable(member) or name in PASSTHROUGH_METHODS or not hasattr(DataExchange, name):
+            return member
+        if name in WRITE_METHODS:
+            def write(*args, **kwargs):
+                target, value = _write_target(name, args)
+                self.frame['writes'][target] = value
+                return member(*args, **kwargs)
+            return write
+
+        def read(*args, **kwargs):
+            result = member(*args, **kwargs)
+            self.frame['reads'].setdefault(_call_key(name, args, kwargs), []).append(
+                result.copy() if isinstance(result, np.ndarray) else result)
+            return result
+        return read
+
+    def begin_frame(self, label: Optional[str]) -> None:
+        """
+        Starts a new frame.  Plugin hooks call this automatically; API callbacks are wrapped with `wrap`.
+
+        :param label: A name for the callback, the same one must be used when replaying
+        :return: Nothing
+        """
+        self.frame = _new_frame(label)
+        self.recording.frames.append(self.frame)
+
+    def wrap(self, label: str, function: Callable[[c_void_p], None]) -> Callable[[c_void_p], None]:
+        """
+        Wraps an API callback so that each call starts a new frame.
+
+        :param label: The frame label, which `ReplayDataExchange.run` maps back to a callback
+        :param function: The callback function to register with the runtime
+        :return: The wrapped callback
+        """
+        def callback(state):
+            self.begin_frame(label)
+            return function(state)
+        return callback
+
+
+class ReplayDataExchange:
+    """
+    Feeds a Recording back through the DataExchange interface, without EnergyPlus.
+
+    Reads return the recorded results of the same call (method and arguments) in the same frame, in the order they were
+    recorded; asking for anything that was not recorded raises an EnergyPlusException, as the controller's inputs have
+    then diverged from the recorded run.  Writes are not sent anywhere but kept per frame in `writes`, and `diff`
+    compares them with those of the recorded (golden) run or any other recording.  Replay runs at memory speed, so a
+    controller regression check over a whole simulated year takes a fraction of a second.
+    """
+
+    def __init__(self, recording: Recording):
+        """
+        Creates a replay backend.
+
+        :param recording: The recording to replay
+        """
+        self.recording = recording
+        self.position = 0
+        self.writes: List[Dict[tuple, object]] = [{}]
+        self.read_counts: Dict[tuple, int] = {}
+        self.value_cache = None
+        self.api = _ActuatorWrites(self)
+        self.internal_variables = InternalVariableCache(self)
+        self.actuator_buffer = ActuatorBuffer(self)
+
+    def __getattr__(self, name: str):
+        if name.startswith('_') or not callable(getattr(DataExchange, name, None)):
+            raise AttributeError(name)
+        if name in PASSTHROUGH_METHODS:
+            return lambda *args, **kwargs: None
+        if name in WRITE_METHODS:
+            def write(*args, **kwargs):
+                target, value = _write_target(name, args)
+                self.writes[self.position][target] = value
+            return write
+
+        def read(*args, **kwargs):
+            key = _call_key(name, args, kwargs)
+            results = self.recording.frames[self.position]['reads'].get(key)
+            if results is None:
+                raise EnergyPlusException('No recorded result for {}{} in frame {} ({})'.format(
+                    name, key[1:], self.position, self.recording.frames[self.position]['label']))
+            count = self.read_counts.get(key, 0)
+            self.read_counts[key] = count + 1
+            result = results[min(count, len(results) - 1)]
+            out = kwargs.get('out')
+            if out is not None:
+                out[...] = result
+                return out
+            return result.copy() if isinstance(result, np.ndarray) else result
+        return read
+
+    @property
+    def done(self) -> bool:
+        """
+        True once every recorded frame has been replayed.
+        """
+        return self.position == len(self.recording.frames) - 1
+
+    @property
+    def next_label(self) -> Optional[str]:
+        """
+        The label of the next frame to replay, or None at the end of the recording.
+        """
+        return None if self.done else self.recording.frames[self.position + 1]['label']
+
+    def begin_frame(self, label: Optional[str]) -> None:
+        """
+        Moves on to the next recorded frame, which must have the same label.
+
+        :param label: The frame label, as given when recording
+        :return: Nothing
+        """
+        if self.done:
+            raise EnergyPlusException('Replay has no frame left for {}'.format(label))
+        if self.next_label != label:
+            raise EnergyPlusException('Replay expected frame {} to be {}, not {}'.format(
+                self.position + 1, self.next_label, label))
+        self.position += 1
+        self.writes.append({})
+        self.read_counts = {}
+
+    def run(self, callbacks: Dict[str, Callable[[Optional[c_void_p]], None]]) -> None:
+        """
+        Replays every remaining frame, calling the callback registered for its label with a None state.
+
+        :param callbacks: The API callbacks, by the labels given to `RecordingDataExchange.wrap`
+        :return: Nothing
+        """
+        while not self.done:
+            label = self.next_label
+            self.begin_frame(label)
+            callbacks[label](None)
+
+    def diff(self, golden: Optional[Recording] = None, rtol: float = 1e-9, atol: float = 0.0) -> List[dict]:
+        """
+        Compares the values written during the replay with those written in a golden run, frame by frame.  For each
+        write target only the last value written in a frame counts, as that is the one EnergyPlus uses.
+
+        :param golden: The recording to compare with, by default the one being replayed
+        :param rtol: Relative tolerance of numeric values
+        :param atol: Absolute tolerance of numeric values
+        :return: One dictionary per difference, with the frame number and label, the write target, and the expected
+                 and actual values (None where a write is missing)
+        """
+        golden = golden if golden is not None else self.recording
+        differences = []
+        missing = object()
+        for position, frame in enumerate(golden.frames):
+            actual = self.writes[position] if position < len(self.writes) else {}
+            for target in list(frame['writes']) + [t for t in actual if t not in frame['writes']]:
+                expected = frame['writes'].get(target, missing)
+                value = actual.get(target, missing)
+                if expected is not missing and value is not missing:
+                    a = np.asarray(expected, dtype=float) if expected is not None else None
+                    b = np.asarray(value, dtype=float) if value is not None else None
+                    if a is None and b is None:
+                        continue
+                    if a is not None and b is not None and a.shape == b.shape and \
+                            np.allclose(b, a, rtol=rtol, atol=atol, equal_nan=True):
+                        continue
+                differences.append({
+                    'frame': position, 'label': frame['label'], 'target': target,
+                    'expected': None if expected is missing else expected,
+                    'actual': None if value is missing else value,
+                })
+        return differences
+
+
+class _ReplayAPI:
+    """
+    Stands in for the EnergyPlusAPI shared by plugins during a replay; only the data exchange is available.
+    """
+
+    def __init__(self, exchange: ReplayDataExchange):
+        self.exchange = exchange
+
+    def __getattr__(self, name: str):
+        raise EnergyPlusException('api.{} is not available when replaying a recording'.format(name))
+
+
+def record_plugins(path: Optional[str] = None) -> RecordingDataExchange:
+    """
+    Starts recording what every Python Plugin reads and writes through `self.api.exchange` or `self.sensor_cache`,
+    one frame per plugin hook call.  Call it from a plugin module at import time or from a plugin constructor.
+
+    :param path: If given, the recording is saved to this file when the Python interpreter exits
+    :return: The recorder, whose `recording` can also be saved explicitly
+    """
+    from pyenergyplus.plugin import EnergyPlusPlugin
+    api = EnergyPlusPlugin.shared_api()
+    recorder = api.exchange if isinstance(api.exchange, RecordingDataExchange) else RecordingDataExchange(api.exchange)
+    api.exchange = recorder
+    EnergyPlusPlugin.shared_sensor_cache().exchange = recorder
+    if path is not None:
+        atexit.register(recorder.recording.save, path)
+    return recorder
+
+
+def replay_plugins(recording: Recording, plugins: Sequence[Callable[[], object]]) -> ReplayDataExchange:
+    """
+    Replays a recording made with `record_plugins` through newly created plugin instances, without EnergyPlus.
+    Every hook call is replayed in the recorded order, with a None state.
+
+    :param recording: The recording to replay
+    :param plugins: The plugin classes (or factories) to instantiate, one instance per class name in the recording
+    :return: The replay exchange, whose `diff` compares the actuator values written with those recorded
+    """
+    from pyenergyplus.plugin import EnergyPlusPlugin, SensorCache
+    exchange = ReplayDataExchange(recording)
+    saved = (EnergyPlusPlugin._shared_api, EnergyPlusPlugin._shared_sensor_cache, EnergyPlusPlugin._shared_data_store)
+    EnergyPlusPlugin._shared_api = _ReplayAPI(exchange)
+    EnergyPlusPlugin._shared_sensor_cache = SensorCache(exchange)
+    EnergyPlusPlugin._shared_data_store = None
+    try:
+        instances = {}
+        for factory in plugins:
+            plugin = factory()
+            name = type(plugin).__name__
+            if name in instances:
+                raise EnergyPlusException('Cannot replay two plugins of class {}'.format(name))
+            instances[name] = plugin
+        while not exchange.done:
+            name, _, hook = exchange.next_label.rpartition('.')
+            if name not in instances:
+                raise EnergyPlusException('The recording calls {}, which is not among the plugins'.format(name))
+            # the hook starts its own frame
+            getattr(instances[name], hook)(None)
+    finally:
+        EnergyPlusPlugin._shared_api, EnergyPlusPlugin._shared_sensor_cache, EnergyPlusPlugin._shared_data_store = saved
+    return exchange
@@ -59,6 +59,12 @@ from typing import Union, List
 from types import FunctionType
 import os
 
+from pyenergyplus.common import Prototype
+
+
+py_progress_callback_type = CFUNCTYPE(c_void_p, c_int)
+py_message_callback_type = CFUNCTYPE(c_void_p, c_char_p)
+py_state_callback_type = CFUNCTYPE(c_void_p, c_void_p)
 
 # CFUNCTYPE wrapped Python callbacks need to be kept in memory explicitly, otherwise GC takes it
 # This causes undefined behavior but generally segfaults and illegal access violations
@@ -84,72 +90,33 @@ class Runtime:
         :param api: An active CTYPES CDLL instance.
         """
         self.api = api
-        # self.api.energyplus.argtypes = [c_int, POINTER(c_char_p)]  # DEFERRED UNTIL run_energyplus call
-        self.api.energyplus.restype = c_int
-        self.api.issueWarning.argtypes = [c_void_p, c_char_p]
-        self.api.issueWarning.restype = c_void_p
-        self.api.issueSevere.argtypes = [c_void_p, c_char_p]
-        self.api.issueSevere.restype = c_void_p
-        self.api.issueText.argtypes = [c_void_p, c_char_p]
-        self.api.issueText.restype = c_void_p
-        self.api.stopSimulation.argtypes = [c_void_p]
-        self.api.stopSimulation.restype = c_void_p
-        self.api.setConsoleOutputState.argtypes = [c_void_p, c_int]
-        self.api.setConsoleOutputState.restype = c_void_p
-        self.api.setEnergyPlusRootDirectory.argtypes = [c_void_p, c_char_p]
-        self.api.setEnergyPlusRootDirectory.restype = c_void_p
-        self.py_progress_callback_type = CFUNCTYPE(c_void_p, c_int)
-        self.api.registerProgressCallback.argtypes = [c_void_p, self.py_progress_callback_type]
-        self.api.registerProgressCallback.restype = c_void_p
-        self.py_message_callback_type = CFUNCTYPE(c_void_p, c_char_p)
-        self.api.registerStdOutCallback.argtypes = [c_void_p, self.py_message_callback_type]
-        self.api.registerStdOutCallback.restype = c_void_p
-        self.py_state_callback_type = CFUNCTYPE(c_void_p, c_void_p)
-        self.api.callbackBeginNewEnvironment.argtypes = [c_void_p, self.py_state_callback_type]
-        self.api.callbackBeginNewEnvironment.restype = c_void_p
-        self.api.callbackAfterNewEnvironmentWarmupComplete.argtypes = [c_void_p, self.py_state_callback_type]
-        self.api.callbackAfterNewEnvironmentWarmupComplete.restype = c_void_p
-        self.api.callbackBeginZoneTimeStepBeforeInitHeatBalance.argtypes = [c_void_p, self.py_state_callback_type]
-        self.api.callbackBeginZoneTimeStepBeforeInitHeatBalance.restype = c_void_p
-        self.api.callbackBeginZoneTimeStepAfterInitHeatBalance.argtypes = [c_void_p, self.py_state_callback_type]
-        self.api.callbackBeginZoneTimeStepAfterInitHeatBalance.restype = c_void_p
-        self.api.callbackBeginTimeStepBeforePredictor.argtypes = [c_void_p, self.py_state_callback_type]
-        self.api.callbackBeginTimeStepBeforePredictor.restype = c_void_p
-        self.api.callbackBeginZoneTimestepBeforeSetCurrentWeather.argtypes = [c_void_p, self.py_state_callback_type]
-        self.api.callbackBeginZoneTimestepBeforeSetCurrentWeather.restype = c_void_p
-        self.api.callbackAfterPredictorBeforeHVACManagers.argtypes = [c_void_p, self.py_state_callback_type]
-        self.api.callbackAfterPredictorBeforeHVACManagers.restype = c_void_p
-        self.api.callbackAfterPredictorAfterHVACManagers.argtypes = [c_void_p, self.py_state_callback_type]
-        self.api.callbackAfterPredictorAfterHVACManagers.restype = c_void_p
-        self.api.callbackInsideSystemIterationLoop.argtypes = [c_void_p, self.py_state_callback_type]
-        self.api.callbackInsideSystemIterationLoop.restype = c_void_p
-        self.api.callbackEndOfZoneTimeStepBeforeZoneReporting.argtypes = [c_void_p, self.py_state_callback_type]
-        self.api.callbackEndOfZoneTimeStepBeforeZoneReporting.restype = c_void_p
-        self.api.callbackEndOfZoneTimeStepAfterZoneReporting.argtypes = [c_void_p, self.py_state_callback_type]
-        self.api.callbackEndOfZoneTimeStepAfterZoneReporting.restype = c_void_p
-        self.api.callbackEndOfSystemTimeStepBeforeHVACReporting.argtypes = [c_void_p, self.py_state_callback_type]
-        self.api.callbackEndOfSystemTimeStepBeforeHVACReporting.restype = c_void_p
-        self.api.callbackEndOfSystemTimeStepAfterHVACReporting.argtypes = [c_void_p, self.py_state_callback_type]
-        self.api.callbackEndOfSystemTimeStepAfterHVACReporting.restype = c_void_p
-        self.api.callbackEndOfZoneSizing.argtypes = [c_void_p, self.py_state_callback_type]
-        self.api.callbackEndOfZoneSizing.restype = c_void_p
-        self.api.callbackEndOfSystemSizing.argtypes = [c_void_p, self.py_state_callback_type]
-        self.api.callbackEndOfSystemSizing.restype = c_void_p
-        self.api.callbackEndOfAfterComponentGetInput.argtypes = [c_void_p, self.py_state_callback_type]
-        self.api.callbackEndOfAfterComponentGetInput.restype = c_void_p
-        self.api.callbackUserDefinedComponentModel.argtypes = [c_void_p, self.py_state_callback_type, c_char_p]
-        self.api.callbackUserDefinedComponentModel.restype = c_void_p
-        self.api.callbackUnitarySystemSizing.argtypes = [c_void_p, self.py_state_callback_type]
-        self.api.callbackUnitarySystemSizing.restype = c_void_p
-        self.api.registerExternalHVACManager.argtypes = [c_void_p, self.py_state_callback_type]
-        self.api.registerExternalHVACManager.restype = c_void_p
+        # the sensor value cache driven by the callbacks, attached by EnergyPlusAPI.enable_value_cache
+        self.value_cache = None
+        self.py_progress_callback_type = py_progress_callback_type
+        self.py_message_callback_type = py_message_callback_type
+        self.py_state_callback_type = py_state_callback_type
+
+    def _with_value_cache(self, f: FunctionType, calling_point: str) -> FunctionType:
+        # when a sensor value cache is attached, each callback reports its calling point so the cache can tell rounds
+        cache = self.value_cache
+        if cache is None:
+            return f
+
+        def callback(state):
+            cache.begin_callback(f, calling_point)
+            try:
+                return f(state)
+            finally:
+                cache.end_callback()
+        return callback
 
     @staticmethod
     def _check_callback_args(function_to_check: FunctionType, expected_num_args: int, calling_point_name: str):
         sig = signature(function_to_check)
         num_args = len(sig.parameters)
         if num_args != expected_num_args:
-            raise TypeError(f"Registering function with incorrect arguments, calling point = {calling_point_name} needs {expected_num_args} arguments")
+            raise TypeError(f"Registering function with incorrect arguments, calling point = {calling_point_name} "
+                            f"needs {expected_num_args} arguments")
 
     def _set_energyplus_root_directory(self, state, path: str):
         """
@@ -337,7 +304,7 @@ class Runtime:
         :return: Nothing
         """
         self._check_callback_args(f, 1, 'callback_begin_new_environment')
-        cb_ptr = self.py_state_callback_type(f)
+        cb_ptr = self.py_state_callback_type(self._with_value_cache(f, 'callback_begin_new_environment'))
         all_callbacks.append(cb_ptr)
         self.api.callbackBeginNewEnvironment(state, cb_ptr)
 
@@ -351,7 +318,8 @@ class Runtime:
         :return: Nothing
         """
         self._check_callback_args(f, 1, 'callback_after_new_environment_warmup_complete')
-        cb_ptr = self.py_state_callback_type(f)
+        cb_ptr = self.py_state_callback_type(
+            self._with_value_cache(f, 'callback_after_new_environment_warmup_complete'))
         all_callbacks.append(cb_ptr)
         self.api.callbackAfterNewEnvironmentWarmupComplete(state, cb_ptr)
 
@@ -365,7 +333,8 @@ class Runtime:
         :return: Nothing
         """
         self._check_callback_args(f, 1, 'callback_begin_zone_timestep_before_init_heat_balance')
-        cb_ptr = self.py_state_callback_type(f)
+        cb_ptr = self.py_state_callback_type(
+            self._with_value_cache(f, 'callback_begin_zone_timestep_before_init_heat_balance'))
         all_callbacks.append(cb_ptr)
         self.api.callbackBeginZoneTimeStepBeforeInitHeatBalance(state, cb_ptr)
 
@@ -379,7 +348,8 @@ class Runtime:
         :return: Nothing
         """
         self._check_callback_args(f, 1, 'callback_begin_zone_timestep_after_init_heat_balance')
-        cb_ptr = self.py_state_callback_type(f)
+        cb_ptr = self.py_state_callback_type(
+            self._with_value_cache(f, 'callback_begin_zone_timestep_after_init_heat_balance'))
         all_callbacks.append(cb_ptr)
         self.api.callbackBeginZoneTimeStepAfterInitHeatBalance(state, cb_ptr)
 
@@ -393,7 +363,8 @@ class Runtime:
         :return: Nothing
         """
         self._check_callback_args(f, 1, 'callback_begin_system_timestep_before_predictor')
-        cb_ptr = self.py_state_callback_type(f)
+        cb_ptr = self.py_state_callback_type(
+            self._with_value_cache(f, 'callback_begin_system_timestep_before_predictor'))
         all_callbacks.append(cb_ptr)
         self.api.callbackBeginTimeStepBeforePredictor(state, cb_ptr)
 
@@ -407,7 +378,8 @@ class Runtime:
         :return: Nothing
         """
         self._check_callback_args(f, 1, 'callback_begin_zone_timestep_before_set_current_weather')
-        cb_ptr = self.py_state_callback_type(f)
+        cb_ptr = self.py_state_callback_type(
+            self._with_value_cache(f, 'callback_begin_zone_timestep_before_set_current_weather'))
         all_callbacks.append(cb_ptr)
         self.api.callbackBeginZoneTimestepBeforeSetCurrentWeather(state, cb_ptr)
 
@@ -421,7 +393,7 @@ class Runtime:
         :return: Nothing
         """
         self._check_callback_args(f, 1, 'callback_after_predictor_before_hvac_managers')
-        cb_ptr = self.py_state_callback_type(f)
+        cb_ptr = self.py_state_callback_type(self._with_value_cache(f, 'callback_after_predictor_before_hvac_managers'))
         all_callbacks.append(cb_ptr)
         self.api.callbackAfterPredictorBeforeHVACManagers(state, cb_ptr)
 
@@ -435,7 +407,7 @@ class Runtime:
         :return: Nothing
         """
         self._check_callback_args(f, 1, 'callback_after_predictor_after_hvac_managers')
-        cb_ptr = self.py_state_callback_type(f)
+        cb_ptr = self.py_state_callback_type(self._with_value_cache(f, 'callback_after_predictor_after_hvac_managers'))
         all_callbacks.append(cb_ptr)
         self.api.callbackAfterPredictorAfterHVACManagers(state, cb_ptr)
 
@@ -449,7 +421,7 @@ class Runtime:
         :return: Nothing
         """
         self._check_callback_args(f, 1, 'callback_inside_system_iteration_loop')
-        cb_ptr = self.py_state_callback_type(f)
+        cb_ptr = self.py_state_callback_type(self._with_value_cache(f, 'callback_inside_system_iteration_loop'))
         all_callbacks.append(cb_ptr)
         self.api.callbackInsideSystemIterationLoop(state, cb_ptr)
 
@@ -463,7 +435,8 @@ class Runtime:
         :return: Nothing
         """
         self._check_callback_args(f, 1, 'callback_end_zone_timestep_before_zone_reporting')
-        cb_ptr = self.py_state_callback_type(f)
+        cb_ptr = self.py_state_callback_type(
+            self._with_value_cache(f, 'callback_end_zone_timestep_before_zone_reporting'))
         all_callbacks.append(cb_ptr)
         self.api.callbackEndOfZoneTimeStepBeforeZoneReporting(state, cb_ptr)
 
@@ -477,7 +450,8 @@ class Runtime:
         :return: Nothing
         """
         self._check_callback_args(f, 1, 'callback_end_zone_timestep_after_zone_reporting')
-        cb_ptr = self.py_state_callback_type(f)
+        cb_ptr = self.py_state_callback_type(
+            self._with_value_cache(f, 'callback_end_zone_timestep_after_zone_reporting'))
         all_callbacks.append(cb_ptr)
         self.api.callbackEndOfZoneTimeStepAfterZoneReporting(state, cb_ptr)
 
@@ -491,7 +465,8 @@ class Runtime:
         :return: Nothing
         """
         self._check_callback_args(f, 1, 'callback_end_system_timestep_before_hvac_reporting')
-        cb_ptr = self.py_state_callback_type(f)
+        cb_ptr = self.py_state_callback_type(
+            self._with_value_cache(f, 'callback_end_system_timestep_before_hvac_reporting'))
         all_callbacks.append(cb_ptr)
         self.api.callbackEndOfSystemTimeStepBeforeHVACReporting(state, cb_ptr)
 
@@ -505,7 +480,8 @@ class Runtime:
         :return: Nothing
         """
         self._check_callback_args(f, 1, 'callback_end_system_timestep_after_hvac_reporting')
-        cb_ptr = self.py_state_callback_type(f)
+        cb_ptr = self.py_state_callback_type(
+            self._with_value_cache(f, 'callback_end_system_timestep_after_hvac_reporting'))
         all_callbacks.append(cb_ptr)
         self.api.callbackEndOfSystemTimeStepAfterHVACReporting(state, cb_ptr)
 
@@ -519,7 +495,7 @@ class Runtime:
         :return: Nothing
         """
         self._check_callback_args(f, 1, 'callback_end_zone_sizing')
-        cb_ptr = self.py_state_callback_type(f)
+        cb_ptr = self.py_state_callback_type(self._with_value_cache(f, 'callback_end_zone_sizing'))
         all_callbacks.append(cb_ptr)
         self.api.callbackEndOfZoneSizing(state, cb_ptr)
 
@@ -533,7 +509,7 @@ class Runtime:
         :return: Nothing
         """
         self._check_callback_args(f, 1, 'callback_end_system_sizing')
-        cb_ptr = self.py_state_callback_type(f)
+        cb_ptr = self.py_state_callback_type(self._with_value_cache(f, 'callback_end_system_sizing'))
         all_callbacks.append(cb_ptr)
         self.api.callbackEndOfSystemSizing(state, cb_ptr)
 
@@ -547,7 +523,7 @@ class Runtime:
         :return: Nothing
         """
         self._check_callback_args(f, 1, 'callback_after_component_get_input')
-        cb_ptr = self.py_state_callback_type(f)
+        cb_ptr = self.py_state_callback_type(self._with_value_cache(f, 'callback_after_component_get_input'))
         all_callbacks.append(cb_ptr)
         self.api.callbackEndOfAfterComponentGetInput(state, cb_ptr)
 
@@ -564,7 +540,7 @@ class Runtime:
         :return: Nothing
         """
         self._check_callback_args(f, 1, 'callback_user_defined_component_model')
-        cb_ptr = self.py_state_callback_type(f)
+        cb_ptr = self.py_state_callback_type(self._with_value_cache(f, 'callback_user_defined_component_model'))
         all_callbacks.append(cb_ptr)
         if isinstance(program_name, str):
             program_name = program_name.encode('utf-8')
@@ -579,7 +555,7 @@ class Runtime:
         :return: Nothing
         """
         self._check_callback_args(f, 1, 'callback_unitary_system_sizing')
-        cb_ptr = self.py_state_callback_type(f)
+        cb_ptr = self.py_state_callback_type(self._with_value_cache(f, 'callback_unitary_system_sizing'))
         all_callbacks.append(cb_ptr)
         self.api.callbackUnitarySystemSizing(state, cb_ptr)
 
@@ -595,7 +571,7 @@ class Runtime:
         :return: Nothing
         """
         self._check_callback_args(f, 1, 'callback_register_external_hvac_manager')
-        cb_ptr = self.py_state_callback_type(f)
+        cb_ptr = self.py_state_callback_type(self._with_value_cache(f, 'callback_register_external_hvac_manager'))
         all_callbacks.append(cb_ptr)
         self.api.registerExternalHVACManager(state, cb_ptr)
 
@@ -610,3 +586,39 @@ class Runtime:
         :return: Nothing
         """
         all_callbacks.clear()
+
+
+class RuntimePrototypes:
+    """
+    Declares the ctypes prototypes of the functions used by Runtime.
+    """
+
+    # the argtypes of energyplus depend on the number of command line arguments, so they are set in run_energyplus
+    energyplus = Prototype(None, c_int)
+    issueWarning = Prototype([c_void_p, c_char_p], c_void_p)
+    issueSevere = Prototype([c_void_p, c_char_p], c_void_p)
+    issueText = Prototype([c_void_p, c_char_p], c_void_p)
+    stopSimulation = Prototype([c_void_p], c_void_p)
+    setConsoleOutputState = Prototype([c_void_p, c_int], c_void_p)
+    setEnergyPlusRootDirectory = Prototype([c_void_p, c_char_p], c_void_p)
+    registerProgressCallback = Prototype([c_void_p, py_progress_callback_type], c_void_p)
+    registerStdOutCallback = Prototype([c_void_p, py_message_callback_type], c_void_p)
+    callbackBeginNewEnvironment = Prototype([c_void_p, py_state_callback_type], c_void_p)
+    callbackAfterNewEnvironmentWarmupComplete = Prototype([c_void_p, py_state_callback_type], c_void_p)
+    callbackBeginZoneTimeStepBeforeInitHeatBalance = Prototype([c_void_p, py_state_callback_type], c_void_p)
+    callbackBeginZoneTimeStepAfterInitHeatBalance = Prototype([c_void_p, py_state_callback_type], c_void_p)
+    callbackBeginTimeStepBeforePredictor = Prototype([c_void_p, py_state_callback_type], c_void_p)
+    callbackBeginZoneTimestepBeforeSetCurrentWeather = Prototype([c_void_p, py_state_callback_type], c_void_p)
+    callbackAfterPredictorBeforeHVACManagers = Prototype([c_void_p, py_state_callback_type], c_void_p)
+    callbackAfterPredictorAfterHVACManagers = Prototype([c_void_p, py_state_callback_type], c_void_p)
+    callbackInsideSystemIterationLoop = Prototype([c_void_p, py_state_callback_type], c_void_p)
+    callbackEndOfZoneTimeStepBeforeZoneReporting = Prototype([c_void_p, py_state_callback_type], c_void_p)
+    callbackEndOfZoneTimeStepAfterZoneReporting = Prototype([c_void_p, py_state_callback_type], c_void_p)
+    callbackEndOfSystemTimeStepBeforeHVACReporting = Prototype([c_void_p, py_state_callback_type], c_void_p)
+    callbackEndOfSystemTimeStepAfterHVACReporting = Prototype([c_void_p, py_state_callback_type], c_void_p)
+    callbackEndOfZoneSizing = Prototype([c_void_p, py_state_callback_type], c_void_p)
+    callbackEndOfSystemSizing = Prototype([c_void_p, py_state_callback_type], c_void_p)
+    callbackEndOfAfterComponentGetInput = Prototype([c_void_p, py_state_callback_type], c_void_p)
+    callbackUserDefinedComponentModel = Prototype([c_void_p, py_state_callback_type, c_char_p], c_void_p)
+    callbackUnitarySystemSizing = Prototype([c_void_p, py_state_callback_type], c_void_p)
+    registerExternalHVACManager = Prototype([c_void_p, py_state_callback_type], c_void_p)
@@ -54,6 +54,9 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 from ctypes import cdll, c_void_p
+from typing import Callable, List
+
+from pyenergyplus.common import Prototype
 
 
 class StateManager:
@@ -72,12 +75,17 @@ class StateManager:
 
     def __init__(self, api: cdll):
         self.api = api
-        self.api.stateNewPython.argtypes = []
-        self.api.stateNewPython.restype = c_void_p
-        self.api.stateReset.argtypes = [c_void_p]
-        self.api.stateReset.restype = c_void_p
-        self.api.stateDelete.argtypes = [c_void_p]
-        self.api.stateDelete.restype = c_void_p
+        self.reset_listeners: List[Callable[[c_void_p], None]] = []
+
+    def add_reset_listener(self, listener: Callable[[c_void_p], None]) -> None:
+        """
+        This function registers a function to be called with the state whenever a state is reset or deleted, so that
+        anything cached for that state can be discarded.
+
+        :param listener: A python function which takes one argument, the state being reset or deleted
+        :return: Nothing
+        """
+        self.reset_listeners.append(listener)
 
     def new_state(self) -> c_void_p:
         """
@@ -95,6 +103,8 @@ class StateManager:
         :return: Nothing
         """
         self.api.stateReset(state)
+        for listener in self.reset_listeners:
+            listener(state)
 
     def delete_state(self, state: c_void_p) -> None:
         """
@@ -102,4 +112,16 @@ class StateManager:
 
         :return: Nothing
         """
+        for listener in self.reset_listeners:
+            listener(state)
         self.api.stateDelete(state)
+
+
+class StateManagerPrototypes:
+    """
+    Declares the ctypes prototypes of the functions used by StateManager.
+    """
+
+    stateNewPython = Prototype([], c_void_p)
+    stateReset = Prototype([c_void_p], c_void_p)
+    stateDelete = Prototype([c_void_p], c_void_p)
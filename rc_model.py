@@ -0,0 +1,314 @@
+"""
+Grey-box resistance-capacitance (1R1C) thermal models of zones, identified from simulation data.
+
+Each zone is a thermal capacitance C [J/K] connected to the outdoor air through a resistance R [K/W], heated by solar
+radiation through an effective aperture A [m2], by the HVAC system with an effectiveness eta, and by a constant
+internal gain q [W].  Discretized with the simulation timestep dt [s]:
+
+    T[k+1] = T[k] + a (T_out[k] - T[k]) + b S[k] + c Q[k] + d
+    a = dt / (R C),  b = dt A / C,  c = dt eta / C,  d = dt q / C
+
+The forcing terms of step k (outdoor temperature T_out, solar irradiance S [W/m2], HVAC power Q [W]) are the values
+EnergyPlus reports at the end of that step, i.e. averages over it.  Q should be signed (heating positive, cooling
+negative, e.g. "Zone Air System Sensible Heating Rate" minus "Zone Air System Sensible Cooling Rate"); with an
+unsigned electricity demand the fitted c still gives the best linear fit but has no physical meaning.
+
+- `fit_rc` identifies every zone at once: the regression of all zones is solved as one batched least squares problem.
+- RCModel.simulate runs the fitted models for any number of zones and scenarios at once, a simulated year taking
+  milliseconds instead of the minutes of an EnergyPlus run.
+- `validate` reports one-step and free-run simulation errors against recorded runs.
+- `dataset_streams` extracts the streams from trajectory datasets (see trajectory.py).
+
+Usage: python rc_model.py DATASET --zones "Zone Mean Air Temperature" --outdoor "Outdoor Air Temperature"
+                          --hvac "Facility Total HVAC Electricity Demand Rate" [--solar NAME] [--holdout 1]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from trajectory import TrajectoryDataset
+
+#: Names of the coefficients, in the order of the regression columns
+COEFFICIENTS = ('a', 'b', 'c', 'd')
+
+
+def _segments(values) -> list:
+    return [np.asarray(v, dtype=np.float64) for v in values] if isinstance(values, (list, tuple)) else \
+        [np.asarray(values, dtype=np.float64)]
+
+
+def _per_zone(values: np.ndarray, zones: int) -> np.ndarray:
+    # (..., steps) streams shared by every zone are broadcast to (..., zones, steps)
+    if values.ndim >= 2 and values.shape[-2] == zones:
+        return values
+    return np.broadcast_to(values[..., None, :], values.shape[:-1] + (zones, values.shape[-1]))
+
+
+def _regression(temperatures, outdoor, solar, hvac) -> (np.ndarray, np.ndarray):
+    temperatures = _segments(temperatures)
+    outdoor = _segments(outdoor)
+    hvac = _segments(hvac)
+    solar = _segments(solar) if solar is not None else [None] * len(temperatures)
+    if not len(temperatures) == len(outdoor) == len(hvac) == len(solar):
+        raise ValueError('Every stream needs the same number of segments')
+    features, targets = [], []
+    for t, out, sol, q in zip(temperatures, outdoor, solar, hvac):
+        zones, steps = t.shape[0], t.shape[1] - 1
+        x = np.empty((zones, steps, len(COEFFICIENTS)))
+        x[..., 0] = _per_zone(out, zones)[:, :steps] - t[:, :-1]
+        x[..., 1] = 0.0 if sol is None else _per_zone(sol, zones)[:, :steps]
+        x[..., 2] = _per_zone(q, zones)[:, :steps]
+        x[..., 3] = 1.0
+        features.append(x)
+        targets.append(t[:, 1:] - t[:, :-1])
+    return np.concatenate(features, axis=1), np.concatenate(targets, axis=1)
+
+
+def _metrics(predicted: np.ndarray, actual: np.ndarray) -> dict:
+    # Per zone over the last axis; NaN rows (missing data) are ignored
+    error = predicted - actual
+    variance = np.nanvar(actual, axis=-1)
+    mse = np.nanmean(error ** 2, axis=-1)
+    return {
+        'rmse': np.sqrt(mse),
+        'mae': np.nanmean(np.abs(error), axis=-1),
+        'bias': np.nanmean(error, axis=-1),
+        'max_abs': np.nanmax(np.abs(error), axis=-1),
+        'r2': np.where(variance > 0, 1 - mse / np.where(variance > 0, variance, 1), np.nan),
+    }
+
+
+class RCModel:
+    """
+    Fitted 1R1C models of a set of zones.
+
+    :param coefficients: (zones, 4) array of the discrete-time coefficients a, b, c, d.
+    :param timestep: Simulation timestep in seconds.
+    :param zones: Optional zone names.
+    """
+
+    def __init__(self, coefficients: np.ndarray, timestep: float, zones=None):
+        self.coefficients = np.asarray(coefficients, dtype=np.float64).reshape(-1, len(COEFFICIENTS))
+        self.timestep = float(timestep)
+        self.zones = list(zones) if zones is not None else \
+            ['zone{}'.format(i) for i in range(len(self.coefficients))]
+
+    def __len__(self) -> int:
+        return len(self.coefficients)
+
+    def parameters(self) -> dict:
+        """
+        Returns the physical parameters per zone: C [J/K], R [K/W], A [m2] and q [W] with the HVAC effectiveness
+        taken as 1, and the time constant tau = R C [h].
+        """
+        a, b, c, d = self.coefficients.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            capacitance = self.timestep / c
+            return {
+                'C': capacitance,
+                'R': c / a,
+                'A': b / c,
+                'q': d / c,
+                'tau_h': self.timestep / a / 3600,
+            }
+
+    def step(self, temperatures: np.ndarray, outdoor, solar, hvac) -> np.ndarray:
+        """
+        Advances (..., zones) temperatures by one timestep; the forcing terms are scalars or broadcast to them.
+        """
+        a, b, c, d = self.coefficients.T
+        return temperatures + a * (outdoor - temperatures) + b * solar + c * hvac + d
+
+    def simulate(self, initial, outdoor, solar=None, hvac=0.0) -> np.ndarray:
+        """
+        Simulates every zone over a horizon, for one or a batch of scenarios.
+
+        :param initial: (..., zones) initial temperatures.
+        :param outdoor: (..., steps) outdoor temperature, or (..., zones, steps) (recognized by its second last axis).
+        :param solar: (..., steps) solar irradiance, or (..., zones, steps); zero if omitted.
+        :param hvac: (..., zones, steps) HVAC power, or a scalar.
+        :return: (..., zones, steps + 1) temperatures, starting with `initial`.
+        """
+        initial = np.asarray(initial, dtype=np.float64)
+        outdoor = np.asarray(outdoor, dtype=np.float64)
+        zones, steps = len(self), outdoor.shape[-1]
+        outdoor = _per_zone(outdoor, zones)
+        solar = _per_zone(np.asarray(solar, dtype=np.float64), zones) if solar is not None else np.zeros(1)
+        hvac = np.asarray(hvac, dtype=np.float64)
+        hvac = hvac if hvac.ndim else np.broadcast_to(hvac, (zones, steps))
+        a, b, c, d = self.coefficients.T
+        # Everything except the temperature feedback is precomputed in one pass over the whole horizon
+        forcing = a[:, None] * outdoor + b[:, None] * solar + c[:, None] * hvac + d[:, None]
+        forcing = np.broadcast_to(forcing, np.broadcast_shapes(forcing.shape, initial.shape + (steps,)))
+        decay = 1 - a
+        # T[k+1] = decay T[k] + forcing[k] is linear, so it is solved in blocks of `block` steps: inside a block the
+        # response to the forcing is one matrix product, and only the block boundaries are stepped sequentially
+        block = min(64, steps) or 1
+        blocks = -(-steps // block)
+        padded = np.zeros(forcing.shape[:-1] + (blocks * block,))
+        padded[..., :steps] = forcing
+        padded = padded.reshape(forcing.shape[:-1] + (blocks, block))
+        lag = np.arange(block)[:, None] - np.arange(block)[None, :]
+        response = np.where(lag >= 0, decay[:, None, None] ** np.maximum(lag, 0), 0.0)
+        inner = padded @ np.swapaxes(response, -1, -2)
+        powers = decay[:, None] ** np.arange(1, block + 1)
+        out = np.empty(forcing.shape[:-1] + (blocks * block + 1,))
+        out[..., 0] = initial
+        current = out[..., 0]
+        for b in range(blocks):
+            out[..., b * block + 1:(b + 1) * block + 1] = powers * current[..., None] + inner[..., b, :]
+            current = out[..., (b + 1) * block]
+        return out[..., :steps + 1]
+
+    def save(self, path: str) -> None:
+        np.savez(path, coefficients=self.coefficients, timestep=self.timestep, zones=np.array(self.zones))
+
+    @staticmethod
+    def load(path: str) -> 'RCModel':
+        with np.load(path) as data:
+            return RCModel(data['coefficients'], float(data['timestep']), data['zones'].tolist())
+
+
+def fit_rc(temperatures, outdoor, solar=None, hvac=0.0, timestep: float = 900.0, zones=None,
+           ridge: float = 1e-8) -> RCModel:
+    """
+    Identifies a 1R1C model per zone by least squares on the one-step temperature change.
+
+    Every argument is an array or a list of arrays, one per contiguous segment (episode); regressions never cross
+    segment boundaries.  Steps with missing (NaN) values are left out of the fit of their zone.
+
+    :param temperatures: (zones, steps + 1) zone mean air temperatures per segment.
+    :param outdoor: (steps,) or (zones, steps) outdoor temperature per segment.
+    :param solar: (steps,) or (zones, steps) solar irradiance per segment, or None to fit without it.
+    :param hvac: (zones, steps) or (steps,) HVAC power per segment.
+    :param timestep: Simulation timestep in seconds.
+    :param zones: Optional zone names.
+    :param ridge: Tikhonov regularization relative to the scale of each regressor, for zones whose regressors are
+                  (nearly) collinear, such as an HVAC power that never changes.
+    :return: The fitted RCModel.
+    """
+    if not isinstance(hvac, (list, tuple)) and np.ndim(hvac) == 0:
+        hvac = [np.full(np.shape(t)[-1] - 1, float(hvac)) for t in _segments(temperatures)]
+    x, y = _regression(temperatures, outdoor, solar, hvac)
+    valid = np.isfinite(y) & np.isfinite(x).all(axis=-1)
+    x = np.where(valid[..., None], x, 0.0)
+    y = np.where(valid, y, 0.0)
+    # Batched normal equations: one small (4, 4) system per zone, all solved together
+    gram = np.einsum('zti,ztj->zij', x, x)
+    moment = np.einsum('zti,zt->zi', x, y)
+    # Each diagonal term is regularized relative to itself, and a regressor that is all zeros (no solar, no HVAC
+    # data) is pinned to a zero coefficient
+    diagonal = np.einsum('zii->zi', gram)
+    diagonal += np.where(diagonal > 0, ridge * diagonal, 1.0)
+    coefficients = np.linalg.solve(gram, moment[..., None])[..., 0]
+    return RCModel(coefficients, timestep, zones)
+
+
+def validate(model: RCModel, temperatures, outdoor, solar=None, hvac=0.0) -> dict:
+    """
+    Compares the model with recorded segments, taking the same arguments as `fit_rc`.
+
+    - one_step: prediction of every step from the recorded temperature
+    - simulation: free run of each segment from its first recorded temperature
+
+    :return: {'one_step': {metric: {zone: value}}, 'simulation': {...}, 'steps': int, 'simulation_seconds': float}
+    """
+    temperatures = _segments(temperatures)
+    if not isinstance(hvac, (list, tuple)) and np.ndim(hvac) == 0:
+        hvac = [np.full(t.shape[-1] - 1, float(hvac)) for t in temperatures]
+    outdoor, hvac = _segments(outdoor), _segments(hvac)
+    solar = _segments(solar) if solar is not None else [None] * len(temperatures)
+
+    one_step, simulated, actual = [], [], []
+    elapsed = 0.0
+    for t, out, sol, q in zip(temperatures, outdoor, solar, hvac):
+        steps = t.shape[1] - 1
+        out = _per_zone(out, len(model))[:, :steps]
+        sol = _per_zone(sol, len(model))[:, :steps] if sol is not None else np.zeros((len(model), steps))
+        q = _per_zone(q, len(model))[:, :steps]
+        one_step.append(model.step(t[:, :-1].T, out.T, sol.T, q.T).T)
+        start = time.perf_counter()
+        simulated.append(model.simulate(t[:, 0], out, sol, q))
+        elapsed += time.perf_counter() - start
+        actual.append(t)
+    actual_next = np.concatenate([t[:, 1:] for t in actual], axis=1)
+    report = {
+        'one_step': _metrics(np.concatenate(one_step, axis=1), actual_next),
+        'simulation': _metrics(np.concatenate([s[:, 1:] for s in simulated], axis=1), actual_next),
+        'steps': int(actual_next.shape[1]),
+        'simulation_seconds': elapsed,
+    }
+    for name in ('one_step', 'simulation'):
+        report[name] = {metric: dict(zip(model.zones, values.tolist())) for metric, values in report[name].items()}
+    return report
+
+
+def dataset_streams(dataset: TrajectoryDataset, zones, outdoor: str, hvac, solar: str = None,
+                    episodes=None) -> dict:
+    """
+    Extracts the streams of `fit_rc` from a trajectory dataset, one segment per episode.
+
+    Names refer to observation variables (the dataset's `observation_names`) or to info columns ('info/<key>').  The
+    forcing terms of a step are read from its next observation, which holds the values reported over that step.
+
+    :param dataset: Trajectory dataset, or its path.
+    :param zones: Observation names of the zone temperatures.
+    :param outdoor: Name of the outdoor temperature.
+    :param hvac: Name of the HVAC power, one per zone or a single one shared by every zone.
+    :param solar: Optional name of the solar irradiance.
+    :param episodes: Episode numbers, every complete episode by default.
+    :return: {'temperatures', 'outdoor', 'solar', 'hvac'} lists of segments (solar is None without a name).
+    """
+    dataset = dataset if isinstance(dataset, TrajectoryDataset) else TrajectoryDataset(dataset)
+    names = dataset.index.get('observation_names') or []
+    zones = [zones] if isinstance(zones, str) else list(zones)
+    hvac = [hvac] if isinstance(hvac, str) else list(hvac)
+    if episodes is None:
+        episodes = [i for i, episode in enumerate(dataset.episodes) if episode['complete']]
+
+    def column(data: dict, name: str, key: str) -> np.ndarray:
+        if name.startswith('info/'):
+            return data[name].astype(np.float64)
+        if name not in names:
+            raise KeyError('{} is neither an observation variable nor an info column'.format(name))
+        return data[key][:, names.index(name)].astype(np.float64)
+
+    streams = {'temperatures': [], 'outdoor': [], 'solar': [] if solar else None, 'hvac': []}
+    for number in episodes:
+        data = dataset.episode(number)
+        temperatures = np.stack([np.concatenate([column(data, zone, 'observations')[:1],
+                                                 column(data, zone, 'next_observations')]) for zone in zones])
+        streams['temperatures'].append(temperatures)
+        streams['outdoor'].append(column(data, outdoor, 'next_observations'))
+        if solar:
+            streams['solar'].append(column(data, solar, 'next_observations'))
+        streams['hvac'].append(np.stack([column(data, name, 'next_observations') for name in hvac]))
+    return streams
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fit per-zone RC models to a trajectory dataset and validate them')
+    parser.add_argument('dataset')
+    parser.add_argument('--zones', nargs='+', required=True)
+    parser.add_argument('--outdoor', required=True)
+    parser.add_argument('--hvac', nargs='+', required=True)
+    parser.add_argument('--solar', default=None)
+    parser.add_argument('--timestep', type=float, default=900.0, help='seconds')
+    parser.add_argument('--holdout', type=int, default=1, help='complete episodes (the last ones) used for validation')
+    parser.add_argument('--out', default=None, help='.npz file for the fitted model')
+    args = parser.parse_args()
+
+    trajectories = TrajectoryDataset(args.dataset)
+    complete = [i for i, episode in enumerate(trajectories.episodes) if episode['complete']]
+    if args.holdout >= len(complete):
+        raise SystemExit('{} complete episodes cannot leave {} held out'.format(len(complete), args.holdout))
+    train = dataset_streams(trajectories, args.zones, args.outdoor, args.hvac, args.solar, complete[:-args.holdout])
+    test = dataset_streams(trajectories, args.zones, args.outdoor, args.hvac, args.solar, complete[-args.holdout:])
+    rc = fit_rc(timestep=args.timestep, zones=args.zones, **train)
+    if args.out:
+        rc.save(args.out)
+    print(json.dumps({'parameters': {name: dict(zip(rc.zones, values.tolist()))
+                                     for name, values in rc.parameters().items()},
+                      'validation': validate(rc, **test)}, indent=2))
@@ -0,0 +1,229 @@
+"""
+Disk-backed replay buffer for long off-policy training runs.
+
+MemmapReplayBuffer is a drop-in Stable-Baselines3 ReplayBuffer whose columns (observations, next observations,
+actions, rewards, done and timeout flags) are float32/uint8 files mapped with numpy.memmap, so nothing is held as
+Python-side copies and the resident memory is whatever the OS page cache keeps of the files.  A buffer of hundreds of
+millions of 10-minute transitions therefore needs disk, not RAM.
+
+Sampling is vectorized: one sorted gather per column, so reads walk each file in order.  With `prefetch` > 0 a
+background thread keeps that many batches ready (already converted to tensors), and `model.train` takes them from a
+queue.  A prefetched batch is drawn from the buffer as it was when the batch was made, so it can miss the last few
+transitions added.
+
+Use it through the model:
+
+    DDPG('MlpPolicy', env, buffer_size=200_000_000, replay_buffer_class=MemmapReplayBuffer,
+         replay_buffer_kwargs=dict(path='replay', prefetch=4))
+"""
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+from stable_baselines3.common.buffers import ReplayBuffer
+from stable_baselines3.common.buffers import BaseBuffer
+from stable_baselines3.common.type_aliases import ReplayBufferSamples
+
+
+class MemmapReplayBuffer(ReplayBuffer):
+    """
+    ReplayBuffer storing its columns in memory-mapped files.
+
+    :param buffer_size: Maximum number of transitions (over all environments).
+    :param observation_space: Observation space.
+    :param action_space: Action space.
+    :param path: Directory holding the column files and `meta.json`.
+    :param device: PyTorch device of the sampled batches.
+    :param n_envs: Number of parallel environments.
+    :param optimize_memory_usage: Not supported, the next observations are always stored.
+    :param handle_timeout_termination: Whether truncated episodes are bootstrapped, as in ReplayBuffer.
+    :param prefetch: Number of batches prepared in a background thread, 0 to sample synchronously.
+    :param resume: Reopen the files in `path` (written with the same spaces and size) instead of starting empty.
+    """
+
+    def __init__(self, buffer_size: int, observation_space, action_space, path: str = 'replay_buffer',
+                 device='auto', n_envs: int = 1, optimize_memory_usage: bool = False,
+                 handle_timeout_termination: bool = True, prefetch: int = 2, resume: bool = False):
+        if optimize_memory_usage:
+            raise ValueError('MemmapReplayBuffer does not support optimize_memory_usage')
+        # ReplayBuffer.__init__ would allocate every column in RAM
+        BaseBuffer.__init__(self, buffer_size, observation_space, action_space, device, n_envs=n_envs)
+        self.buffer_size = max(buffer_size // n_envs, 1)
+        self.optimize_memory_usage = False
+        self.handle_timeout_termination = handle_timeout_termination
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+        columns = {
+            'observations': ((self.buffer_size, self.n_envs) + tuple(self.obs_shape), np.float32),
+            'next_observations': ((self.buffer_size, self.n_envs) + tuple(self.obs_shape), np.float32),
+            'actions': ((self.buffer_size, self.n_envs, self.action_dim), np.float32),
+            'rewards': ((self.buffer_size, self.n_envs), np.float32),
+            'dones': ((self.buffer_size, self.n_envs), np.uint8),
+            'timeouts': ((self.buffer_size, self.n_envs), np.uint8),
+        }
+        meta = self._read_meta() if resume else None
+        if meta is not None and meta['buffer_size'] != self.buffer_size:
+            raise ValueError('{} holds a buffer of size {}, not {}'.format(path, meta['buffer_size'], self.buffer_size))
+        for name, (shape, dtype) in columns.items():
+            mode = 'r+' if meta is not None else 'w+'
+            setattr(self, name, np.memmap(os.path.join(path, name + '.f32' if dtype == np.float32 else name + '.u8'),
+                                          dtype=dtype, mode=mode, shape=shape))
+        if meta is not None:
+            self.pos = meta['pos']
+            self.full = meta['full']
+
+        self.lock = threading.Lock()
+        self.prefetch = prefetch
+        self.batches = None
+        self.prefetch_key = None
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def _read_meta(self):
+        try:
+            with open(os.path.join(self.path, 'meta.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def flush(self) -> None:
+        """
+        Writes the dirty pages of every column and the write position to disk.
+        """
+        with self.lock:
+            for name in ('observations', 'next_observations', 'actions', 'rewards', 'dones', 'timeouts'):
+                getattr(self, name).flush()
+            with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+                json.dump({'buffer_size': self.buffer_size, 'pos': self.pos, 'full': self.full}, f)
+
+    def add(self, obs, next_obs, action, reward, done, infos: list) -> None:
+        with self.lock:
+            self.observations[self.pos] = np.reshape(obs, (self.n_envs,) + tuple(self.obs_shape))
+            self.next_observations[self.pos] = np.reshape(next_obs, (self.n_envs,) + tuple(self.obs_shape))
+            self.actions[self.pos] = np.reshape(action, (self.n_envs, self.action_dim))
+            self.rewards[self.pos] = reward
+            self.dones[self.pos] = done
+            if self.handle_timeout_termination:
+                self.timeouts[self.pos] = [info.get('TimeLimit.truncated', False) for info in infos]
+            self.pos += 1
+            if self.pos == self.buffer_size:
+                self.full = True
+                self.pos = 0
+
+    def extend(self, obs, next_obs, action, reward, done, infos: list) -> None:
+        """
+        Adds a batch of steps at once.  Every argument has a leading batch axis in front of what `add` takes, and
+        `infos` is a list of per-step info lists.
+        """
+        count = len(reward)
+        if count > self.buffer_size:
+            skip = count - self.buffer_size
+            self.extend(obs[skip:], next_obs[skip:], action[skip:], reward[skip:], done[skip:], infos[skip:])
+            return
+        with self.lock:
+            rows = (self.pos + np.arange(count)) % self.buffer_size
+            self.observations[rows] = np.reshape(obs, (count, self.n_envs) + tuple(self.obs_shape))
+            self.next_observations[rows] = np.reshape(next_obs, (count, self.n_envs) + tuple(self.obs_shape))
+            self.actions[rows] = np.reshape(action, (count, self.n_envs, self.action_dim))
+            self.rewards[rows] = np.reshape(reward, (count, self.n_envs))
+            self.dones[rows] = np.reshape(done, (count, self.n_envs))
+            if self.handle_timeout_termination:
+                self.timeouts[rows] = [[info.get('TimeLimit.truncated', False) for info in step] for step in infos]
+            self.full = self.full or self.pos + count >= self.buffer_size
+            self.pos = (self.pos + count) % self.buffer_size
+
+    def _gather(self, batch_size: int, env=None):
+        with self.lock:
+            upper = self.buffer_size if self.full else self.pos
+            flat = np.sort(np.random.randint(0, upper * self.n_envs, size=batch_size))
+            rows, envs = np.divmod(flat, self.n_envs)
+            data = (
+                self.observations[rows, envs],
+                self.actions[rows, envs],
+                self.next_observations[rows, envs],
+                self.dones[rows, envs].astype(np.float32),
+                self.rewards[rows, envs],
+                self.timeouts[rows, envs],
+            )
+        observations, actions, next_observations, dones, rewards, timeouts = data
+        if self.handle_timeout_termination:
+            dones *= 1 - timeouts
+        return ReplayBufferSamples(*map(self.to_torch, (
+            self._normalize_obs(observations, env),
+            actions,
+            self._normalize_obs(next_observations, env),
+            dones.reshape(-1, 1),
+            self._normalize_reward(rewards.reshape(-1, 1), env),
+        )))
+
+    def _prefetch_loop(self, batch_size: int, env) -> None:
+        failed = False
+        while not self.stopping.is_set() and not failed:
+            try:
+                batch = self._gather(batch_size, env)
+            except BaseException as e:
+                # Handed to `sample`, which raises it in the training thread instead of waiting forever
+                batch, failed = e, True
+            while not self.stopping.is_set():
+                try:
+                    self.batches.put(batch, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+
+    def sample(self, batch_size: int, env=None) -> ReplayBufferSamples:
+        """
+        Samples a batch uniformly over the stored transitions of all environments, from the prefetch queue when one
+        is running for this batch size and normalizer.  An error raised while preparing a batch in the prefetch thread
+        is raised here, and the next call starts a new thread.
+        """
+        if not self.prefetch:
+            return self._gather(batch_size, env)
+        if self.prefetch_key != (batch_size, id(env)):
+            self.stop_prefetch()
+            self.prefetch_key = (batch_size, id(env))
+            self.batches = queue.Queue(self.prefetch)
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self._prefetch_loop, args=(batch_size, env), daemon=True,
+                                           name='replay-prefetch')
+            self.thread.start()
+        batch = self.batches.get()
+        if isinstance(batch, BaseException):
+            self.stop_prefetch()
+            raise batch
+        return batch
+
+    def stop_prefetch(self) -> None:
+        """
+        Stops the prefetch thread, if any; the next `sample` starts a new one.
+        """
+        if self.thread is not None:
+            self.stopping.set()
+            self.thread.join()
+            self.thread = None
+            self.prefetch_key = None
+
+    def close(self) -> None:
+        """
+        Stops prefetching and flushes the columns to disk.
+        """
+        self.stop_prefetch()
+        self.flush()
+
+    def __getstate__(self):
+        # Saving the replay buffer pickles it; the data stays in the files, which `resume` reopens
+        self.flush()
+        state = self.__dict__.copy()
+        for name in ('observations', 'next_observations', 'actions', 'rewards', 'dones', 'timeouts', 'lock',
+                     'batches', 'thread', 'stopping'):
+            state.pop(name, None)
+        state['prefetch_key'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__init__(self.buffer_size * self.n_envs, self.observation_space, self.action_space, self.path,
+                      self.device, self.n_envs, False, self.handle_timeout_termination, self.prefetch, resume=True)
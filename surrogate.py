@@ -0,0 +1,321 @@
+"""
+Neural surrogate of an EnergyPlus environment, trained from recorded trajectories (see trajectory.py).
+
+The observation of an EplusEnv mixes variables the controller influences (zone temperatures, HVAC demand) with
+exogenous ones it cannot (calendar and weather).  The surrogate learns only the first kind: an MLP maps the
+normalized observation and action to the normalized change of every endogenous variable and to the reward.  The
+exogenous variables are taken from a recorded episode, so a surrogate episode follows the real calendar and weather.
+
+- `fit_surrogate` trains a Surrogate on the complete episodes of one or more trajectory datasets, holding out the last
+  episodes for evaluation.  Training reads minibatches from the memory-mapped columns (`materialize`), so the data
+  can be much larger than RAM.
+- SurrogateEnv is a gymnasium environment with the same spaces as the EplusEnv that produced the data, so the usual
+  wrappers (NormalizeObservation, NormalizeAction, ...) and ddpg_base.py's DDPG setup can be used on it unchanged.
+- `fidelity_report` compares the surrogate with held-out real episodes: one-step errors, and open-loop rollouts
+  driven by the recorded actions, for every endogenous variable and the reward.
+
+Usage: python surrogate.py DATASET [DATASET ...] --out surrogate.pt [--holdout 2] [--epochs 20]
+"""
+import argparse
+import json
+
+import gymnasium as gym
+import numpy as np
+import torch as th
+from torch import nn
+
+from trajectory import TrajectoryDataset
+
+#: Observation variables the controller has no influence on, replayed from recorded episodes
+EXOGENOUS = ('month', 'day_of_month', 'hour', 'Outdoor Air Temperature')
+
+
+def _episode_rows(datasets: list, holdout: int) -> (list, list):
+    episodes = [(d, e) for d, dataset in enumerate(datasets) for e, episode in enumerate(dataset.episodes)
+                if episode['complete']]
+    if holdout >= len(episodes):
+        raise ValueError('{} complete episodes cannot leave {} held out'.format(len(episodes), holdout))
+    return episodes[:len(episodes) - holdout], episodes[len(episodes) - holdout:]
+
+
+class Surrogate(nn.Module):
+    """
+    MLP dynamics and reward model with its normalization statistics.
+
+    :param obs_dim: Observation size.
+    :param act_dim: Action size.
+    :param endogenous: Indices of the observation variables the model predicts; the rest are exogenous.
+    :param hidden: Hidden layer sizes.
+    :param observation_names: Optional observation variable names, kept for reports.
+    """
+
+    def __init__(self, obs_dim: int, act_dim: int, endogenous, hidden=(256, 256), observation_names=None):
+        super().__init__()
+        self.obs_dim = obs_dim
+        self.act_dim = act_dim
+        self.endogenous = [int(i) for i in endogenous]
+        self.hidden = tuple(hidden)
+        self.observation_names = list(observation_names) if observation_names is not None else None
+        layers = []
+        size = obs_dim + act_dim
+        for width in hidden:
+            layers += [nn.Linear(size, width), nn.SiLU()]
+            size = width
+        layers.append(nn.Linear(size, len(self.endogenous) + 1))
+        self.net = nn.Sequential(*layers)
+        for name, size in (('obs', obs_dim), ('act', act_dim), ('delta', len(self.endogenous)), ('reward', 1)):
+            self.register_buffer(name + '_mean', th.zeros(size))
+            self.register_buffer(name + '_std', th.ones(size))
+
+    def set_statistics(self, observations, actions, deltas, rewards) -> None:
+        for name, values in (('obs', observations), ('act', actions), ('delta', deltas), ('reward', rewards)):
+            values = np.asarray(values, dtype=np.float64).reshape(len(values), -1)
+            getattr(self, name + '_mean').copy_(th.as_tensor(values.mean(axis=0)))
+            getattr(self, name + '_std').copy_(th.as_tensor(np.maximum(values.std(axis=0), 1e-6)))
+
+    def forward(self, observations: th.Tensor, actions: th.Tensor) -> th.Tensor:
+        """
+        Returns the normalized predictions: endogenous deltas followed by the reward.
+        """
+        x = th.cat([(observations - self.obs_mean) / self.obs_std, (actions - self.act_mean) / self.act_std], dim=-1)
+        return self.net(x)
+
+    def targets(self, observations: th.Tensor, next_observations: th.Tensor, rewards: th.Tensor) -> th.Tensor:
+        deltas = next_observations[..., self.endogenous] - observations[..., self.endogenous]
+        return th.cat([(deltas - self.delta_mean) / self.delta_std,
+                       ((rewards - self.reward_mean) / self.reward_std)[..., None]], dim=-1)
+
+    @th.no_grad()
+    def predict(self, observations: np.ndarray, actions: np.ndarray, exogenous_next: np.ndarray = None):
+        """
+        Predicts the next observations and rewards for a batch.
+
+        :param observations: (batch, obs_dim) current observations.
+        :param actions: (batch, act_dim) actions.
+        :param exogenous_next: Optional (batch, obs_dim) rows from which the exogenous variables of the next
+                               observation are taken; without it they are carried over unchanged.
+        :return: (next_observations, rewards) as float32 arrays.
+        """
+        device = self.obs_mean.device
+        obs = th.as_tensor(np.asarray(observations, dtype=np.float32), device=device)
+        out = self(obs, th.as_tensor(np.asarray(actions, dtype=np.float32), device=device))
+        deltas = out[..., :-1] * self.delta_std + self.delta_mean
+        rewards = out[..., -1] * self.reward_std + self.reward_mean
+        next_obs = obs.clone() if exogenous_next is None else \
+            th.as_tensor(np.asarray(exogenous_next, dtype=np.float32), device=device).clone()
+        next_obs[..., self.endogenous] = obs[..., self.endogenous] + deltas.float()
+        return next_obs.cpu().numpy(), rewards.float().cpu().numpy()
+
+    def save(self, path: str) -> None:
+        th.save({'config': {'obs_dim': self.obs_dim, 'act_dim': self.act_dim, 'endogenous': self.endogenous,
+                            'hidden': self.hidden, 'observation_names': self.observation_names},
+                 'state_dict': self.state_dict()}, path)
+
+    @staticmethod
+    def load(path: str, device='cpu') -> 'Surrogate':
+        data = th.load(path, map_location=device)
+        model = Surrogate(**data['config'])
+        model.load_state_dict(data['state_dict'])
+        return model.to(device).eval()
+
+
+def fit_surrogate(datasets: list, holdout: int = 1, exogenous=EXOGENOUS, hidden=(256, 256), epochs: int = 20,
+                  batch_size: int = 1024, learning_rate: float = 1e-3, device='cpu', seed: int = 0,
+                  verbose: bool = True) -> (Surrogate, list):
+    """
+    Trains a surrogate on the complete episodes of the given trajectory datasets.
+
+    :param datasets: TrajectoryDataset instances (or paths) recorded from the same environment configuration.
+    :param holdout: Number of complete episodes (the last ones) kept out of training for `fidelity_report`.
+    :param exogenous: Names of the exogenous observation variables (those missing from the datasets are ignored).
+    :param hidden: Hidden layer sizes.
+    :param epochs: Passes over the training rows.
+    :param batch_size: Minibatch size.
+    :param learning_rate: Adam learning rate.
+    :param device: PyTorch device.
+    :param seed: Seed of the minibatch order and initialization.
+    :param verbose: Print the training loss every epoch.
+    :return: The trained surrogate (in eval mode) and the held-out (dataset index, episode index) pairs.
+    """
+    datasets = [d if isinstance(d, TrajectoryDataset) else TrajectoryDataset(d) for d in datasets]
+    train, held_out = _episode_rows(datasets, holdout)
+    columns = [d.materialize() for d in datasets]
+    names = datasets[0].index.get('observation_names')
+    obs_dim = columns[0]['observations'].shape[1]
+    act_dim = columns[0]['actions'].shape[1]
+    skip = {names.index(name) for name in exogenous if names and name in names}
+    endogenous = [i for i in range(obs_dim) if i not in skip]
+
+    rows = [(d, np.arange(datasets[d].episodes[e]['start'],
+                          datasets[d].episodes[e]['start'] + datasets[d].episodes[e]['rows'])) for d, e in train]
+    owners = np.concatenate([np.full(r.size, d) for d, r in rows])
+    indices = np.concatenate([r for _, r in rows])
+
+    def gather(selection: np.ndarray) -> dict:
+        out = {}
+        for d in np.unique(owners[selection]):
+            picked = np.sort(indices[selection][owners[selection] == d])
+            for name in ('observations', 'actions', 'next_observations', 'rewards'):
+                out.setdefault(name, []).append(np.asarray(columns[d][name][picked], dtype=np.float32))
+        return {name: th.as_tensor(np.concatenate(values), device=device) for name, values in out.items()}
+
+    th.manual_seed(seed)
+    rng = np.random.default_rng(seed)
+    model = Surrogate(obs_dim, act_dim, endogenous, hidden, names).to(device)
+    sample = gather(rng.integers(0, indices.size, min(indices.size, 100000)))
+    obs, next_obs = sample['observations'].cpu().numpy(), sample['next_observations'].cpu().numpy()
+    model.set_statistics(obs, sample['actions'].cpu().numpy(), next_obs[:, endogenous] - obs[:, endogenous],
+                         sample['rewards'].cpu().numpy())
+    optimizer = th.optim.Adam(model.parameters(), lr=learning_rate)
+    model.train()
+    for epoch in range(epochs):
+        order = rng.permutation(indices.size)
+        total = 0.0
+        for start in range(0, order.size, batch_size):
+            batch = gather(order[start:start + batch_size])
+            target = model.targets(batch['observations'], batch['next_observations'], batch['rewards'])
+            loss = nn.functional.mse_loss(model(batch['observations'], batch['actions']), target)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * len(target)
+        if verbose:
+            print('epoch {:3d}: loss {:.6f}'.format(epoch + 1, total / order.size))
+    return model.eval(), held_out
+
+
+class SurrogateEnv(gym.Env):
+    """
+    Gymnasium environment stepping a Surrogate instead of EnergyPlus.
+
+    Each episode follows one recorded episode: it starts from that episode's first observation and takes the
+    exogenous variables (calendar, weather) of every step from it, while the endogenous variables and the reward come
+    from the model.  The episode is truncated where the recorded one ended.
+
+    :param surrogate: The trained model.
+    :param datasets: Trajectory datasets (or paths) to draw the episodes from.
+    :param episodes: (dataset index, episode index) pairs to use, by default every complete episode.
+    :param observation_space: Observation space, by default the unbounded Box an EplusEnv uses.
+    :param action_space: Action space of the EplusEnv, by default bounded by the recorded actions.
+    """
+
+    metadata = {'render_modes': []}
+
+    def __init__(self, surrogate: Surrogate, datasets: list, episodes=None, observation_space=None,
+                 action_space=None):
+        self.surrogate = surrogate
+        self.datasets = [d if isinstance(d, TrajectoryDataset) else TrajectoryDataset(d) for d in datasets]
+        self.episodes = list(episodes) if episodes is not None else \
+            [(d, e) for d, dataset in enumerate(self.datasets) for e, ep in enumerate(dataset.episodes)
+             if ep['complete']]
+        self.columns = [d.materialize() for d in self.datasets]
+        self.observation_space = observation_space or gym.spaces.Box(
+            low=-5e7, high=5e7, shape=(surrogate.obs_dim,), dtype=np.float32)
+        if action_space is None:
+            actions = np.concatenate([self.columns[d]['actions'] for d in {d for d, _ in self.episodes}])
+            action_space = gym.spaces.Box(actions.min(axis=0), actions.max(axis=0), dtype=np.float32)
+        self.action_space = action_space
+        self.timestep_per_episode = max(self.datasets[d].episodes[e]['rows'] for d, e in self.episodes) + 1
+        self.exogenous = None
+        self.observation = None
+        self.t = 0
+
+    def reset(self, *, seed: int = None, options: dict = None):
+        super().reset(seed=seed)
+        d, e = self.episodes[self.np_random.integers(len(self.episodes))]
+        episode = self.datasets[d].episodes[e]
+        rows = slice(episode['start'], episode['start'] + episode['rows'])
+        self.exogenous = np.asarray(self.columns[d]['next_observations'][rows])
+        self.observation = np.asarray(self.columns[d]['observations'][episode['start']], dtype=np.float32)
+        self.t = 0
+        return self.observation.copy(), {'episode': (d, e), 'timestep': 0}
+
+    def step(self, action):
+        action = np.clip(np.asarray(action, dtype=np.float32), self.action_space.low, self.action_space.high)
+        next_obs, reward = self.surrogate.predict(self.observation[None], action[None], self.exogenous[self.t][None])
+        self.observation = next_obs[0]
+        self.t += 1
+        truncated = self.t >= len(self.exogenous)
+        return self.observation.copy(), float(reward[0]), False, truncated, {'timestep': self.t}
+
+
+def fidelity_report(surrogate: Surrogate, datasets: list, episodes) -> dict:
+    """
+    Measures the surrogate against real episodes it was not trained on.
+
+    - one_step: error of single-step predictions from the real observations
+    - rollout: error of an open-loop rollout from the first observation of each episode, driven by the recorded
+      actions and exogenous variables; all episodes are rolled out together as one batch
+    - cumulative_reward: relative error of the summed reward per episode
+
+    :param surrogate: The trained model.
+    :param datasets: Trajectory datasets (or paths) holding the episodes.
+    :param episodes: (dataset index, episode index) pairs, such as the held-out episodes from `fit_surrogate`.
+    :return: {'one_step': {variable: {rmse, mae, r2}}, 'rollout': {...}, 'cumulative_reward': {...}}
+    """
+    datasets = [d if isinstance(d, TrajectoryDataset) else TrajectoryDataset(d) for d in datasets]
+    data = [datasets[d].episode(e, ['observations', 'actions', 'next_observations', 'rewards']) for d, e in episodes]
+    length = min(len(ep['rewards']) for ep in data)
+    obs = np.stack([ep['observations'][:length] for ep in data])
+    actions = np.stack([ep['actions'][:length] for ep in data])
+    next_obs = np.stack([ep['next_observations'][:length] for ep in data])
+    rewards = np.stack([ep['rewards'][:length] for ep in data])
+    endogenous = surrogate.endogenous
+    names = surrogate.observation_names or ['obs[{}]'.format(i) for i in range(surrogate.obs_dim)]
+
+    def metrics(predicted: np.ndarray, actual: np.ndarray) -> dict:
+        error = predicted - actual
+        variance = actual.var()
+        return {'rmse': float(np.sqrt(np.mean(error ** 2))), 'mae': float(np.mean(np.abs(error))),
+                'r2': float(1 - np.mean(error ** 2) / variance) if variance > 0 else float('nan')}
+
+    def per_variable(predicted_obs: np.ndarray, predicted_rewards: np.ndarray) -> dict:
+        report = {names[i]: metrics(predicted_obs[..., i], next_obs[..., i]) for i in endogenous}
+        report['reward'] = metrics(predicted_rewards, rewards)
+        return report
+
+    flat = surrogate.predict(obs.reshape(-1, obs.shape[-1]), actions.reshape(-1, actions.shape[-1]),
+                             next_obs.reshape(-1, obs.shape[-1]))
+    one_step = per_variable(flat[0].reshape(next_obs.shape), flat[1].reshape(rewards.shape))
+
+    rollout_obs = np.empty_like(next_obs)
+    rollout_rewards = np.empty_like(rewards)
+    current = obs[:, 0]
+    for t in range(length):
+        current, rollout_rewards[:, t] = surrogate.predict(current, actions[:, t], next_obs[:, t])
+        rollout_obs[:, t] = current
+    rollout = per_variable(rollout_obs, rollout_rewards)
+
+    real_total = rewards.sum(axis=1)
+    surrogate_total = rollout_rewards.sum(axis=1)
+    return {
+        'episodes': len(episodes),
+        'steps': int(length),
+        'one_step': one_step,
+        'rollout': rollout,
+        'cumulative_reward': {
+            'real': real_total.tolist(),
+            'surrogate': surrogate_total.tolist(),
+            'relative_error': float(np.mean(np.abs(surrogate_total - real_total) / np.maximum(np.abs(real_total),
+                                                                                              1e-9))),
+        },
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train a surrogate from trajectory datasets and report its fidelity')
+    parser.add_argument('datasets', nargs='+')
+    parser.add_argument('--out', default='surrogate.pt')
+    parser.add_argument('--holdout', type=int, default=1)
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=1024)
+    parser.add_argument('--device', default='cpu')
+    args = parser.parse_args()
+
+    trajectories = [TrajectoryDataset(path) for path in args.datasets]
+    model, held_out_episodes = fit_surrogate(trajectories, args.holdout, epochs=args.epochs,
+                                             batch_size=args.batch_size, device=args.device)
+    model.save(args.out)
+    with open(args.out + '.held_out.json', 'w') as f:
+        json.dump([list(map(int, pair)) for pair in held_out_episodes], f)
+    print(json.dumps(fidelity_report(model, trajectories, held_out_episodes), indent=2))
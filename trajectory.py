@@ -0,0 +1,321 @@
+"""
+Offline trajectory datasets: every simulated step written to chunked, compressed columnar files.
+
+A dataset is a directory with an `index.json` and one `chunk-<n>.npz` (numpy's compressed zip of .npy columns) per
+`chunk_rows` steps.  Rows are steps, numbered globally across chunks; an episode is a contiguous run of rows and may
+span chunks.  The columns are
+
+- observations, next_observations, actions (float32, one column per variable)
+- rewards (float32), terminated, truncated (bool), episode, step (int32)
+- info/<key> (float64) for every numeric entry of the first step's info dict
+
+TrajectoryWriter appends episodes to a dataset (one writer per directory at a time), and TrajectoryRecorder is a
+gymnasium wrapper that does so for every episode of the environment it wraps.  TrajectoryDataset reads a dataset:
+random rows through an LRU cache of decompressed chunks, whole episodes, or every column as a memory-mapped .npy file
+(`materialize`, decompressed once into the dataset directory) for offline training over many simulation-years.
+"""
+import json
+import os
+from collections import OrderedDict
+
+import gymnasium as gym
+import numpy as np
+
+INDEX = 'index.json'
+
+
+def _numeric(value) -> bool:
+    return isinstance(value, (bool, int, float, np.bool_, np.integer, np.floating))
+
+
+def _write_json(path: str, data) -> None:
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f)
+    os.replace(path + '.tmp', path)
+
+
+class TrajectoryWriter:
+    """
+    Appends episodes to a trajectory dataset.
+
+    :param root: Dataset directory; an existing dataset is appended to.
+    :param chunk_rows: Steps per chunk file.
+    :param observation_names: Optional names of the observation variables, stored in the index.
+    :param action_names: Optional names of the action variables, stored in the index.
+    """
+
+    def __init__(self, root: str, chunk_rows: int = 16384, observation_names=None, action_names=None):
+        self.root = root
+        self.chunk_rows = chunk_rows
+        os.makedirs(root, exist_ok=True)
+        try:
+            with open(os.path.join(root, INDEX)) as f:
+                self.index = json.load(f)
+        except FileNotFoundError:
+            self.index = {'version': 1, 'rows': 0, 'columns': None, 'info_keys': None, 'chunks': [], 'episodes': [],
+                          'observation_names': None, 'action_names': None}
+        if observation_names is not None:
+            self.index['observation_names'] = list(observation_names)
+        if action_names is not None:
+            self.index['action_names'] = list(action_names)
+        self.buffers = None
+        self.filled = 0
+        self.episode_start = None
+        self.episode_step = 0
+
+    @property
+    def rows(self) -> int:
+        """
+        Number of rows written so far, including those not yet in a chunk file.
+        """
+        return self.index['rows'] + self.filled
+
+    def _allocate(self, observation, action, info: dict) -> None:
+        if self.index['columns'] is None:
+            info_keys = sorted(key for key, value in info.items() if _numeric(value))
+            obs_shape = list(np.shape(observation))
+            act_shape = list(np.shape(action))
+            columns = {
+                'observations': ['float32', obs_shape],
+                'next_observations': ['float32', obs_shape],
+                'actions': ['float32', act_shape],
+                'rewards': ['float32', []],
+                'terminated': ['bool', []],
+                'truncated': ['bool', []],
+                'episode': ['int32', []],
+                'step': ['int32', []],
+            }
+            columns.update(('info/' + key, ['float64', []]) for key in info_keys)
+            self.index['columns'] = columns
+            self.index['info_keys'] = info_keys
+        self.buffers = {name: np.empty((self.chunk_rows,) + tuple(shape), dtype=dtype)
+                        for name, (dtype, shape) in self.index['columns'].items()}
+
+    def add(self, observation, action, reward: float, next_observation, terminated: bool, truncated: bool,
+            info: dict = None) -> None:
+        """
+        Appends one step to the current episode (starting a new episode if none is open).
+        """
+        info = info or {}
+        if self.buffers is None:
+            self._allocate(observation, action, info)
+        if self.episode_start is None:
+            self.episode_start = self.rows
+            self.episode_step = 0
+        i = self.filled
+        buffers = self.buffers
+        buffers['observations'][i] = observation
+        buffers['next_observations'][i] = next_observation
+        buffers['actions'][i] = action
+        buffers['rewards'][i] = reward
+        buffers['terminated'][i] = terminated
+        buffers['truncated'][i] = truncated
+        buffers['episode'][i] = len(self.index['episodes'])
+        buffers['step'][i] = self.episode_step
+        for key in self.index['info_keys']:
+            value = info.get(key)
+            buffers['info/' + key][i] = value if _numeric(value) else np.nan
+        self.episode_step += 1
+        self.filled += 1
+        if self.filled == self.chunk_rows:
+            self._write_chunk()
+
+    def end_episode(self, metadata: dict = None, complete: bool = True) -> None:
+        """
+        Closes the current episode and records it in the index.
+
+        :param metadata: JSON serializable description of the episode (controller, weather file, seed, ...).
+        :param complete: False when the episode was cut short rather than terminated or truncated by the environment.
+        """
+        if self.episode_start is None:
+            return
+        self.index['episodes'].append({'start': self.episode_start, 'rows': self.rows - self.episode_start,
+                                       'complete': complete, 'metadata': metadata or {}})
+        self.episode_start = None
+        self._write_index()
+
+    def _write_chunk(self) -> None:
+        if not self.filled:
+            return
+        name = 'chunk-{:06d}.npz'.format(len(self.index['chunks']))
+        path = os.path.join(self.root, name)
+        with open(path + '.tmp', 'wb') as f:
+            np.savez_compressed(f, **{column: values[:self.filled] for column, values in self.buffers.items()})
+        os.replace(path + '.tmp', path)
+        self.index['chunks'].append({'file': name, 'start': self.index['rows'], 'rows': self.filled})
+        self.index['rows'] += self.filled
+        self.filled = 0
+        self._write_index()
+
+    def _write_index(self) -> None:
+        # Only rows already in chunk files are described; an episode still being written is added when it ends
+        index = dict(self.index, episodes=[e for e in self.index['episodes']
+                                           if e['start'] + e['rows'] <= self.index['rows']])
+        _write_json(os.path.join(self.root, INDEX), index)
+
+    def close(self, metadata: dict = None) -> None:
+        """
+        Writes the last partial chunk, closing an open episode as incomplete.
+        """
+        self.end_episode(metadata, complete=False)
+        self._write_chunk()
+        self._write_index()
+
+
+class TrajectoryRecorder(gym.Wrapper):
+    """
+    Records every step of the wrapped environment to a trajectory dataset in `<root>/<name>`.
+
+    Put it directly on the EplusEnv to record observations and actions in physical units (before any normalization).
+
+    :param env: Environment to record.
+    :param root: Directory holding the datasets.
+    :param name: Dataset name, by default the environment's `name` attribute (distinct per worker with
+                 vec_env.eplus_env_fns).
+    :param chunk_rows: Steps per chunk file.
+    :param metadata: JSON serializable data stored with every episode.
+    """
+
+    def __init__(self, env: gym.Env, root: str, name: str = None, chunk_rows: int = 16384, metadata: dict = None):
+        super().__init__(env)
+        if name is None:
+            name = getattr(env.unwrapped, 'name', None) or 'env-{}'.format(os.getpid())
+        names = {}
+        for key, attr in (('observation_names', 'observation_variables'), ('action_names', 'action_variables')):
+            try:
+                names[key] = env.get_wrapper_attr(attr)
+            except AttributeError:
+                pass
+        self.writer = TrajectoryWriter(os.path.join(root, name), chunk_rows, **names)
+        self.metadata = metadata or {}
+        self.observation = None
+
+    def reset(self, **kwargs):
+        self.writer.end_episode(self.metadata, complete=False)
+        self.observation, info = self.env.reset(**kwargs)
+        return self.observation, info
+
+    def step(self, action):
+        observation, reward, terminated, truncated, info = self.env.step(action)
+        self.writer.add(self.observation, action, reward, observation, terminated, truncated, info)
+        self.observation = observation
+        if terminated or truncated:
+            self.writer.end_episode(self.metadata)
+        return observation, reward, terminated, truncated, info
+
+    def close(self):
+        self.writer.close(self.metadata)
+        return super().close()
+
+
+class TrajectoryDataset:
+    """
+    Reads a trajectory dataset written by TrajectoryWriter.
+
+    :param root: Dataset directory.
+    :param cache_chunks: Number of decompressed chunks kept in memory for random access.
+    """
+
+    def __init__(self, root: str, cache_chunks: int = 16):
+        self.root = root
+        with open(os.path.join(root, INDEX)) as f:
+            self.index = json.load(f)
+        self.cache_chunks = cache_chunks
+        self.cache = OrderedDict()
+        self.chunk_starts = np.array([chunk['start'] for chunk in self.index['chunks']], dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self.index['rows']
+
+    @property
+    def columns(self) -> list:
+        return list(self.index['columns'] or ())
+
+    @property
+    def episodes(self) -> list:
+        return self.index['episodes']
+
+    def chunk(self, number: int) -> dict:
+        """
+        Returns every column of one chunk, decompressing it unless it is in the cache.
+        """
+        if number in self.cache:
+            self.cache.move_to_end(number)
+            return self.cache[number]
+        with np.load(os.path.join(self.root, self.index['chunks'][number]['file'])) as npz:
+            data = {name: npz[name] for name in npz.files}
+        self.cache[number] = data
+        if len(self.cache) > self.cache_chunks:
+            self.cache.popitem(last=False)
+        return data
+
+    def rows(self, indices, columns=None) -> dict:
+        """
+        Gathers rows by global index.
+
+        :param indices: Row indices, in any order.
+        :param columns: Column names, all columns by default.
+        :return: {column: array} in the order of `indices`.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        columns = columns or self.columns
+        out = {}
+        for name in columns:
+            dtype, shape = self.index['columns'][name]
+            out[name] = np.empty(indices.shape + tuple(shape), dtype=dtype)
+        chunks = np.searchsorted(self.chunk_starts, indices, side='right') - 1
+        for number in np.unique(chunks):
+            selected = np.flatnonzero(chunks == number)
+            data = self.chunk(int(number))
+            offsets = indices[selected] - self.chunk_starts[number]
+            for name in columns:
+                out[name][selected] = data[name][offsets]
+        return out
+
+    def sample(self, batch_size: int, columns=None, rng: np.random.Generator = None) -> dict:
+        """
+        Returns uniformly sampled rows.  Sampling is faster when the cache holds the whole dataset, or after
+        `materialize`.
+        """
+        rng = rng or np.random.default_rng()
+        return self.rows(rng.integers(0, len(self), batch_size), columns)
+
+    def episode(self, number: int, columns=None) -> dict:
+        """
+        Returns every row of one episode.
+        """
+        episode = self.index['episodes'][number]
+        return self.rows(np.arange(episode['start'], episode['start'] + episode['rows']), columns)
+
+    def materialize(self, path: str = None) -> dict:
+        """
+        Decompresses every column once into an uncompressed .npy file and opens them memory-mapped.  The files are
+        reused while the dataset has not grown.
+
+        :param path: Directory for the .npy files, `<root>/columns` by default.
+        :return: {column: read-only numpy.memmap} over all rows.
+        """
+        path = path or os.path.join(self.root, 'columns')
+        os.makedirs(path, exist_ok=True)
+        stamp = os.path.join(path, 'rows.json')
+        try:
+            with open(stamp) as f:
+                current = json.load(f) == len(self)
+        except FileNotFoundError:
+            current = False
+        files = {name: os.path.join(path, name.replace('/', '__') + '.npy') for name in self.columns}
+        if not current:
+            outputs = {}
+            for name, file in files.items():
+                dtype, shape = self.index['columns'][name]
+                outputs[name] = np.lib.format.open_memmap(file, mode='w+', dtype=dtype,
+                                                          shape=(len(self),) + tuple(shape))
+            for number, chunk in enumerate(self.index['chunks']):
+                with np.load(os.path.join(self.root, chunk['file'])) as npz:
+                    for name, output in outputs.items():
+                        output[chunk['start']:chunk['start'] + chunk['rows']] = npz[name]
+            for output in outputs.values():
+                output.flush()
+            del outputs
+            _write_json(stamp, len(self))
+        return {name: np.load(file, mmap_mode='r') for name, file in files.items()}
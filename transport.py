@@ -0,0 +1,481 @@
+"""
+Shared memory transport between environment worker processes and the learner.
+
+SharedMemoryTransport holds one preallocated slot per worker for the action going in and the observation, reward,
+terminated/truncated flags and selected numeric info values coming out.  A step is handed over with two semaphores
+per slot (no pickling, no pipe), and the learner records the round trip time of every step minus the time the worker
+spent inside `env.step`, which is the per-step IPC latency reported by `latency_stats()`.
+
+SharedMemoryWorkers starts the worker processes on top of a transport.  The pipe each worker also gets is only used
+for rare calls (reset, attribute access, method calls), for error reports, and for full info dicts when those are
+requested.  SubprocessEnv runs one environment this way behind a plain gymnasium.Env, so it can take the place of the
+EplusEnv at the bottom of the usual wrapper stack.
+"""
+import multiprocessing as mp
+import traceback
+from functools import partial
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+from time import perf_counter
+
+import gymnasium as gym
+import numpy as np
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper
+
+STEP = 1
+CONTROL = 2
+CLOSE = 3
+
+
+def attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """
+    Maps an existing shared memory block without taking ownership of it.  The creating process unlinks the block;
+    before Python 3.13 attaching always registers it with the resource tracker, which would unlink it again, with a
+    warning, when the attaching process exits.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedMemoryTransport:
+    """
+    Preallocated shared memory slots and per-slot semaphores for stepping environments in other processes.
+
+    The transport is created by the learner and passed to the worker processes when they are started (the semaphores
+    can only be inherited that way).  The block itself is allocated by the learner with `allocate` once the spaces are
+    known, and mapped by the workers with `attach`.
+
+    :param n_slots: Number of workers.
+    :param ctx: Multiprocessing context the workers are started with.
+    :param history: Number of most recent step latencies kept for the percentiles.
+    """
+
+    def __init__(self, n_slots: int, ctx=None, history: int = 100000):
+        ctx = ctx or mp.get_context()
+        self.n_slots = n_slots
+        self.work = [ctx.Semaphore(0) for _ in range(n_slots)]
+        self.ready = [ctx.Semaphore(0) for _ in range(n_slots)]
+        self.shm = None
+        self.layout = None
+        self.owner = False
+        self.latencies = np.zeros(history)
+        self.latency_count = 0
+        self.latency_max = 0.0
+        self._posted = np.zeros(n_slots)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ('shm', 'layout', 'latencies', '_posted') + tuple(self.layout or ()):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.shm = None
+        self.layout = None
+        self.owner = False
+
+    @staticmethod
+    def make_layout(n_slots: int, observation_space: gym.spaces.Box, action_space: gym.spaces.Box,
+                    n_info: int) -> dict:
+        """
+        Returns the arrays of the shared block as {name: (shape, dtype)}.
+        """
+        return {
+            'command': ((n_slots,), np.int8),
+            'status': ((n_slots,), np.int8),
+            'compute': ((n_slots,), np.float64),
+            'observations': ((n_slots,) + observation_space.shape, observation_space.dtype),
+            'terminal_observations': ((n_slots,) + observation_space.shape, observation_space.dtype),
+            'actions': ((n_slots,) + action_space.shape, action_space.dtype),
+            'rewards': ((n_slots,), np.float64),
+            'terminated': ((n_slots,), np.bool_),
+            'truncated': ((n_slots,), np.bool_),
+            'infos': ((n_slots, n_info), np.float64),
+        }
+
+    @staticmethod
+    def _offsets(layout: dict) -> (dict, int):
+        offsets = {}
+        size = 0
+        for name, (shape, dtype) in layout.items():
+            offsets[name] = size
+            size += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // 64) * 64
+        return offsets, max(size, 64)
+
+    def _map(self, shm: shared_memory.SharedMemory, layout: dict) -> None:
+        offsets, _ = self._offsets(layout)
+        self.shm = shm
+        self.layout = layout
+        for name, (shape, dtype) in layout.items():
+            setattr(self, name, np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offsets[name]))
+
+    def allocate(self, observation_space: gym.spaces.Box, action_space: gym.spaces.Box, n_info: int = 0) -> tuple:
+        """
+        Allocates the shared block on the learner side.
+
+        :param observation_space: Observation space, which must be a Box.
+        :param action_space: Action space, which must be a Box.
+        :param n_info: Number of numeric info values per step.
+        :return: The (name, layout) pair the workers pass to `attach`.
+        """
+        for space in (observation_space, action_space):
+            if not isinstance(space, gym.spaces.Box):
+                raise TypeError('SharedMemoryTransport needs Box spaces, got {!r}'.format(space))
+        layout = self.make_layout(self.n_slots, observation_space, action_space, n_info)
+        self._map(shared_memory.SharedMemory(create=True, size=self._offsets(layout)[1]), layout)
+        self.owner = True
+        return self.shm.name, layout
+
+    def attach(self, name: str, layout: dict) -> None:
+        """
+        Maps the block allocated by the learner in a worker.
+        """
+        self._map(attach_shared_memory(name), layout)
+
+    def release(self) -> None:
+        """
+        Unmaps the block, and unlinks it on the learner side.
+        """
+        if self.shm is None:
+            return
+        for name in self.layout:
+            delattr(self, name)
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
+
+    # Learner side
+
+    def post(self, slot: int, command: int) -> None:
+        """
+        Hands a command (and, for STEP, the action already written to `actions[slot]`) to a worker.
+        """
+        self.command[slot] = command
+        self._posted[slot] = perf_counter()
+        self.work[slot].release()
+
+    def wait(self, slot: int, is_alive=None, poll_interval: float = 1.0) -> bool:
+        """
+        Waits until a worker has finished the posted command, and records the IPC latency of STEP commands.
+
+        :param slot: Worker index.
+        :param is_alive: Optional callable checked every `poll_interval` seconds; waiting stops when it returns False.
+        :param poll_interval: Seconds between liveness checks.
+        :return: False if the worker died, True otherwise.
+        """
+        while not self.ready[slot].acquire(timeout=poll_interval):
+            if is_alive is not None and not is_alive():
+                return False
+        if self.command[slot] == STEP:
+            latency = max(perf_counter() - self._posted[slot] - self.compute[slot], 0.0)
+            self.latencies[self.latency_count % self.latencies.size] = latency
+            self.latency_count += 1
+            self.latency_max = max(self.latency_max, latency)
+        return True
+
+    def latency_stats(self) -> dict:
+        """
+        Returns the per-step IPC latency (round trip minus time spent in `env.step`) in microseconds.  The mean and
+        percentiles cover the most recent `history` steps; `max` covers all of them.  Slots are collected in order,
+        so with several workers a slot that finished early also counts the wait for the ones before it, which makes
+        these figures an upper bound.
+        """
+        recent = self.latencies[:min(self.latency_count, self.latencies.size)]
+        if recent.size == 0:
+            return {'steps': 0}
+        p50, p99 = np.percentile(recent, [50, 99]) * 1e6
+        return {'steps': self.latency_count, 'mean_us': float(recent.mean() * 1e6), 'p50_us': float(p50),
+                'p99_us': float(p99), 'max_us': float(self.latency_max * 1e6)}
+
+    # Worker side
+
+    def next_command(self, slot: int) -> int:
+        """
+        Blocks until the learner posts a command for this worker.
+        """
+        self.work[slot].acquire()
+        return int(self.command[slot])
+
+    def done(self, slot: int) -> None:
+        """
+        Tells the learner that the posted command has been handled.
+        """
+        self.ready[slot].release()
+
+
+def _control(env: gym.Env, command: str, data):
+    if command == 'reset':
+        seed, options = data
+        return env.reset(seed=seed, **({'options': options} if options else {}))
+    if command == 'get_attr':
+        return env.get_wrapper_attr(data)
+    if command == 'lookup':
+        value = env.get_wrapper_attr(data)
+        return (True, None) if callable(value) else (False, value)
+    if command == 'set_attr':
+        return setattr(env, data[0], data[1])
+    if command == 'env_method':
+        return env.get_wrapper_attr(data[0])(*data[1], **data[2])
+    if command == 'is_wrapped':
+        from stable_baselines3.common.env_util import is_wrapped
+        return is_wrapped(env, data)
+    raise NotImplementedError('`{}` is not implemented in the worker'.format(command))
+
+
+def _worker(slot: int, env_fn: CloudpickleWrapper, transport: SharedMemoryTransport, remote, parent_remote,
+            info_keys, auto_reset: bool) -> None:
+    parent_remote.close()
+    env = None
+    try:
+        env = env_fn.var()
+        remote.send((True, (env.observation_space, env.action_space)))
+        transport.attach(*remote.recv())
+    except Exception:
+        remote.send((False, traceback.format_exc()))
+        if env is not None:
+            env.close()
+        return
+
+    try:
+        while True:
+            code = transport.next_command(slot)
+            if code == CLOSE:
+                break
+            try:
+                if code == STEP:
+                    start = perf_counter()
+                    observation, reward, terminated, truncated, info = env.step(transport.actions[slot].copy())
+                    transport.compute[slot] = perf_counter() - start
+                    transport.rewards[slot] = reward
+                    transport.terminated[slot] = terminated
+                    transport.truncated[slot] = truncated
+                    if info_keys is not None:
+                        for k, key in enumerate(info_keys):
+                            transport.infos[slot, k] = info.get(key, np.nan)
+                    if auto_reset and (terminated or truncated):
+                        transport.terminal_observations[slot] = observation
+                        observation, _ = env.reset()
+                    transport.observations[slot] = observation
+                    # Sent last, so that a failing step or reset sends only its traceback
+                    if info_keys is None:
+                        remote.send((True, info))
+                else:
+                    remote.send((True, _control(env, *remote.recv())))
+                transport.status[slot] = 0
+            except Exception:
+                transport.status[slot] = 1
+                remote.send((False, traceback.format_exc()))
+            transport.done(slot)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        env.close()
+        transport.release()
+
+
+class SharedMemoryWorkers:
+    """
+    Worker processes, one environment each, stepped through a SharedMemoryTransport.
+
+    Both spaces must be Box spaces, which is what EplusEnv uses.  The workers start with forkserver where it is
+    available and spawn otherwise (fork is not used, the learner may already be running threads), so the training
+    script has to keep its top level code under `if __name__ == '__main__':`.
+
+    :param env_fns: Picklable zero argument callables, one per worker, each returning a new environment.
+    :param info_keys: Numeric info keys passed back through shared memory on every step, or None to send the full
+                      info dicts through the pipe instead.
+    :param auto_reset: Whether workers reset their environment at the end of an episode (the VecEnv convention),
+                       saving the last observation in `terminal_observations`.
+    :param start_method: Multiprocessing start method, forkserver or spawn by default.
+    :param poll_interval: Seconds between liveness checks of a worker while waiting for it.
+    """
+
+    def __init__(self, env_fns: list, info_keys=(), auto_reset: bool = True, start_method: str = None,
+                 poll_interval: float = 1.0):
+        if start_method is None:
+            start_method = 'forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn'
+        ctx = mp.get_context(start_method)
+        self.n_workers = len(env_fns)
+        self.info_keys = None if info_keys is None else tuple(info_keys)
+        self.poll_interval = poll_interval
+        self.closed = False
+        self.waiting = False
+        self.transport = SharedMemoryTransport(self.n_workers, ctx)
+        self.remotes, work_remotes = zip(*[ctx.Pipe() for _ in range(self.n_workers)])
+        self.processes = []
+        for i, (work_remote, remote, env_fn) in enumerate(zip(work_remotes, self.remotes, env_fns)):
+            args = (i, CloudpickleWrapper(env_fn), self.transport, work_remote, remote, self.info_keys, auto_reset)
+            process = ctx.Process(target=_worker, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+        try:
+            self.observation_space, self.action_space = [self.receive(i) for i in range(self.n_workers)][0]
+            block = self.transport.allocate(self.observation_space, self.action_space, len(self.info_keys or ()))
+            for remote in self.remotes:
+                remote.send(block)
+        except BaseException:
+            self.terminate()
+            raise
+
+    def wait(self, index: int) -> None:
+        if not self.transport.wait(index, self.processes[index].is_alive, self.poll_interval):
+            raise RuntimeError('Worker {} exited with code {}'.format(index, self.processes[index].exitcode))
+
+    def receive(self, index: int):
+        while not self.remotes[index].poll(self.poll_interval):
+            if not self.processes[index].is_alive():
+                raise RuntimeError('Worker {} exited with code {}'.format(index, self.processes[index].exitcode))
+        ok, payload = self.remotes[index].recv()
+        if not ok:
+            raise RuntimeError('Worker {} failed:\n{}'.format(index, payload))
+        return payload
+
+    def receive_all(self, indices) -> list:
+        """
+        Reads one reply from each of the given workers.  A failure is raised only once every reply has been read, so
+        that no pipe is left holding a stale reply for the next command.
+
+        :param indices: Worker indices.
+        :return: The replies, in the order of `indices`.
+        """
+        results = []
+        error = None
+        for i in indices:
+            try:
+                results.append(self.receive(i))
+            except RuntimeError as e:
+                error = error or e
+        if error is not None:
+            raise error
+        return results
+
+    def call(self, command: str, data: list, indices: list) -> list:
+        """
+        Runs a rare command in the given workers through their pipes.
+
+        :param command: One of reset, get_attr, lookup, set_attr, env_method, is_wrapped.
+        :param data: The command argument for each of the given workers.
+        :param indices: Worker indices.
+        :return: The results, in the order of `indices`.
+        """
+        for i, value in zip(indices, data):
+            self.remotes[i].send((command, value))
+            self.transport.post(i, CONTROL)
+        for i in indices:
+            self.wait(i)
+        return self.receive_all(indices)
+
+    def step_async(self, actions: np.ndarray) -> None:
+        """
+        Writes one action per worker to shared memory and starts the step in every worker.
+        """
+        self.transport.actions[:] = np.reshape(actions, self.transport.actions.shape)
+        for i in range(self.n_workers):
+            self.transport.post(i, STEP)
+        self.waiting = True
+
+    def step_wait(self):
+        """
+        Waits for every worker to finish its step.
+
+        :return: The info dicts when full infos were requested, otherwise None; the step data itself is in the
+                 transport arrays.
+        """
+        for i in range(self.n_workers):
+            self.wait(i)
+        self.waiting = False
+        # With full infos every worker sent one message, its info or its traceback; otherwise only the failed ones
+        if self.info_keys is None:
+            return self.receive_all(range(self.n_workers))
+        self.receive_all(np.flatnonzero(self.transport.status).tolist())
+        return None
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        if self.waiting:
+            for i in range(self.n_workers):
+                self.wait(i)
+        for i in range(self.n_workers):
+            self.transport.post(i, CLOSE)
+        for process in self.processes:
+            process.join(timeout=60)
+        self.closed = True
+        self.terminate()
+
+    def terminate(self) -> None:
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        for remote in self.remotes:
+            remote.close()
+        self.transport.release()
+
+
+class SubprocessEnv(gym.Env):
+    """
+    Runs one environment in a worker process behind the gymnasium.Env interface, so that the learner side wrappers
+    (NormalizeObservation, NormalizeAction, LoggerWrapper, CSVLogger, WandBLogger, ...) can be stacked on it exactly
+    as on the EplusEnv itself.  Attributes that are not defined here, such as `workspace_path` or
+    `timestep_per_episode`, are looked up in the worker.
+
+    The sinergym logging wrappers read the whole info dict, so by default (info_keys=None) infos are sent through the
+    pipe on every step, while observations, actions and rewards still go through shared memory.  Pass info_keys to
+    keep the step entirely in shared memory when the wrappers only need a few numeric entries.
+
+    :param env_fn: Picklable zero argument callable returning the environment.
+    :param info_keys: Numeric info keys to pass back through shared memory, or None for full info dicts.
+    :param start_method: Multiprocessing start method, forkserver or spawn by default.
+    """
+
+    def __init__(self, env_fn, info_keys=None, start_method: str = None):
+        self.workers = SharedMemoryWorkers([env_fn], info_keys, auto_reset=False, start_method=start_method)
+        self.observation_space = self.workers.observation_space
+        self.action_space = self.workers.action_space
+        self.render_mode = None
+
+    def __getattr__(self, name: str):
+        if name.startswith('_') or name == 'workers':
+            raise AttributeError(name)
+        is_method, value = self.workers.call('lookup', [name], [0])[0]
+        return partial(self.env_method, name) if is_method else value
+
+    def reset(self, *, seed: int = None, options: dict = None):
+        observation, info = self.workers.call('reset', [(seed, options)], [0])[0]
+        return observation, info
+
+    def step(self, action):
+        self.workers.step_async(np.asarray(action)[np.newaxis])
+        infos = self.workers.step_wait()
+        transport = self.workers.transport
+        info = infos[0] if infos is not None else dict(zip(self.workers.info_keys, transport.infos[0].tolist()))
+        return (transport.observations[0].copy(), float(transport.rewards[0]), bool(transport.terminated[0]),
+                bool(transport.truncated[0]), info)
+
+    def env_method(self, method_name: str, *args, **kwargs):
+        return self.workers.call('env_method', [(method_name, args, kwargs)], [0])[0]
+
+    def set_wrapper_attr(self, name: str, value, *, force: bool = True) -> bool:
+        self.workers.call('set_attr', [(name, value)], [0])
+        return True
+
+    def ipc_latency(self) -> dict:
+        """
+        Returns the per-step IPC latency statistics of the transport, see SharedMemoryTransport.latency_stats.
+        """
+        return self.workers.transport.latency_stats()
+
+    def close(self) -> None:
+        self.workers.close()
@@ -0,0 +1,127 @@
+"""
+Multi-process vectorized environments for training on several EnergyPlus simulations at once.
+
+Each worker process owns one environment, and with it its own EnergyPlus state and workspace directory.  The per-step
+traffic (actions in; observations, rewards and done flags out) goes through the slots of a SharedMemoryTransport
+(see transport.py) instead of being pickled through a pipe.  The pipe is only used for the rare calls (reset,
+get_attr, set_attr, env_method, env_is_wrapped) and to report errors.
+
+Info dicts are not sent back on every step.  `TimeLimit.truncated` and `terminal_observation` are always filled in, and
+any numeric info keys listed in `info_keys` are copied through the shared block as well.
+"""
+from functools import partial
+
+import gymnasium as gym
+import numpy as np
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+from transport import SharedMemoryWorkers
+
+
+def make_eplus_env(env_name: str, wrappers=(), **env_kwargs) -> gym.Env:
+    """
+    Builds a wrapped EplusEnv.  This is a module level function so that `functools.partial` objects of it can be
+    passed to worker processes started with spawn or forkserver.
+
+    :param env_name: Name of the environment, which is also the prefix of its workspace directory.  Workers running
+                     at the same time must use different names.
+    :param wrappers: Sequence of (wrapper class, keyword arguments) pairs, applied in order.
+    :param env_kwargs: Keyword arguments passed to EplusEnv.
+    :return: The wrapped environment.
+    """
+    from sinergym.envs.eplus_env import EplusEnv
+    env = EplusEnv(env_name=env_name, **env_kwargs)
+    for wrapper, kwargs in wrappers:
+        env = wrapper(env, **kwargs)
+    return env
+
+
+def eplus_env_fns(n_workers: int, env_name: str, wrappers=(), **env_kwargs) -> list:
+    """
+    Returns one environment factory per worker, each with its own environment name (and so its own workspace).
+
+    :param n_workers: Number of workers.
+    :param env_name: Base environment name, suffixed with `-worker<index>` for each worker.
+    :param wrappers: Sequence of (wrapper class, keyword arguments) pairs, applied in order.
+    :param env_kwargs: Keyword arguments passed to EplusEnv.
+    :return: List of picklable zero argument callables.
+    """
+    return [partial(make_eplus_env, '{}-worker{}'.format(env_name, i), wrappers, **env_kwargs)
+            for i in range(n_workers)]
+
+
+class SharedMemoryVecEnv(VecEnv):
+    """
+    Runs each environment in its own process and exchanges the step data through a SharedMemoryTransport.
+
+    Both spaces must be Box spaces, which is what EplusEnv uses.  The workers start with forkserver where it is
+    available and spawn otherwise (fork is not used, the learner may already be running threads), so the training
+    script has to keep its top level code under `if __name__ == '__main__':`.
+
+    :param env_fns: Picklable zero argument callables, one per worker, each returning a new environment.
+    :param info_keys: Numeric info keys to pass back on every step.  Other info entries are dropped.
+    :param start_method: Multiprocessing start method, forkserver or spawn by default.
+    :param poll_interval: Seconds between liveness checks of a worker while waiting for it.
+    """
+
+    def __init__(self, env_fns: list, info_keys=(), start_method: str = None, poll_interval: float = 1.0):
+        self.workers = SharedMemoryWorkers(env_fns, tuple(info_keys), auto_reset=True, start_method=start_method,
+                                           poll_interval=poll_interval)
+        self.info_keys = self.workers.info_keys
+        self.transport = self.workers.transport
+        super().__init__(len(env_fns), self.workers.observation_space, self.workers.action_space)
+
+    def _call(self, command: str, data, indices=None) -> list:
+        indices = list(self._get_indices(indices))
+        return self.workers.call(command, [data] * len(indices), indices)
+
+    def reset(self):
+        results = self.workers.call('reset', list(zip(self._seeds, self._options)), list(range(self.num_envs)))
+        observations = np.stack([observation for observation, _ in results])
+        self.reset_infos = [info for _, info in results]
+        self._reset_seeds()
+        self._reset_options()
+        return observations
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self.workers.step_async(actions)
+
+    def step_wait(self):
+        self.workers.step_wait()
+        transport = self.transport
+        dones = transport.terminated | transport.truncated
+        time_limits = transport.truncated & ~transport.terminated
+        infos = [{'TimeLimit.truncated': bool(truncated)} for truncated in time_limits]
+        for i, values in enumerate(transport.infos):
+            infos[i].update(zip(self.info_keys, values.tolist()))
+            if dones[i]:
+                infos[i]['terminal_observation'] = transport.terminal_observations[i].copy()
+        return transport.observations.copy(), transport.rewards.copy(), dones, infos
+
+    def close(self) -> None:
+        self.workers.close()
+
+    def ipc_latency(self) -> dict:
+        """
+        Returns the per-step IPC latency statistics of the transport, see SharedMemoryTransport.latency_stats.
+        """
+        return self.transport.latency_stats()
+
+    def get_attr(self, attr_name: str, indices=None) -> list:
+        return self._call('get_attr', attr_name, indices)
+
+    def get_wrapper_attr(self, name: str):
+        """
+        Returns the attribute of the first worker's environment, so that code written for a single wrapped
+        environment (env.get_wrapper_attr('workspace_path')) also accepts this VecEnv.
+        """
+        return self.get_attr(name, indices=0)[0]
+
+    def set_attr(self, attr_name: str, value, indices=None) -> None:
+        self._call('set_attr', (attr_name, value), indices)
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs) -> list:
+        return self._call('env_method', (method_name, method_args, method_kwargs), indices)
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> list:
+        return self._call('is_wrapped', wrapper_class, indices)